@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+
+"""
+This module provides the Cassette class, used to record the RPC traffic of the executor connections
+into a local file and to replay it later, without access to the instances.
+"""
+
+import gzip
+import json
+import time
+import atexit
+import threading
+from collections import deque
+
+from tools import ProxyJSON
+from exceptions import CassetteMismatchException
+
+
+class Cassette:
+    """
+    Records RPC requests and responses of odoorpc connections, or serves them back.
+
+    While recording, every request made through a connection (login included) is written to a
+    compressed JSON Lines file, with its response and latency. Passwords are never written,
+    and the values of the ``redact_fields`` are replaced in requests and responses.
+
+    While replaying, connections are built offline and every request is answered with the
+    recorded response of the same request, in the recorded order, after the recorded latency
+    multiplied by ``latency_scale`` (0 answers at once).
+
+    Example usage::
+
+        executor = Executor(record='run.cassette.gz')    # against the real instances
+        executor = Executor(replay='run.cassette.gz')    # offline, same results and timings
+    """
+
+    #: The value written in place of passwords and redacted fields
+    redacted = "<redacted>"
+
+    def __init__(self, file_path: str, mode: str="record", latency_scale: float=1.0, redact_fields: list=None):
+        """ Initialize the Cassette class.
+
+        Args:
+            file_path (str): The path to the cassette file.
+            mode (str, optional): ``record`` or ``replay``. Defaults to "record".
+            latency_scale (float, optional): While replaying, the factor applied to recorded latencies. Defaults to 1.0.
+            redact_fields (list, optional): The field names whose values are not recorded. Defaults to None.
+        """
+        if mode not in ('record', 'replay'):
+            raise ValueError('Unsupported cassette mode %s' % mode)
+
+        self.file_path = file_path
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self.redact_fields = set(redact_fields or [])
+
+        self._lock = threading.Lock()
+        self._file = None
+
+        # instance name --> connection details, as recorded
+        self.connections = {}
+
+        # (instance name, request key) --> recorded responses, in order
+        self._interactions = {}
+
+        if mode == 'replay':
+            self._read()
+
+    def _read(self) -> None:
+        """
+        Read a recorded cassette file.
+        """
+        with gzip.open(self.file_path, 'rt', encoding='utf-8') as file:
+            for line in file:
+                entry = json.loads(line)
+                if entry["type"] == "connection":
+                    self.connections[entry["instance"]] = entry["params"]
+                else:
+                    key = (entry["instance"], entry["key"])
+                    self._interactions.setdefault(key, deque()).append((entry["response"], entry["elapsed"]))
+
+    def _write(self, entry: dict) -> None:
+        """
+        Write an entry to the cassette file.
+
+        Args:
+            entry (dict): The entry.
+        """
+        with self._lock:
+            if self._file is None:
+                self._file = gzip.open(self.file_path, 'wt', encoding='utf-8')
+                atexit.register(self.close)
+            self._file.write(json.dumps(entry) + '\n')
+
+    def close(self) -> None:
+        """
+        Close the cassette file. It is also closed at exit.
+        """
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def get_instance_params(self, instance_name: str) -> dict:
+        """
+        Get the recorded connection details of an instance, to replay without the environment settings.
+
+        Args:
+            instance_name (str): The instance name. Ex: source
+
+        Returns:
+            dict: The connection details, with a placeholder password.
+        """
+        if instance_name not in self.connections:
+            raise CassetteMismatchException('No %s connection recorded in cassette %s' % (instance_name, self.file_path))
+
+        # the password is redacted in the recorded requests too, so they match
+        return dict(self.connections[instance_name], password=self.redacted)
+
+    def connect(self, instance_name: str, instance: dict):
+        """
+        Get an offline connection that answers with the recorded responses.
+
+        Args:
+            instance_name (str): The instance name. Ex: source
+            instance (dict): A dictionary with the connection parameters.
+
+        Returns:
+            odoorpc.ODOO: The connection, not logged in yet.
+        """
+        import odoorpc
+
+        version = self.get_instance_params(instance_name)["version"]
+        odoo = odoorpc.ODOO(host=instance['host'], port=instance['port'], protocol=instance['protocol'], version=version)
+        self.wrap(odoo, instance_name, instance)
+
+        return odoo
+
+    def wrap(self, odoo: object, instance_name: str, instance: dict) -> None:
+        """
+        Make a connection record its traffic or answer it from the cassette, depending on the mode.
+
+        Args:
+            odoo (odoorpc.ODOO): The connection.
+            instance_name (str): The instance name. Ex: source
+            instance (dict): A dictionary with the connection parameters.
+        """
+        connector = odoo._connector
+        proxy_json = connector.proxy_json
+        secrets = {instance.get('password')} - {None, ""}
+
+        if self.mode == 'record':
+            params = {key: value for key, value in instance.items() if key != 'password'}
+            params["version"] = odoo.version
+            self._write({"type": "connection", "instance": instance_name, "params": params})
+
+            def handler(url, request):
+                start = time.perf_counter()
+                response = proxy_json(url, request)
+                elapsed = time.perf_counter() - start
+
+                self._write({
+                    "type": "rpc",
+                    "instance": instance_name,
+                    "url": url,
+                    "key": self._request_key(url, request, secrets),
+                    "response": self._redact(response),
+                    "elapsed": elapsed,
+                })
+                return response
+        else:
+            def handler(url, request):
+                return self._replay(instance_name, self._request_key(url, request, secrets))
+
+        connector._proxy_json = ProxyJSON(proxy_json, handler)
+
+    def _replay(self, instance_name: str, key: str) -> dict:
+        """
+        Get the next recorded response of a request, after its (scaled) latency.
+
+        Args:
+            instance_name (str): The instance name.
+            key (str): The request key.
+
+        Raises:
+            CassetteMismatchException: Raised when the request was not recorded, or is made more times than recorded.
+
+        Returns:
+            dict: The JSON response.
+        """
+        with self._lock:
+            responses = self._interactions.get((instance_name, key))
+            if responses is None:
+                raise CassetteMismatchException('Request not recorded in cassette %s: %s %s' % (self.file_path, instance_name, key))
+
+            # a request made more times than recorded means the replayed run diverged
+            if not responses:
+                raise CassetteMismatchException('Request made more times than recorded in cassette %s: %s %s' % (self.file_path, instance_name, key))
+
+            response, elapsed = responses.popleft()
+
+        if self.latency_scale:
+            time.sleep(elapsed * self.latency_scale)
+
+        return response
+
+    def _request_key(self, url: str, request: dict, secrets: set) -> str:
+        """
+        Get the key matching a request with its recording. Passwords and redacted fields are replaced.
+
+        Args:
+            url (str): The request url.
+            request (dict): The request params.
+            secrets (set): The values to hide. Ex: the instance password
+
+        Returns:
+            str: The request key.
+        """
+        return url + ' ' + json.dumps(self._redact(request, secrets), sort_keys=True)
+
+    def _redact(self, value, secrets: set=None):
+        """
+        Replace the secrets and the values of redacted fields in a JSON value.
+
+        Args:
+            value: The JSON value.
+            secrets (set, optional): The string values to hide. Defaults to None.
+
+        Returns:
+            A redacted copy of the value.
+        """
+        if isinstance(value, dict):
+            return {key: self.redacted if key in self.redact_fields else self._redact(item, secrets)
+                    for key, item in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [self._redact(item, secrets) for item in value]
+        if secrets and isinstance(value, str) and value in secrets:
+            return self.redacted
+        return value
+
@@ -3,31 +3,56 @@
 """
 Command line tool to migrate data from one Odoo instance to another::
 
-    usage: cli.py [-h] [--debug] {test,migrate,make-map,make-tree} ...
+    usage: cli.py [-h] [--debug] [--session-cache FILE] [--schema-snapshot FILE] [--record FILE | --replay FILE]
+                  [--replay-latency-scale SCALE] [--redact-fields FIELDS] [--attachment-budget MB] {test,plan,migrate,migrate-plan,extract,load,sync,sync-deletes,rebuild-tracking,verify,retry-failed,make-map,make-tree,snapshot-schema} ...
 
     Odoo Data Migration cli tools.
 
     positional arguments:
-        {test,migrate,make-map,make-tree}
+        {test,plan,migrate,migrate-plan,extract,load,sync,sync-deletes,rebuild-tracking,verify,retry-failed,make-map,make-tree,snapshot-schema}
                         sub-command help
     test                Perform a test login to the source and target instances
+    plan                Estimate the records, RPC calls and duration of migrating an odoo model, without writing anything
     migrate             Migrate an odoo model
+    migrate-plan        Migrate the models listed in a manifest file, in one process
+    extract             Extract an odoo model from the source instance into a staging directory
+    load                Load an odoo model from a staging directory into the target instance
+    sync                Catch up an odoo model with the source records changed since the last sync
+    sync-deletes        Archive or delete the target records whose source records were deleted
+    rebuild-tracking    Rebuild a tracking db from the external ids of records created in load write mode
+    verify              Compare a migrated model between the source and target instances, in chunks
+    retry-failed        Process again the failed records stored in a tracking db
     make-map            Generate a migration map for the model
     make-tree           Generates a relations tree for the model (useful to understand relations)
+    snapshot-schema     Dump the models metadata of both instances into a local file
 
     options:
         -h, --help            show this help message and exit
         --debug               Enable debug mode
+        --session-cache FILE  Reuse logged in sessions stored in FILE (skips the login RPC)
+        --schema-snapshot FILE
+                              Read models metadata from a snapshot FILE instead of the instances
+        --record FILE         Record every RPC request and response into a cassette FILE
+        --replay FILE         Serve RPC responses from a recorded cassette FILE, without contacting the instances
+        --replay-latency-scale SCALE
+                              Factor applied to the recorded latencies while replaying, 0 answers at once
+        --redact-fields FIELDS
+                              Comma separated field names whose values are not recorded
+        --attachment-budget MB
+                              Maximum megabytes of attachment contents read from the source at once
 """
 
 import os
-import copy
+import json
 
 import argparse
 
 from tools import Pretty
 
-from executor import Executor    
+from executor import Executor
+from manifest import MigrationManifest
+from planner import MigrationPlanner
+from schema import SchemaSnapshot
     
     
 
@@ -105,17 +130,18 @@ def _crm_lead_categorizacin_transformer(executor: Executor, data: list) -> dict:
             
     return _data
 
-def remove_phantoms(tracking_db, model=None) -> None:
+def remove_phantoms(tracking_db, model=None, executor_options: dict=None) -> None:
     """
     Remove records that dont exists in the target instance.
     
     Args:
         tracking_db (str): The path to a tracking db to use.
         model (str, optional): The model to work with. Defaults to None (remove phantoms for all models)
+        executor_options (dict, optional): Extra options for the Executor. Defaults to None.
     """
     
-    #: No parameter given to Executor so connection data is loaded from .env file
-    ex = Executor()
+    #: No connection parameter given to Executor so connection data is loaded from .env file
+    ex = Executor(**(executor_options or {}))
 
     #: Do the thing
     result = ex.remove_phantom_ids(model, tracking_db)
@@ -129,17 +155,18 @@ def remove_phantoms(tracking_db, model=None) -> None:
         Pretty.print("No phantom ids found in tracking db")
 
 
-def process_decoupled(tracking_db: str, migration_map: str) -> None:
+def process_decoupled(tracking_db: str, migration_map: str, executor_options: dict=None) -> None:
     """
     Process decoupled records from tracking db.
     
     Args:
         tracking_db (str): The path to a tracking db to use.
         migration_map (str): The path to a file migration map to use.
+        executor_options (dict, optional): Extra options for the Executor. Defaults to None.
     """
     
-    #: No parameter given to Executor so connection data is loaded from .env file
-    ex = Executor()
+    #: No connection parameter given to Executor so connection data is loaded from .env file
+    ex = Executor(**(executor_options or {}))
     
     #: Do the migration
     ex.get_tracking_db(tracking_db)
@@ -190,7 +217,8 @@ def _get_map_path_for_model(model: str) -> str:
         else:
             return None    
     
-def migrate_model(model, source_ids=None, batch_size=10, recursion=4, tracking_db=None, migration_map=None, debug=False):
+def migrate_model(model, source_ids=None, batch_size=10, recursion=4, tracking_db=None, migration_map=None, debug=False,
+                  hierarchy_field=None, upsert=False, executor_options: dict=None):
     """
     Migrate an Odoo model.
 
@@ -202,30 +230,285 @@ def migrate_model(model, source_ids=None, batch_size=10, recursion=4, tracking_d
         tracking_db (str, optional): The path to a tracking db to reuse it. Defaults to None.
         migration_map (str, optional): The path to a file migration map to use. Defaults to None.
         debug (bool, optional): Debug mode (print/log extra data). Defaults to False.
+        hierarchy_field (str, optional): A many2one field pointing to the same model, to migrate level by level. Defaults to None.
+        upsert (bool, optional): Update the records that exist already in the target, instead of creating them. Defaults to False.
+        executor_options (dict, optional): Extra options for the Executor. Defaults to None.
     """
     
-    #: No parameter given to Executor so connection data is loaded from .env file
-    ex = Executor(debug=debug)
+    #: No connection parameter given to Executor so connection data is loaded from .env file
+    ex = Executor(debug=debug, **(executor_options or {}))
     
     #: Load the customized field map from the file
     file_path = migration_map or _get_map_path_for_model(model)
     ex.migration_map.load_from_file(file_path=file_path)
     
     #: Do the migration.
-    ex.migrate(model, batch_size=batch_size, recursion_level=recursion, source_ids=source_ids, tracking_db=tracking_db)
+    ex.migrate(model, batch_size=batch_size, recursion_level=recursion, source_ids=source_ids, tracking_db=tracking_db,
+               hierarchy_field=hierarchy_field, upsert=upsert)
+
+def migrate_manifest(manifest, restart=False, debug=False, executor_options: dict=None):
+    """
+    Migrate the models listed in a manifest file, in order, sharing the connections, caches and tracking db.
+
+    Args:
+        manifest (str): The path to the manifest file, JSON or YAML. See ``MigrationManifest``.
+        restart (bool, optional): Run the steps finished in a previous run again. Defaults to False.
+        debug (bool, optional): Debug mode (print/log extra data). Defaults to False.
+        executor_options (dict, optional): Extra options for the Executor. Defaults to None.
+    """
+    _manifest = MigrationManifest.load(manifest)
+    
+    # steps without a map use the one found for their model
+    for step in _manifest.steps:
+        step['migration_map'] = step.get('migration_map') or _get_map_path_for_model(step['model'])
+    
+    ex = Executor(debug=debug, **(executor_options or {}))
+    result = _manifest.run(ex, restart=restart)
+    
+    Pretty.print("Manifest %s:" % manifest)
+    Pretty.print(result)
+
+def plan_model(model, source_ids=None, batch_size=10, recursion=4, migration_map=None, sample_size=50, report=None,
+               executor_options: dict=None):
+    """
+    Estimate the cost of migrating an Odoo model, and write a JSON report. Nothing is written to the instances.
+
+    Args:
+        model (str): The model name to migrate.
+        source_ids (list, optional): The source ids to migrate. Defaults to None (the whole model).
+        batch_size (int, optional): The batch size of the migration. Defaults to 10.
+        recursion (int, optional): Recursion level of the migration. Defaults to 4.
+        migration_map (str, optional): The path to a file migration map to use. Defaults to None.
+        sample_size (int, optional): Records sampled per model to measure the relations fan-out. Defaults to 50.
+        report (str, optional): The path to the JSON report file. Defaults to None (<model>.plan.json).
+        executor_options (dict, optional): Extra options for the Executor. Defaults to None.
+    """
+    ex = Executor(**(executor_options or {}))
+    
+    file_path = migration_map or _get_map_path_for_model(model)
+    ex.migration_map.load_from_file(file_path=file_path)
+    
+    planner = MigrationPlanner(ex, sample_size=sample_size)
+    result = planner.plan(model, recursion_level=recursion, batch_size=batch_size, source_ids=source_ids)
+    
+    file_path = report or os.path.join(os.getcwd(), "%s.plan.json" % model)
+    with open(file_path, 'w') as file:
+        json.dump(result, file, indent=4, default=str)
+    
+    for model_name, entry in result["models"].items():
+        Pretty.print("%s%s: %s records, %s calls, %.0f s" % ("  " * entry["depth"], model_name, entry["records"], 
+                                                           entry["rpcs"]["total"], entry["seconds"]))
+    
+    duration = result["duration_seconds"]
+    Pretty.print("Model %s plan: %s records in %s batches, %s records overall, %s calls (%.1f per record), "
+                 "latency source %.0f ms target %.0f ms, about %d:%02d:%02d (%.1f s per batch)" % (
+                     model, result["root_records"], result["batches"], result["records"], result["rpcs"]["total"], 
+                     result["rpcs_per_record"], result["latency"]["source"] * 1000, result["latency"]["target"] * 1000,
+                     duration // 3600, duration % 3600 // 60, duration % 60, result["batch_seconds"]))
+    
+    if result["unmapped"]:
+        Pretty.print("Related models not in the migration map: %s" % ", ".join(result["unmapped"]))
+    
+    print("Report written to %s" % file_path)
+
+def extract_model(model, staging_dir, source_ids=None, batch_size=50, recursion=4, migration_map=None, debug=False,
+                  executor_options: dict=None):
+    """
+    Extract an Odoo model, and its related models, from the source instance into a staging directory.
+
+    Args:
+        model (str): The model name to extract.
+        staging_dir (str): The staging directory to write to.
+        source_ids (list, optional): IDs to extract. Defaults to None (the whole model).
+        batch_size (int, optional): The number of records to read per request. Defaults to 50.
+        recursion (int, optional): Recursion level for related models (how deep to go). Defaults to 4.
+        migration_map (str, optional): The path to a file migration map to use. Defaults to None.
+        debug (bool, optional): Debug mode (print/log extra data). Defaults to False.
+        executor_options (dict, optional): Extra options for the Executor. Defaults to None.
+    """
+    ex = Executor(debug=debug, **(executor_options or {}))
+    
+    file_path = migration_map or _get_map_path_for_model(model)
+    ex.migration_map.load_from_file(file_path=file_path)
+    
+    result = ex.extract(model, staging_dir, recursion_level=recursion, batch_size=batch_size, source_ids=source_ids)
+    
+    Pretty.print("Records extracted to %s:" % staging_dir)
+    Pretty.print(result)
+
+def load_model(model, staging_dir, source_ids=None, batch_size=10, recursion=4, tracking_db=None, migration_map=None, debug=False,
+               hierarchy_field=None, upsert=False, executor_options: dict=None):
+    """
+    Load an Odoo model from a staging directory into the target instance.
+
+    Args:
+        model (str): The model name to load.
+        staging_dir (str): The staging directory to read from.
+        source_ids (list, optional): IDs to load. Defaults to None (the extracted ids).
+        batch_size (int, optional): The batch size for the load (to avoid timeouts). Defaults to 10.
+        recursion (int, optional): Recursion level for related models (how deep to go). Defaults to 4.
+        tracking_db (str, optional): The path to a tracking db to reuse it. Defaults to None.
+        migration_map (str, optional): The path to a file migration map to use. Defaults to None.
+        debug (bool, optional): Debug mode (print/log extra data). Defaults to False.
+        hierarchy_field (str, optional): A many2one field pointing to the same model, to load level by level. Defaults to None.
+        upsert (bool, optional): Update the records that exist already in the target, instead of creating them. Defaults to False.
+        executor_options (dict, optional): Extra options for the Executor. Defaults to None.
+    """
+    ex = Executor(debug=debug, **(executor_options or {}))
+    
+    file_path = migration_map or _get_map_path_for_model(model)
+    ex.migration_map.load_from_file(file_path=file_path)
+    
+    ex.load(model, staging_dir, recursion_level=recursion, batch_size=batch_size, source_ids=source_ids, tracking_db=tracking_db,
+            hierarchy_field=hierarchy_field, upsert=upsert)
+
+def sync_model(model, tracking_db, batch_size=50, recursion=4, migration_map=None, debug=False, executor_options: dict=None):
+    """
+    Sync an Odoo model: migrate the source records changed since the last sync, creating or updating them.
+
+    Args:
+        model (str): The model name to sync.
+        tracking_db (str): The path to the tracking db of the initial migration.
+        batch_size (int, optional): The number of records per page. Defaults to 50.
+        recursion (int, optional): Recursion level for related models (how deep to go). Defaults to 4.
+        migration_map (str, optional): The path to a file migration map to use. Defaults to None.
+        debug (bool, optional): Debug mode (print/log extra data). Defaults to False.
+        executor_options (dict, optional): Extra options for the Executor. Defaults to None.
+    """
+    ex = Executor(debug=debug, **(executor_options or {}))
+    
+    file_path = migration_map or _get_map_path_for_model(model)
+    ex.migration_map.load_from_file(file_path=file_path)
+    
+    result = ex.sync(model, recursion_level=recursion, batch_size=batch_size, tracking_db=tracking_db)
+    Pretty.print("Model %s records synced: %s" % (model, result))
+
+def rebuild_tracking(model, tracking_db, migration_map=None, executor_options: dict=None):
+    """
+    Rebuild the tracking of an Odoo model from the external ids of the records created in load write mode.
 
-def make_a_map(model_name: str, recursion_level: int, debug=False):
+    Args:
+        model (str): The model name.
+        tracking_db (str): The path to the tracking db to rebuild, created if it doesnt exist.
+        migration_map (str, optional): The path to a file migration map to use. Defaults to None.
+        executor_options (dict, optional): Extra options for the Executor. Defaults to None.
+    """
+    ex = Executor(**(executor_options or {}))
+    
+    file_path = migration_map or _get_map_path_for_model(model)
+    ex.migration_map.load_from_file(file_path=file_path)
+    
+    result = ex.rebuild_tracking_db(model, tracking_db=tracking_db)
+    Pretty.print("Model %s records added to %s: %s" % (model, tracking_db, result))
+
+def verify_model(model, tracking_db, migration_map=None, chunk_size=1000, report=None, executor_options: dict=None):
+    """
+    Compare a migrated Odoo model between the source and target instances, and write a JSON report.
+
+    Args:
+        model (str): The model name.
+        tracking_db (str): The path to the tracking db of the migration.
+        migration_map (str, optional): The path to a file migration map to use. Defaults to None.
+        chunk_size (int, optional): The number of records compared per chunk. Defaults to 1000.
+        report (str, optional): The path to the JSON report file. Defaults to None (<model>.verify.json).
+        executor_options (dict, optional): Extra options for the Executor. Defaults to None.
+    """
+    ex = Executor(**(executor_options or {}))
+    
+    file_path = migration_map or _get_map_path_for_model(model)
+    ex.migration_map.load_from_file(file_path=file_path)
+    
+    result = ex.verify(model, tracking_db, chunk_size=chunk_size)
+    
+    file_path = report or os.path.join(os.getcwd(), "%s.verify.json" % model)
+    with open(file_path, 'w') as file:
+        json.dump(result, file, indent=4, default=str)
+    
+    summary = {key: result[key] for key in ["source_count", "target_count", "tracked_count", "untracked_in_source", 
+                                            "untracked_in_target", "duplicated_targets_count", "chunks", "mismatching_chunks", 
+                                            "missing_in_source", "missing_in_target", "mismatching_records"]}
+    Pretty.print("Model %s verification:" % model)
+    Pretty.print(summary)
+    
+    print("Report written to %s" % file_path)
+
+def retry_failed(tracking_db, model=None, batch_size=50, recursion=4, max_attempts=3, upsert=False, migration_map=None,
+                 debug=False, executor_options: dict=None):
+    """
+    Process again the failed records stored in a tracking db, model by model.
+
+    Args:
+        tracking_db (str): The path to the tracking db of the migration.
+        model (str, optional): The model to retry. Defaults to None (every model with failed records).
+        batch_size (int, optional): The batch size to use. Defaults to 50.
+        recursion (int, optional): Recursion level for related models (how deep to go). Defaults to 4.
+        max_attempts (int, optional): The attempts after which records are not retried anymore. Defaults to 3.
+        upsert (bool, optional): Update the records that exist already in the target, instead of creating them. Defaults to False.
+        migration_map (str, optional): The path to a file migration map to use. Defaults to None (the map of each model).
+        debug (bool, optional): Debug mode (print/log extra data). Defaults to False.
+        executor_options (dict, optional): Extra options for the Executor. Defaults to None.
+    """
+    ex = Executor(debug=debug, **(executor_options or {}))
+    
+    models = [model] if model else ex.get_failed_models(tracking_db)
+    if not models:
+        Pretty.print("No failed records found in tracking db")
+    
+    for _model in models:
+        file_path = migration_map or _get_map_path_for_model(_model)
+        if not file_path:
+            Pretty.print("No migration map found for model %s, use --migration-map" % _model)
+            continue
+        ex.migration_map.load_from_file(file_path=file_path)
+        
+        result = ex.retry_failed(_model, tracking_db, recursion_level=recursion, batch_size=batch_size, 
+                                 max_attempts=max_attempts, upsert=upsert)
+        Pretty.print("Model %s failed records:" % _model)
+        Pretty.print(result)
+
+def sync_deletes(model, tracking_db, mode="archive", dry_run=False, report=None, executor_options: dict=None):
+    """
+    Archive or delete the target records of an Odoo model whose source records were deleted.
+
+    Args:
+        model (str): The model name.
+        tracking_db (str): The path to the tracking db of the migration.
+        mode (str, optional): archive or unlink. Defaults to "archive".
+        dry_run (bool, optional): Only report what would be removed. Defaults to False.
+        report (str, optional): The path to the JSON report file. Defaults to None (<model>.deletes.json).
+        executor_options (dict, optional): Extra options for the Executor. Defaults to None.
+    """
+    ex = Executor(**(executor_options or {}))
+    
+    result = ex.sync_deletes(model, tracking_db, mode=mode, dry_run=dry_run)
+    
+    file_path = report or os.path.join(os.getcwd(), "%s.deletes.json" % model)
+    with open(file_path, 'w') as file:
+        json.dump(result, file, indent=4)
+    
+    for kind in ["removed", "skipped", "failed"]:
+        for target_model_name, records in result[kind].items():
+            Pretty.print("%s%s %s: %s" % ("[dry run] " if dry_run else "", target_model_name, kind, len(records)))
+    
+    if not any(result[kind] for kind in ["removed", "skipped", "failed"]):
+        Pretty.print("No deleted records found for model %s" % model)
+    
+    print("Report written to %s" % file_path)
+
+def make_a_map(model_name: str, recursion_level: int, debug=False, workers: int=8, executor_options: dict=None):
     """
     Generate a file with a migration map for a model and its relations.
     
     Args:
         model_name (str): The model name.
         recursion_level (int): The recursion level.
+        workers (int, optional): The number of concurrent metadata requests. Defaults to 8.
+        executor_options (dict, optional): Extra options for the Executor. Defaults to None.
     Returns:
         None
     """
-    ex = Executor(debug=debug)
-    res = ex.migration_map.generate_full_map(model_name=model_name, recursion_level=recursion_level)
+    ex = Executor(debug=debug, **(executor_options or {}))
+    res = ex.migration_map.generate_full_map(model_name=model_name, recursion_level=recursion_level, max_workers=workers)
     
     _dir = os.getcwd()
     _dir = os.path.join(_dir, "maps")
@@ -237,18 +520,21 @@ def make_a_map(model_name: str, recursion_level: int, debug=False):
     file_path = os.path.join(_dir, model_name + ".json")
     Pretty.log(res, file_path=file_path)
 
-def make_a_tree(model_name: str, recursion_level: int):
+def make_a_tree(model_name: str, recursion_level: int, output_format: str='txt', show_cycles: bool=False, executor_options: dict=None):
     """
     Generate a file with a tree map for a model.
     
     Args:
         model_name (str): The model name.
         recursion_level (int): The recursion level.
+        output_format (str, optional): The output format: txt (relation tree), dot or json. Defaults to txt.
+        show_cycles (bool, optional): Print the relation cycles found. Defaults to False.
+        executor_options (dict, optional): Extra options for the Executor. Defaults to None.
     
     Returns:
         None
     """
-    ex = Executor(debug=True)
+    ex = Executor(debug=True, **(executor_options or {}))
     res = ex.migration_map.model_tree(model_name=model_name, recursion_level=recursion_level)
     
     _dir = os.getcwd()
@@ -258,9 +544,37 @@ def make_a_tree(model_name: str, recursion_level: int):
     if not os.path.exists(_dir):
         os.makedirs(_dir)
     
-    file_path = os.path.join(_dir, model_name +"_tree.txt")
+    file_path = os.path.join(_dir, model_name + "_tree." + output_format)
     
-    res.save2file(file_path)
+    res.save(file_path, output_format=output_format)
+    
+    if show_cycles:
+        Pretty.print("Relation cycles:")
+        for cycle in res.cycles():
+            print(" <-> ".join(cycle))
+
+def snapshot_schema(file_path: str, models: list=None, workers: int=8, executor_options: dict=None):
+    """
+    Dump the models metadata of the source and target instances into a compressed local file.
+    
+    Args:
+        file_path (str): The path to the snapshot file to write.
+        models (list, optional): The models to dump. Defaults to None (every model).
+        workers (int, optional): The number of concurrent metadata requests. Defaults to 8.
+        executor_options (dict, optional): Extra options for the Executor. Defaults to None.
+    
+    Returns:
+        None
+    """
+    options = dict(executor_options or {})
+    # always ask the live instances
+    options.pop("schema_snapshot", None)
+    
+    ex = Executor(**options)
+    snapshot = SchemaSnapshot.dump(ex, file_path, model_names=models, max_workers=workers)
+    
+    for instance, content in snapshot.instances.items():
+        Pretty.print("%s: %s models from %s" % (SchemaSnapshot.instance_names[instance], len(content["models"]), content["host"]))
 
 def test_instances(debug: bool=False):
     """
@@ -291,8 +605,8 @@ def test_instances(debug: bool=False):
     }
                 
     ex = Executor(debug=debug)
-    ex.test_login(instance=source)
-    ex.test_login(instance=target)
+    ex.test_login(instance=source, instance_name='source')
+    ex.test_login(instance=target, instance_name='target')
     
 def _parse_args():
     """
@@ -304,12 +618,46 @@ def _parse_args():
     
     parser = argparse.ArgumentParser(description="Odoo Data Migration tools.")
     parser.add_argument('--debug', required=False, action="store_true", help='Enable debug mode')
+    parser.add_argument('--session-cache', type=str, required=False, default=None, metavar='FILE',
+                        help='Reuse logged in sessions stored in FILE, skipping the login RPC (optional, string)')
+    parser.add_argument('--schema-snapshot', type=str, required=False, default=None, metavar='FILE',
+                        help='Read models metadata from a snapshot FILE instead of the instances (optional, string)')
+    cassette_group = parser.add_mutually_exclusive_group()
+    cassette_group.add_argument('--record', type=str, required=False, default=None, metavar='FILE',
+                                help='Record every RPC request and response into a cassette FILE (optional, string)')
+    cassette_group.add_argument('--replay', type=str, required=False, default=None, metavar='FILE',
+                                help='Serve RPC responses from a recorded cassette FILE, without contacting the instances (optional, string)')
+    parser.add_argument('--replay-latency-scale', type=float, required=False, default=1.0, metavar='SCALE',
+                        help='Factor applied to the recorded latencies while replaying, 0 answers at once (optional, float, default 1.0)')
+    parser.add_argument('--redact-fields', type=str, required=False, default=None, metavar='FIELDS',
+                        help='Comma separated field names whose values are not recorded. Ex: email,phone (optional, string)')
+    parser.add_argument('--attachment-budget', type=float, required=False, default=None, metavar='MB',
+                        help='Maximum megabytes of attachment contents read from the source at once (optional, float, default 64)')
     
     subparsers = parser.add_subparsers(dest="subcommand", help='sub-command help')
     
     # create the parser for the "test" command
     parser_test = subparsers.add_parser('test', help='Perform a test login to the source and target instances')
     
+    # create the parser for the "plan" command
+    parser_plan = subparsers.add_parser('plan', help='Estimate the records, RPC calls and duration of migrating an odoo model, without writing anything')
+    parser_plan.add_argument('--model', type=str, required=True,
+                             help='The model to work with')
+    parser_plan.add_argument('--ids', type=int, nargs='+', required=False,
+                             default=None, help='IDs to migrate. The whole model is planned if no ids provided (optional, integers space separated)')
+    parser_plan.add_argument('--batch-size', type=int, required=False,
+                             default=10, help='The batch size for the migration (optional, integer, default 10)')
+    parser_plan.add_argument('--recursion', type=int, required=False,
+                             default=4, help='The recursion level for the migration (optional, integer, default 4)')
+    parser_plan.add_argument('--migration-map', type=str, required=False,
+                             default=None, help='The path to a file migration map to use (optional, string, default: search for a map file with the same model name)')
+    parser_plan.add_argument('--write-mode', type=str, required=False, choices=['create', 'load'],
+                             default='create', help='How records would be created in the target: create or load (optional, default create)')
+    parser_plan.add_argument('--sample-size', type=int, required=False,
+                             default=50, help='Records sampled per model to measure the relations fan-out (optional, integer, default 50)')
+    parser_plan.add_argument('--report', type=str, required=False,
+                             default=None, help='The path to the JSON report file (optional, string, default <model>.plan.json)')
+    
     # create the parser for the "migrate" command
     parser_migrate = subparsers.add_parser('migrate', help='Migrate an odoo model')
     parser_migrate.add_argument('--model', type=str, required=True,
@@ -324,6 +672,144 @@ def _parse_args():
                                 default=None, help='The path to a tracking db to reuse it (optional, string)')
     parser_migrate.add_argument('--migration-map', type=str, required=False,
                                 default=None, help='The path to a file migration map to use (optional, string, default: search for a map file with the same model name to migrate)')
+    parser_migrate.add_argument('--write-mode', type=str, required=False, choices=['create', 'load'],
+                                default='create', help='How records are created in the target: create, or load with deterministic external ids so running again updates them (optional, default create)')
+    parser_migrate.add_argument('--metrics-file', type=str, required=False,
+                                default=None, help='Write a metrics snapshot to this file while migrating, Prometheus textfile format if it ends with .prom, JSON otherwise (optional, string)')
+    parser_migrate.add_argument('--progress-interval', type=float, required=False,
+                                default=10, help='Seconds between progress lines and metrics snapshots (optional, float, default 10)')
+    parser_migrate.add_argument('--hierarchy-field', type=str, required=False,
+                                default=None, help='A many2one field pointing to the same model (Ex: parent_id). Records are created level by level, roots first (optional, string)')
+    parser_migrate.add_argument('--upsert', required=False, action="store_true",
+                                help='Update the records that exist already in the target (tracked or found by search keys) with the fields that changed, instead of creating them')
+    parser_migrate.add_argument('--trace', type=str, required=False, dest='trace_file',
+                                default=None, help='Record timing spans of the migration phases into this file, in Chrome trace format (optional, string)')
+
+    # create the parser for the "migrate-plan" command
+    parser_manifest = subparsers.add_parser('migrate-plan', help='Migrate the models listed in a manifest file, in one process')
+    parser_manifest.add_argument('--manifest', type=str, required=True,
+                                 help='The path to the manifest file, JSON or YAML (needs PyYAML) (string)')
+    parser_manifest.add_argument('--restart', required=False, action="store_true",
+                                 help='Run again the steps finished in a previous run, for the records not migrated yet')
+    parser_manifest.add_argument('--write-mode', type=str, required=False, choices=['create', 'load'],
+                                 default='create', help='How records are created in the target: create, or load with deterministic external ids (optional, default create)')
+    parser_manifest.add_argument('--metrics-file', type=str, required=False,
+                                 default=None, help='Write a metrics snapshot to this file while migrating, Prometheus textfile format if it ends with .prom, JSON otherwise (optional, string)')
+    parser_manifest.add_argument('--progress-interval', type=float, required=False,
+                                 default=10, help='Seconds between progress lines and metrics snapshots (optional, float, default 10)')
+    
+    # create the parser for the "extract" command
+    parser_extract = subparsers.add_parser('extract', help='Extract an odoo model from the source instance into a staging directory')
+    parser_extract.add_argument('--model', type=str, required=True,
+                                help='The model to work with')
+    parser_extract.add_argument('--staging', type=str, required=True,
+                                help='The staging directory to write to (string)')
+    parser_extract.add_argument('--ids', type=int, nargs='+', required=False,
+                                default=None, help='IDs to extract. The whole model is extracted if no ids provided (optional, integers space separated)')
+    parser_extract.add_argument('--batch-size', type=int, required=False,
+                                default=50, help='The number of records to read per request (optional, integer, default 50)')
+    parser_extract.add_argument('--recursion', type=int, required=False,
+                                default=4, help='The recursion level for the extraction (optional, integer, default 4)')
+    parser_extract.add_argument('--migration-map', type=str, required=False,
+                                default=None, help='The path to a file migration map to use (optional, string, default: search for a map file with the same model name)')
+
+    # create the parser for the "load" command
+    parser_load = subparsers.add_parser('load', help='Load an odoo model from a staging directory into the target instance')
+    parser_load.add_argument('--model', type=str, required=True,
+                             help='The model to work with')
+    parser_load.add_argument('--staging', type=str, required=True,
+                             help='The staging directory to read from (string)')
+    parser_load.add_argument('--ids', type=int, nargs='+', required=False,
+                             default=None, help='IDs to load. The extracted ids are loaded if no ids provided (optional, integers space separated)')
+    parser_load.add_argument('--batch-size', type=int, required=False,
+                             default=10, help='The batch size for the load (optional, integer, default 10)')
+    parser_load.add_argument('--recursion', type=int, required=False,
+                             default=4, help='The recursion level for the load (optional, integer, default 4)')
+    parser_load.add_argument('--tracking-db', type=str, required=False,
+                             default=None, help='The path to a tracking db to reuse it (optional, string)')
+    parser_load.add_argument('--migration-map', type=str, required=False,
+                             default=None, help='The path to a file migration map to use (optional, string, default: search for a map file with the same model name)')
+    parser_load.add_argument('--hierarchy-field', type=str, required=False,
+                             default=None, help='A many2one field pointing to the same model (Ex: parent_id). Records are created level by level, roots first (optional, string)')
+    parser_load.add_argument('--upsert', required=False, action="store_true",
+                             help='Update the records that exist already in the target (tracked or found by search keys) with the fields that changed, instead of creating them')
+    parser_load.add_argument('--write-mode', type=str, required=False, choices=['create', 'load'],
+                             default='create', help='How records are created in the target: create, or load with deterministic external ids so running again updates them (optional, default create)')
+    parser_load.add_argument('--metrics-file', type=str, required=False,
+                             default=None, help='Write a metrics snapshot to this file while loading, Prometheus textfile format if it ends with .prom, JSON otherwise (optional, string)')
+    parser_load.add_argument('--progress-interval', type=float, required=False,
+                             default=10, help='Seconds between progress lines and metrics snapshots (optional, float, default 10)')
+
+    # create the parser for the "sync" command
+    parser_sync = subparsers.add_parser('sync', help='Catch up an odoo model with the source records changed since the last sync')
+    parser_sync.add_argument('--model', type=str, required=True,
+                             help='The model to work with')
+    parser_sync.add_argument('--tracking-db', type=str, required=True,
+                             help='The path to the tracking db of the initial migration, it keeps the sync watermarks (string)')
+    parser_sync.add_argument('--batch-size', type=int, required=False,
+                             default=50, help='The number of records per page (optional, integer, default 50)')
+    parser_sync.add_argument('--recursion', type=int, required=False,
+                             default=4, help='The recursion level for the sync (optional, integer, default 4)')
+    parser_sync.add_argument('--migration-map', type=str, required=False,
+                             default=None, help='The path to a file migration map to use (optional, string, default: search for a map file with the same model name)')
+    parser_sync.add_argument('--write-mode', type=str, required=False, choices=['create', 'load'],
+                             default='create', help='How records are created in the target: create, or load with deterministic external ids so running again updates them (optional, default create)')
+    parser_sync.add_argument('--metrics-file', type=str, required=False,
+                             default=None, help='Write a metrics snapshot to this file while syncing, Prometheus textfile format if it ends with .prom, JSON otherwise (optional, string)')
+    parser_sync.add_argument('--progress-interval', type=float, required=False,
+                             default=10, help='Seconds between progress lines and metrics snapshots (optional, float, default 10)')
+
+    # create the parser for the "sync-deletes" command
+    parser_sync_deletes = subparsers.add_parser('sync-deletes', help='Archive or delete the target records whose source records were deleted')
+    parser_sync_deletes.add_argument('--model', type=str, required=True,
+                                     help='The model to work with')
+    parser_sync_deletes.add_argument('--tracking-db', type=str, required=True,
+                                     help='The path to the tracking db of the migration (string)')
+    parser_sync_deletes.add_argument('--mode', type=str, required=False, choices=['archive', 'unlink'],
+                                     default='archive', help='Archive (active=False) or unlink the target records (optional, default archive)')
+    parser_sync_deletes.add_argument('--dry-run', required=False, action="store_true",
+                                     help='Only report what would be removed')
+    parser_sync_deletes.add_argument('--report', type=str, required=False,
+                                     default=None, help='The path to the JSON report file (optional, string, default <model>.deletes.json)')
+
+    # create the parser for the "rebuild-tracking" command
+    parser_rebuild = subparsers.add_parser('rebuild-tracking', help='Rebuild a tracking db from the external ids of records created in load write mode')
+    parser_rebuild.add_argument('--model', type=str, required=True,
+                                help='The model to work with')
+    parser_rebuild.add_argument('--tracking-db', type=str, required=True,
+                                help='The path to the tracking db to rebuild, created if it doesnt exist (string)')
+    parser_rebuild.add_argument('--migration-map', type=str, required=False,
+                                default=None, help='The path to a file migration map to use (optional, string, default: search for a map file with the same model name)')
+
+    # create the parser for the "verify" command
+    parser_verify = subparsers.add_parser('verify', help='Compare a migrated model between the source and target instances, in chunks')
+    parser_verify.add_argument('--model', type=str, required=True,
+                               help='The model to work with')
+    parser_verify.add_argument('--tracking-db', type=str, required=True,
+                               help='The path to the tracking db of the migration (string)')
+    parser_verify.add_argument('--migration-map', type=str, required=False,
+                               default=None, help='The path to a file migration map to use (optional, string, default: search for a map file with the same model name)')
+    parser_verify.add_argument('--chunk-size', type=int, required=False,
+                               default=1000, help='The number of records compared per chunk (optional, integer, default 1000)')
+    parser_verify.add_argument('--report', type=str, required=False,
+                               default=None, help='The path to the JSON report file (optional, string, default <model>.verify.json)')
+
+    # create the parser for the "retry-failed" command
+    parser_retry = subparsers.add_parser('retry-failed', help='Process again the failed records stored in a tracking db')
+    parser_retry.add_argument('--tracking-db', type=str, required=True,
+                              help='The path to the tracking db of the migration (string)')
+    parser_retry.add_argument('--model', type=str, required=False,
+                              default=None, help='The model to retry (optional, default: every model with failed records)')
+    parser_retry.add_argument('--batch-size', type=int, required=False,
+                              default=50, help='The batch size to use (optional, integer, default 50)')
+    parser_retry.add_argument('--recursion', type=int, required=False,
+                              default=4, help='The recursion level for the migration (optional, integer, default 4)')
+    parser_retry.add_argument('--max-attempts', type=int, required=False,
+                              default=3, help='Records failed this many times are not retried anymore (optional, integer, default 3)')
+    parser_retry.add_argument('--upsert', required=False, action="store_true",
+                              help='Update the records that exist already in the target with the fields that changed, instead of creating them')
+    parser_retry.add_argument('--migration-map', type=str, required=False,
+                              default=None, help='The path to a file migration map to use (optional, string, default: search for a map file per model)')
 
     # create the parser for the "make-map" command
     parser_make_map = subparsers.add_parser('make-map', 
@@ -332,6 +818,8 @@ def _parse_args():
                                  help='The model to work with')
     parser_make_map.add_argument('--recursion', type=int, required=False,
                                  default=4, help='The recursion level to use (optional, integer, default 4)')
+    parser_make_map.add_argument('--workers', type=int, required=False,
+                                 default=8, help='The number of concurrent metadata requests (optional, integer, default 8)')
 
     # create the parser for the "make-tree" command
     parser_make_tree = subparsers.add_parser('make-tree',
@@ -340,7 +828,21 @@ def _parse_args():
                                   help='The model to work with')
     parser_make_tree.add_argument('--recursion', type=int, required=False,
                                   default=4, help='The recursion level to use (optional, integer, default 4)')
-    
+    parser_make_tree.add_argument('--format', type=str, required=False, choices=['txt', 'dot', 'json'],
+                                  default='txt', help='The output format: relation tree text, Graphviz DOT or JSON (optional, string, default txt)')
+    parser_make_tree.add_argument('--cycles', required=False, action="store_true",
+                                  help='Print the relation cycles found (optional)')
+    
+    
+    # create the parser for the "snapshot-schema" command
+    parser_snapshot = subparsers.add_parser('snapshot-schema',
+                                            help='Dump the models metadata of both instances into a local file')
+    parser_snapshot.add_argument('--output', type=str, required=False, default='schema.json.gz',
+                                 help='The path to the snapshot file to write (optional, string, default schema.json.gz)')
+    parser_snapshot.add_argument('--models', type=str, nargs='+', required=False, default=None,
+                                 help='The models to dump (optional, strings space separated, default: every model)')
+    parser_snapshot.add_argument('--workers', type=int, required=False,
+                                 default=8, help='The number of concurrent metadata requests (optional, integer, default 8)')
     
     # create the parser for the "remove-phantoms" command
     parser_phantoms = subparsers.add_parser('remove-phantoms',
@@ -362,22 +864,92 @@ def _parse_args():
     
     return args
 
+def _executor_options(args) -> dict:
+    """
+    Get the Executor options shared by all the sub-commands.
+    
+    Args:
+        args (argparse.Namespace): The parsed arguments.
+    
+    Returns:
+        dict: The keyword arguments to pass to the Executor.
+    """
+    options = {"session_cache": args.session_cache, "schema_snapshot": args.schema_snapshot}
+    
+    # RPC record / replay
+    options["record"] = args.record
+    options["replay"] = args.replay
+    options["replay_latency_scale"] = args.replay_latency_scale
+    if args.redact_fields:
+        options["redact_fields"] = [field.strip() for field in args.redact_fields.split(',') if field.strip()]
+    
+    if args.attachment_budget:
+        options["attachment_budget"] = int(args.attachment_budget * 1024 * 1024)
+    
+    # sub-command specific options
+    if getattr(args, "metrics_file", None):
+        options["metrics_file"] = args.metrics_file
+    if getattr(args, "progress_interval", None) is not None:
+        options["progress_interval"] = args.progress_interval
+    if getattr(args, "write_mode", None):
+        options["write_mode"] = args.write_mode
+    if getattr(args, "trace_file", None):
+        options["trace_file"] = args.trace_file
+    
+    return options
+
 if __name__ == "__main__":
     
     args = _parse_args()
+    options = _executor_options(args)
     
     if args.subcommand == 'test':
         test_instances(debug=args.debug)
+    elif args.subcommand == 'plan':
+        plan_model(model=args.model, source_ids=args.ids, batch_size=args.batch_size, recursion=args.recursion,
+                   migration_map=args.migration_map, sample_size=args.sample_size, report=args.report,
+                   executor_options=options)
     elif args.subcommand == 'migrate':
         migrate_model(model=args.model, source_ids=args.ids, batch_size=args.batch_size,
                       recursion=args.recursion, tracking_db=args.tracking_db,
-                      migration_map=args.migration_map, debug=args.debug)
+                      migration_map=args.migration_map, debug=args.debug, hierarchy_field=args.hierarchy_field,
+                      upsert=args.upsert, executor_options=options)
+    elif args.subcommand == 'migrate-plan':
+        migrate_manifest(manifest=args.manifest, restart=args.restart, debug=args.debug, executor_options=options)
+    elif args.subcommand == 'extract':
+        extract_model(model=args.model, staging_dir=args.staging, source_ids=args.ids, batch_size=args.batch_size,
+                      recursion=args.recursion, migration_map=args.migration_map, debug=args.debug, executor_options=options)
+    elif args.subcommand == 'load':
+        load_model(model=args.model, staging_dir=args.staging, source_ids=args.ids, batch_size=args.batch_size,
+                   recursion=args.recursion, tracking_db=args.tracking_db, migration_map=args.migration_map,
+                   debug=args.debug, hierarchy_field=args.hierarchy_field, upsert=args.upsert,
+                   executor_options=options)
+    elif args.subcommand == 'sync':
+        sync_model(model=args.model, tracking_db=args.tracking_db, batch_size=args.batch_size, recursion=args.recursion,
+                   migration_map=args.migration_map, debug=args.debug, executor_options=options)
+    elif args.subcommand == 'sync-deletes':
+        sync_deletes(model=args.model, tracking_db=args.tracking_db, mode=args.mode, dry_run=args.dry_run,
+                     report=args.report, executor_options=options)
+    elif args.subcommand == 'rebuild-tracking':
+        rebuild_tracking(model=args.model, tracking_db=args.tracking_db, migration_map=args.migration_map,
+                         executor_options=options)
+    elif args.subcommand == 'verify':
+        verify_model(model=args.model, tracking_db=args.tracking_db, migration_map=args.migration_map,
+                     chunk_size=args.chunk_size, report=args.report, executor_options=options)
+    elif args.subcommand == 'retry-failed':
+        retry_failed(tracking_db=args.tracking_db, model=args.model, batch_size=args.batch_size, recursion=args.recursion,
+                     max_attempts=args.max_attempts, upsert=args.upsert, migration_map=args.migration_map, debug=args.debug,
+                     executor_options=options)
     elif args.subcommand == 'make-map':
-        make_a_map(model_name=args.model, recursion_level=args.recursion, debug=args.debug)
+        make_a_map(model_name=args.model, recursion_level=args.recursion, debug=args.debug, workers=args.workers,
+                   executor_options=options)
     elif args.subcommand == 'make-tree':
-        make_a_tree(model_name=args.model, recursion_level=args.recursion)
+        make_a_tree(model_name=args.model, recursion_level=args.recursion, output_format=args.format,
+                    show_cycles=args.cycles, executor_options=options)
+    elif args.subcommand == 'snapshot-schema':
+        snapshot_schema(file_path=args.output, models=args.models, workers=args.workers, executor_options=options)
     elif args.subcommand == 'remove-phantoms':
-        remove_phantoms(model=args.model, tracking_db=args.tracking_db)
+        remove_phantoms(model=args.model, tracking_db=args.tracking_db, executor_options=options)
     elif args.subcommand == 'process-decoupled':
-        process_decoupled(tracking_db=args.tracking_db, migration_map=args.migration_map)
+        process_decoupled(tracking_db=args.tracking_db, migration_map=args.migration_map, executor_options=options)
 
@@ -34,4 +34,16 @@ class NoDecoupledRelationException(Exception):
     """
     Raised when a decoupled relation is expected but none was found.
     """
-    pass
\ No newline at end of file
+    pass
+
+class CassetteMismatchException(Exception):
+    """
+    Raised when, replaying a cassette, a request is made that was not recorded, or more times than recorded.
+    """
+    pass
+
+class LoadException(Exception):
+    """
+    Raised when the target rejects records sent through the ``load`` method.
+    """
+    pass
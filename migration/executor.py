@@ -13,16 +13,21 @@ from typing import Union
 
 import traceback
 
-from colorama import Fore, Back, Style
-from unidecode import unidecode
-
-import odoorpc
+import json
+import hashlib
 import sqlite3
+from concurrent.futures import ThreadPoolExecutor
 from sqlite3 import Connection as SQLite3Connection
 
-from tools import Pretty
+from tools import Pretty, RunLogger
 from mapping import MigrationMap
-from exceptions import TooDeepException, UnsupportedRelationException, NoDecoupledRelationException
+from schema import SchemaSnapshot
+from staging import StagingStore
+from metrics import MigrationMetrics
+from tracing import Tracer, traced
+from cassette import Cassette
+from throttle import Throttle
+from exceptions import TooDeepException, UnsupportedRelationException, NoDecoupledRelationException, LoadException
 
 
 class Executor(object):
@@ -31,8 +36,8 @@ class Executor(object):
     It provides methods to establish connections to the source and target servers, migrate data, and perform other related operations.
     """
 
-    source_odoo = None
-    target_odoo = None
+    _source_odoo = None
+    _target_odoo = None
     
     model_name = None
     target_model_name = None
@@ -43,6 +48,9 @@ class Executor(object):
     #: An instance of MigrationMap
     migration_map = None
     
+    #: A StagingStore to read source records from, instead of the source instance. See ``load``.
+    staging = None
+    
     recursion_mode = None
     """ 
     The recursion mode to use while traversing relations. Defaults to "w".
@@ -54,12 +62,30 @@ class Executor(object):
     #: Set the relation types to traverse
     relation_types = ['one2many', 'many2one', 'many2many']
     
+    #: The model whose records are transferred with ``_create_attachments``, reading binaries within ``attachment_budget``
+    attachment_model = 'ir.attachment'
+    
+    #: The model migrated with ``_migrate_messages``, streamed in the ``message_order`` order
+    message_model = 'mail.message'
+    
+    #: The order messages are migrated in, so the messages of a document are created together and after their parents
+    message_order = 'model ASC, res_id ASC, create_date ASC, id ASC'
+    
+    #: The module of the external ids given to records created in ``load`` write mode
+    xmlid_module = '__migration__'
+    
     #: Options / Values to set on context. By default disables tracking and subscribe.
     record_create_options = {'tracking_disable': True, 'mail_create_nosubscribe': True}
 
-    def __init__(self, source: dict=None, target: dict=None, debug: bool=False, recursion_mode: str="w") -> None:
+    def __init__(self, source: dict=None, target: dict=None, debug: bool=False, recursion_mode: str="w", 
+                 session_cache: str=None, schema_snapshot: str=None, metrics_file: str=None, progress_interval: float=10,
+                 trace_file: str=None, record: str=None, replay: str=None, replay_latency_scale: float=1.0,
+                 redact_fields: list=None, write_mode: str="create", attachment_budget: int=64 * 1024 * 1024) -> None:
         """
         Initializes a new instance of the Executor class.
+        
+        Connections to the source and target servers are not opened here, but the first time 
+        each instance is used (see ``source_odoo`` and ``target_odoo``).
 
         Args:
             source (dict): A dictionary containing the connection details for the source server.
@@ -68,39 +94,56 @@ class Executor(object):
             recursion_mode (str): The recursion mode to apply. Defaults to "w".
                 - h: Halt, if cant traverse a relation because of recursion level
                 - w: Warn, and wipe the field from map, if cant traverse a relation because of recursion level
+            session_cache (str): Path to a session cache file. If given, logged in sessions are 
+                stored there and reused by later runs, skipping the login RPC. Defaults to None.
+            schema_snapshot (str): Path to a schema snapshot file (see ``SchemaSnapshot``). If given, 
+                models metadata is read from it instead of the instances. Defaults to None.
+            metrics_file (str): Path to a metrics snapshot file, updated while migrating. Prometheus textfile 
+                format if it ends with ``.prom``, JSON otherwise. Defaults to None.
+            progress_interval (float): Seconds between progress lines / metrics snapshots. Defaults to 10.
+            trace_file (str): Path to a trace file. If given, timing spans of the migration phases are recorded 
+                and written there in Chrome trace format (see ``Tracer``). Defaults to None.
+            record (str): Path to a cassette file. If given, every RPC request and response of the 
+                connections is recorded there (see ``Cassette``). Defaults to None.
+            replay (str): Path to a recorded cassette file. If given, no instance is contacted, 
+                RPC responses are served from the cassette. Defaults to None.
+            replay_latency_scale (float): While replaying, the factor applied to the recorded latencies. 
+                0 answers at once. Defaults to 1.0.
+            redact_fields (list): Field names whose values are not recorded in the cassette. Defaults to None.
+            write_mode (str): How records are created in the target. Defaults to "create".
+                - create: with the ``create`` method.
+                - load: with the ``load`` method, giving each record a deterministic external id 
+                  (see ``get_xmlid``). Running again updates the records instead of duplicating them, 
+                  even without the tracking db, that can be rebuilt with ``rebuild_tracking_db``.
+            attachment_budget (int): The maximum bytes of attachment contents read from the source at once. 
+                Defaults to 64 MB. See ``_create_attachments``.
         """
+        if write_mode not in ('create', 'load'):
+            raise ValueError('Unsupported write mode %s, use create or load' % write_mode)
+        
         env_path = find_dotenv(usecwd=True)
         load_dotenv(dotenv_path=env_path)
                 
         self.debug = debug
                 
         self.recursion_mode = recursion_mode
-                        
-        if source is None:
-            source = {
-                "host": os.environ["SOURCE_HOST"],
-                "port": os.environ["SOURCE_PORT"],
-                "bd": os.environ["SOURCE_DB"],
-                "protocol": os.environ.get("SOURCE_PROTOCOL", 'jsonrpc'),
-                "user": os.environ["SOURCE_DB_USER"],
-                "password": os.environ["SOURCE_DB_PASSWORD"],
-            }
-
-        if target is None:
-            target = {
-                "host": os.environ["TARGET_HOST"],
-                "port": os.environ["TARGET_PORT"],
-                "bd": os.environ["TARGET_DB"],
-                "protocol": os.environ.get("TARGET_PROTOCOL", 'jsonrpc'),
-                "user": os.environ["TARGET_DB_USER"],
-                "password": os.environ["TARGET_DB_PASSWORD"],
-            }
-        
-        # gets a logged in connection to the source server
-        self.source_odoo = self.get_connection(source)
-        
-        # gets a logged in connection to the target server
-        self.target_odoo = self.get_connection(target)
+        
+        self.write_mode = write_mode
+        
+        self.attachment_budget = attachment_budget
+        
+        self.session_cache = session_cache
+        
+        # fields metadata per (instance, model_name), see get_fields
+        self._fields_cache = {}
+        
+        self.schema_snapshot = None
+        if schema_snapshot:
+            self.schema_snapshot = SchemaSnapshot.load(schema_snapshot)
+        
+        # connection details are read from the environment only when a connection is needed
+        self._source = source
+        self._target = target
         
         self.migration_map = MigrationMap(self)
         
@@ -112,6 +155,43 @@ class Executor(object):
         log_file_name = "%s.log" % self.run_id
         self.log_path = os.path.join(working_dir, log_file_name)
         
+        #: Structured (JSON Lines) run logger. Entries are written in background.
+        self.logger = RunLogger(self.log_path, run_id=self.run_id)
+        
+        #: Progress counters, throughput and ETA
+        self.metrics = MigrationMetrics(progress_interval=progress_interval, snapshot_path=metrics_file, run_id=self.run_id)
+        
+        #: Timing spans of the migration phases. Disabled if no trace file is given.
+        self.tracer = Tracer(trace_file)
+        
+        #: The ids tracking db connection, see ``get_tracking_db``
+        self.tracking_db = None
+        self._tracking_db_path = None
+        
+        # per run identity memo, see _format_data and _track_ids
+        # (source_model_name, source_id) of the records being formatted / created
+        self._in_flight = set()
+        # (source_model_name, source_id) --> (target_model_name, target_id) of the records already migrated
+        self._resolved = {}
+        # links to in flight records, written once both ends exist. See _apply_deferred_links
+        self._deferred_links = []
+        # one2many children created with their parent, tracked once the parent exists. See _track_children
+        self._pending_children = []
+        # source model name --> source ids tracked in this run (and in the current batch) whose decoupled 
+        # relation is not written yet. See process_decoupled_relations
+        self._pending_decoupled = {}
+        self._batch_decoupled = {}
+        
+        #: RPC pacing per instance name (source, target), configured by the environment. See ``Throttle.from_env``
+        self.throttles = {}
+        
+        #: Records or replays the RPC traffic, if set
+        self.cassette = None
+        if replay:
+            self.cassette = Cassette(replay, mode='replay', latency_scale=replay_latency_scale, redact_fields=redact_fields)
+        elif record:
+            self.cassette = Cassette(record, mode='record', redact_fields=redact_fields)
+        
     @property
     def debug(self):
         """
@@ -136,31 +216,273 @@ class Executor(object):
         else:
             sys.tracebacklimit = 0
 
-    def get_connection(self, instance):
+    @property
+    def source(self) -> dict:
+        """
+        Get the connection details for the source server.
+        If none were given at init time, they are loaded from the ``SOURCE_*`` environment variables
+        (or from the cassette, when replaying).
+
+        Returns:
+            dict: The connection details.
+        """
+        if self._source is None:
+            self._source = self._get_instance_params("SOURCE", "source")
+        return self._source
+
+    @property
+    def target(self) -> dict:
+        """
+        Get the connection details for the target server.
+        If none were given at init time, they are loaded from the ``TARGET_*`` environment variables
+        (or from the cassette, when replaying).
+
+        Returns:
+            dict: The connection details.
+        """
+        if self._target is None:
+            self._target = self._get_instance_params("TARGET", "target")
+        return self._target
+
+    @property
+    def source_odoo(self):
+        """
+        Get the connection to the source server. The connection is opened the first time it is used.
+
+        Returns:
+            odoorpc.ODOO: The connection to the source server.
+        """
+        if self._source_odoo is None:
+            self._source_odoo = self.get_connection(self.source, 'source')
+            if self.schema_snapshot:
+                self.schema_snapshot.install(self._source_odoo, 1)
+        return self._source_odoo
+
+    @source_odoo.setter
+    def source_odoo(self, value):
+        self._source_odoo = value
+
+    @property
+    def target_odoo(self):
+        """
+        Get the connection to the target server. The connection is opened the first time it is used.
+
+        Returns:
+            odoorpc.ODOO: The connection to the target server.
+        """
+        if self._target_odoo is None:
+            self._target_odoo = self.get_connection(self.target, 'target')
+            if self.schema_snapshot:
+                self.schema_snapshot.install(self._target_odoo, 2)
+        return self._target_odoo
+
+    @target_odoo.setter
+    def target_odoo(self, value):
+        self._target_odoo = value
+
+    def _get_instance_params(self, prefix: str, instance_name: str=None) -> dict:
+        """
+        Read the connection details of an instance from the environment.
+        When replaying a cassette, the recorded connection details are used instead.
+
+        Args:
+            prefix (str): The environment variables prefix. Ex: SOURCE, TARGET
+            instance_name (str, optional): The instance name in the cassette. Ex: source, target
+
+        Returns:
+            dict: The connection details.
+        """
+        if self._replaying:
+            return self.cassette.get_instance_params(instance_name or prefix.lower())
+        
+        return {
+            "host": os.environ["%s_HOST" % prefix],
+            "port": os.environ["%s_PORT" % prefix],
+            "bd": os.environ["%s_DB" % prefix],
+            "protocol": os.environ.get("%s_PROTOCOL" % prefix, 'jsonrpc'),
+            "user": os.environ["%s_DB_USER" % prefix],
+            "password": os.environ["%s_DB_PASSWORD" % prefix],
+        }
+
+    @property
+    def _replaying(self) -> bool:
+        """
+        Check if RPC responses are served from a cassette.
+
+        Returns:
+            bool: True when replaying.
+        """
+        return self.cassette is not None and self.cassette.mode == 'replay'
+
+    def get_connection(self, instance, instance_name: str, use_session_cache: bool=True):
         """
-        Get the connection to the server
+        Get the connection to the server.
+        If a session cache is configured and holds a session for the instance, it is reused
+        and no login RPC is made.
+        
+        When recording a cassette the session cache is not used, so the login is recorded too.
+        When replaying, an offline connection is returned and the login is answered from the cassette.
+        
+        Calls are paced by the ``<SOURCE|TARGET>_RPC_RATE``, ``_RPC_CONCURRENCY`` and ``_RPC_ADAPTIVE`` 
+        environment variables, if set (see ``Throttle``).
 
         Args:
             instance (dict): A dictionary with the connection parameters.
+            instance_name (str): The instance name, used for the cassette and the throttle. Ex: source, target
+            use_session_cache (bool): If False, always do a real login. Defaults to True.
 
         Returns:
             odoorpc.ODOO: The connection to the server.
         """
+        import odoorpc
+        
+        if self._replaying:
+            odoo = self.cassette.connect(instance_name, instance)
+            odoo.login(instance['bd'], instance['user'], instance['password'])
+            return odoo
+        
+        if self.cassette is not None:
+            use_session_cache = False
+        
+        session = None
+        if use_session_cache:
+            session = self._load_session(instance)
+        
+        if session:
+            # the server version is cached too, so no version RPC is made either
+            odoo = odoorpc.ODOO(host=instance['host'], port=instance['port'], protocol=instance['protocol'], 
+                                version=session['version'])
+            self._restore_session(odoo, instance, session)
+            self._throttle(odoo, instance_name)
+        else:
+            # Prepare the connection to the server
+            odoo = odoorpc.ODOO(host=instance['host'], port=instance['port'], protocol=instance['protocol'])
+            
+            if self.cassette is not None:
+                self.cassette.wrap(odoo, instance_name, instance)
+            
+            # paced outside the cassette, so waits are not recorded as latency
+            self._throttle(odoo, instance_name)
+            
+            # Login
+            odoo.login(instance['bd'], instance['user'], instance['password'])
+            
+            if use_session_cache:
+                self._save_session(odoo, instance)
+        
+        return odoo
+
+    def _throttle(self, odoo, instance_name: str) -> None:
+        """
+        Pace the calls of a connection, if limits are configured for the instance.
+        Connections to the same instance share the limits.
+
+        Args:
+            odoo (odoorpc.ODOO): The connection.
+            instance_name (str): The instance name. Ex: source, target
+        """
+        if instance_name not in self.throttles:
+            self.throttles[instance_name] = Throttle.from_env(instance_name.upper())
         
-        # Prepare the connection to the server
-        odoo = odoorpc.ODOO(host=instance['host'], port=instance['port'], protocol=instance['protocol'])
+        throttle = self.throttles[instance_name]
+        if throttle is not None:
+            throttle.wrap(odoo)
+    
+    def _session_key(self, instance: dict) -> str:
+        """
+        Get the key identifying an instance session in the session cache.
+
+        Args:
+            instance (dict): A dictionary with the connection parameters.
+
+        Returns:
+            str: The session key. Ex: admin@localhost:8069/db_name
+        """
+        return "%s@%s:%s/%s" % (instance['user'], instance['host'], instance['port'], instance['bd'])
+
+    def _read_session_cache(self) -> dict:
+        """
+        Read the session cache file.
+
+        Returns:
+            dict: The cached sessions, an empty dict if there is no cache or it cant be read.
+        """
+        if not self.session_cache or not os.path.exists(self.session_cache):
+            return {}
+        
+        try:
+            with open(self.session_cache, 'r') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def _load_session(self, instance: dict) -> dict:
+        """
+        Get a cached session for the instance.
+
+        Args:
+            instance (dict): A dictionary with the connection parameters.
+
+        Returns:
+            dict: The cached session (version, db, uid, context) or None if not found.
+        """
+        return self._read_session_cache().get(self._session_key(instance))
+
+    def _save_session(self, odoo, instance: dict) -> None:
+        """
+        Store a logged in session in the session cache.
+        Passwords are not stored, they are always taken from the connection details.
         
-        # Login
-        odoo.login(instance['bd'], instance['user'], instance['password'])
+        .. note:: Only sessions to Odoo >= 10 are cached. Older versions keep state in the 
+            server side web session, which cant be restored.
+
+        Args:
+            odoo (odoorpc.ODOO): A logged in connection.
+            instance (dict): A dictionary with the connection parameters.
+        """
+        if not self.session_cache:
+            return
+        
+        try:
+            major_version = int(str(odoo.version).split('.')[0].split('saas~')[-1])
+        except ValueError:
+            return
+        if major_version < 10:
+            return
+        
+        sessions = self._read_session_cache()
+        sessions[self._session_key(instance)] = {
+            "version": odoo.version,
+            "db": odoo.env.db,
+            "uid": odoo.env.uid,
+            "context": odoo.env.context,
+        }
+        
+        with open(self.session_cache, 'w') as file:
+            json.dump(sessions, file, indent=4)
+
+    def _restore_session(self, odoo, instance: dict, session: dict) -> None:
+        """
+        Restore a cached session on a not logged in connection.
+
+        Args:
+            odoo (odoorpc.ODOO): The connection to restore the session on.
+            instance (dict): A dictionary with the connection parameters.
+            session (dict): The cached session.
+        """
+        from odoorpc.env import Environment
         
-        return odoo
+        odoo._env = Environment(odoo, session['db'], session['uid'], context=session['context'])
+        odoo._login = instance['user']
+        odoo._password = instance['password']
 
-    def test_login(self, instance) -> bool:
+    def test_login(self, instance, instance_name: str) -> bool:
         """
         Test login in to instance
         
         Args:
             instance (dict): A dictionary with the connection parameters.
+            instance_name (str): The instance name. Ex: source, target
         
         Returns:
             bool: True if the login was successful, False otherwise.
@@ -169,7 +491,7 @@ class Executor(object):
         
         try:                
             # gets a loggued in connection to the server
-            odoo = self.get_connection(instance)
+            odoo = self.get_connection(instance, instance_name, use_session_cache=False)
             
             Pretty.print('OK')
             
@@ -183,7 +505,8 @@ class Executor(object):
       
     def get_fields(self, instance: int, model_name: str, required_only=False, summary_only=True) -> list:
         """
-        Get fields for the model
+        Get fields for the model.
+        The fields metadata is fetched once per instance and model, later calls are served from memory.
 
         Args:
             instance (int): An int representing the instance to get the fields from (1: source, 2: target).
@@ -194,23 +517,17 @@ class Executor(object):
         Returns:
             list: The fields for the model.
         """
-        # gets a loggued in connection to the server
-        if instance == 1:
-            odoo = self.source_odoo
-        elif instance == 2:
-            odoo = self.target_odoo
-        else:
+        if instance not in (1, 2):
             print('Invalid instance value. Use 1 for source and 2 for target.')
-        
-        # gets the model
-        if model_name in odoo.env:
-            model = odoo.env[model_name]
-        else:
-            print('Model %s not found in the instance %s' % (model_name, odoo.host))
             return []
         
-        # gets the fields
-        fields = model.fields_get()
+        key = (instance, model_name)
+        if key not in self._fields_cache:
+            self._fields_cache[key] = self._fetch_fields(instance, model_name)
+        
+        fields = self._fields_cache[key]
+        if fields is None:
+            return [] if summary_only else {}
         
         # filter required fields
         if required_only:
@@ -218,8 +535,79 @@ class Executor(object):
         
         if summary_only:
             fields = list(fields.keys())
+        elif isinstance(fields, dict):
+            fields = fields.copy()
         
         return fields
+    
+    def get_fields_many(self, requests: list, max_workers: int=8) -> dict:
+        """
+        Get the full fields metadata for several models at once.
+        Models not yet in memory are fetched concurrently from their instances.
+
+        Args:
+            requests (list): A list of (instance, model_name) tuples. Ex: [(1, 'res.partner'), (2, 'res.partner')]
+            max_workers (int): The maximum number of concurrent requests. Defaults to 8.
+
+        Returns:
+            dict: The fields metadata keyed by (instance, model_name).
+        """
+        missing = [key for key in dict.fromkeys(requests) if key not in self._fields_cache]
+        
+        if missing:
+            # open the connections here, so the worker threads dont race to do it
+            for instance in set(key[0] for key in missing):
+                if not (self.schema_snapshot and self.schema_snapshot.covers(instance)):
+                    self.source_odoo if instance == 1 else self.target_odoo
+            
+            with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+                results = pool.map(lambda key: self._fetch_fields(*key), missing)
+                for key, fields in zip(missing, results):
+                    self._fields_cache[key] = fields
+        
+        return {key: self.get_fields(key[0], key[1], summary_only=False) for key in requests}
+    
+    def _fetch_fields(self, instance: int, model_name: str) -> dict:
+        """
+        Fetch the fields metadata for the model from the instance.
+
+        Args:
+            instance (int): An int representing the instance to get the fields from (1: source, 2: target).
+            model_name (str): The model to get the fields for.
+
+        Returns:
+            dict: The fields metadata or None if the model does not exist in the instance.
+        """
+        # work offline if the instance is in the schema snapshot
+        if self.schema_snapshot and self.schema_snapshot.covers(instance):
+            return self.schema_snapshot.get_fields(instance, model_name)
+        
+        # gets a loggued in connection to the server
+        odoo = self.source_odoo if instance == 1 else self.target_odoo
+        
+        # gets the model
+        if model_name not in odoo.env:
+            instance_params = self.source if instance == 1 else self.target
+            print('Model %s not found in the instance %s' % (model_name, instance_params['host']))
+            return None
+        
+        # gets the fields
+        return odoo.execute(model_name, 'fields_get')
+    
+    def _get_fields_metadata(self, instance: int, model_name: str, fields: list) -> dict:
+        """
+        Get the metadata of some fields of the model, as ``fields_get(fields)`` would return it.
+
+        Args:
+            instance (int): An int representing the instance to get the fields from (1: source, 2: target).
+            model_name (str): The model to get the fields for.
+            fields (list): The field names.
+
+        Returns:
+            dict: The metadata of the fields that exist in the model.
+        """
+        model_fields = self.get_fields(instance, model_name, summary_only=False)
+        return {field: model_fields[field] for field in fields if field in model_fields}
  
     def search_in_target(self, model_name: str, source_id: int, target_model_name: str=None, search_keys: dict=None) -> list:
         """ 
@@ -242,14 +630,14 @@ class Executor(object):
         if search_keys is None:
             search_keys = self.migration_map.get_search_keys(model_name)
         
-        source_model = self.source_odoo.env[model_name]
+        from unidecode import unidecode
+        
         target_model = self.target_odoo.env[target_model_name]
         
-        source_fields_to_read = list(search_keys.keys())
+        source_fields_to_read = self._search_key_fields(search_keys)
         target_fields_to_read = list(search_keys.values())
         
-        source_recordset = source_model.browse(source_id)
-        source_data = source_recordset[0]
+        source_data = self._read_source(model_name, [source_id], source_fields_to_read)[0]
         
         _data = False
         
@@ -260,14 +648,19 @@ class Executor(object):
                 _found = target_model.search_count([['id', '=', source_id]])
                 if _found:
                     recordset = target_model.browse(source_id)
-                    _found = unidecode(recordset.display_name) == unidecode(source_data.display_name)
+                    _found = unidecode(recordset.display_name) == unidecode(source_data['display_name'])
                     
                     if _found:
                         _data = [source_id]
                         break
             
             else:
-                source_key_value = getattr(source_data, s_key) 
+                source_key_value = source_data.get(s_key)
+                
+                # many2one keys are read as [id, display_name]
+                if isinstance(source_key_value, list):
+                    source_key_value = source_key_value[0]
+                
                 if source_key_value:
                     _found = target_model.search([[t_key, '=', source_key_value]])
                     if _found:
@@ -275,6 +668,88 @@ class Executor(object):
                         break
         
         return _data
+    
+    def _search_key_fields(self, search_keys: dict) -> list:
+        """
+        Get the source fields needed to search a record in the target model by its ``search keys``.
+
+        Args:
+            search_keys (dict): The search keys.
+
+        Returns:
+            list: The source field names.
+        """
+        fields = [s_key for s_key, t_key in search_keys.items() if t_key.lower() != 'id']
+        
+        # records searched by id are compared by display name
+        if len(fields) < len(search_keys):
+            fields.append('display_name')
+        
+        return fields
+    
+    @traced('source read', 'model_name', 'ids')
+    def _read_source(self, model_name: str, ids: list, fields: list) -> list:
+        """
+        Read records from the source.
+        When a staging store is in use (see ``load``), records are read from it instead of the source instance.
+
+        Args:
+            model_name (str): The source model name.
+            ids (list): The ids to read.
+            fields (list): The fields to read.
+
+        Returns:
+            list: The records data, in the given ids order.
+        """
+        if self.staging is not None:
+            return self.staging.read(model_name, list(ids), fields)
+        
+        return self.source_odoo.env[model_name].browse(ids).read(fields)
+    
+    def _search_source(self, model_name: str, domain: list=None, order: str=None) -> list:
+        """
+        Search record ids in the source.
+        When a staging store is in use, domains and order are not supported and the extracted root ids are returned.
+
+        Args:
+            model_name (str): The source model name.
+            domain (list, optional): The search domain. Defaults to None (all records).
+            order (str, optional): The search order. Defaults to None (the model order).
+
+        Returns:
+            list: The ids found.
+        """
+        if self.staging is not None:
+            return self.staging.roots(model_name)
+        
+        if order:
+            return self.source_odoo.env[model_name].search(domain or [], order=order)
+        
+        return self.source_odoo.env[model_name].search(domain or [])
+    
+    def _order_source_ids(self, model_name: str, ids: list, fields_metadata: dict) -> list:
+        """
+        Order source ids by creation date, when the model has a ``create_date`` field. 
+        Its important for example for messages.
+
+        Args:
+            model_name (str): The source model name.
+            ids (list): The ids to order.
+            fields_metadata (dict): The model fields metadata.
+
+        Returns:
+            list: The ordered ids.
+        """
+        # turns outs that not every model has the automatic field create_date
+        if "create_date" not in fields_metadata.keys():
+            return ids
+        
+        if self.staging is not None:
+            records = self.staging.read(model_name, list(ids), ['create_date'])
+            records.sort(key=lambda record: (not record.get('create_date'), record.get('create_date') or ''))
+            return [record['id'] for record in records]
+        
+        return self.source_odoo.env[model_name].search([['id', 'in', ids]], order='create_date ASC')
  
     def search_in_tracking_db(self, source_model_name: str, source_id: int) -> list:
         """
@@ -293,7 +768,56 @@ class Executor(object):
         record = cursor.fetchone()
         return record if record else []
     
-    def migrate(self, model_name: str, migration_map: Union[dict, list]=None, recursion_level: int=0, batch_size=50, source_ids: list=None, tracking_db=None) -> bool:
+    def _find_migrated(self, source_model_name: str, source_id: int) -> list:
+        """
+        Search for a record already migrated, first in the run memo and then in the tracking database.
+
+        Args:
+            source_model_name (str): Source model name to search for.
+            source_id (int): Source id to search for.
+
+        Returns:
+            list: A list with the target_model_name and target_id if found, an empty list otherwise.
+        """
+        found = self._resolved.get((source_model_name, source_id))
+        if found:
+            return list(found)
+        
+        return self.search_in_tracking_db(source_model_name, source_id)
+    
+    def _find_migrated_many(self, source_model_name: str, source_ids: list) -> dict:
+        """
+        Search for records already migrated, first in the run memo and then in the tracking database, in bulk.
+
+        Args:
+            source_model_name (str): Source model name to search for.
+            source_ids (list): Source ids to search for.
+
+        Returns:
+            dict: The (target_model_name, target_id) per source id found.
+        """
+        result = {}
+        pending = []
+        for source_id in source_ids:
+            found = self._resolved.get((source_model_name, source_id))
+            if found:
+                result[source_id] = found
+            else:
+                pending.append(source_id)
+        
+        cursor = self.tracking_db.cursor()
+        
+        # keep well below the sqlite variables limit
+        for batch in self._split_into_batches(pending, 500):
+            cursor.execute('SELECT source_id, target_model_name, target_id FROM ids_tracking WHERE source_model_name = ? AND source_id IN (%s)' % ','.join('?' * len(batch)),
+                           [source_model_name] + list(batch))
+            for source_id, target_model_name, target_id in cursor.fetchall():
+                result.setdefault(source_id, (target_model_name, target_id))
+        
+        return result
+    
+    def migrate(self, model_name: str, migration_map: Union[dict, list]=None, recursion_level: int=0, batch_size=50, source_ids: list=None, tracking_db=None,
+                hierarchy_field: str=None, upsert: bool=False, domain: list=None, resume: bool=False) -> bool:
         """
         Migrate data from source to target
 
@@ -304,101 +828,1140 @@ class Executor(object):
             batch_size (int): The batch size to use when migrating a large dataset. Defaults to 100.
             source_ids (list): A list of source ids to migrate. If present it will migrate only the provided ids. Defaults to None.
             tracking_db (str): A tracking database file path to reuse it. Defaults to None (creates a new one).
+            hierarchy_field (str): A many2one field of the model pointing to itself. Ex: parent_id. If given, records are 
+                migrated level by level (roots first), in multi-record creates, and the field is set from the records 
+                created in the previous levels instead of traversing it. Defaults to None.
+            upsert (bool): If True, records already tracked or found by search keys in the target are updated 
+                with the fields that changed, instead of created again. See ``_upsert``. Defaults to False.
+            domain (list): A search domain selecting the source records to migrate, if no ``source_ids`` are given. 
+                Defaults to None (all the records).
+            resume (bool): Skip the source records tracked already, to resume an interrupted migration. Defaults to False.
+        
+        .. note:: When the whole model is migrated, the sync watermark is set to the last source record changed 
+            before the migration started, so a later ``sync`` only reads the records changed since.
         """
         
-        if migration_map is None and self.migration_map.map is None:
-            print('Migration map not provided')
+        if not self._prepare_migration(model_name, migration_map, tracking_db):
             return False
-        elif migration_map is not None:
-            self.migration_map.normalice_fields(migration_map)
-        
-        # get or initialize the tracking db
-        self.get_tracking_db(tracking_db)
-        
-        # match target context with source context to avoid translation and datetimes problems
-        self._match_context()
         
-        # gets the source and target models
-        self.source_model = self.source_odoo.env[model_name]
-        self.target_model_name = self.migration_map.get_target_model(model_name)
-        self.target_model = self.target_odoo.env[self.target_model_name]
+        # taken before reading, so records changed while migrating are synced later
+        watermark = None
+        if not source_ids and not domain and self.staging is None:
+            watermark = self._get_source_watermark(model_name)
         
         # get the source and target fields for the migration
         main_model_fields_map = self.migration_map.get_mapping(model_name)["fields"]
-        
-        source_fields = list(main_model_fields_map.keys())
-        target_fields = list(main_model_fields_map.values())
                 
         # get source ids to migrate 
         if not source_ids:
-            ids = self.source_model.search([])
+            # messages are streamed grouped by document (see _migrate_messages)
+            order = self.message_order if model_name == self.message_model and not hierarchy_field else None
+            ids = self._search_source(model_name, domain, order=order)
         else:
             ids = source_ids
         
+        if resume:
+            migrated = self._find_migrated_many(model_name, ids)
+            ids = [_id for _id in ids if _id not in migrated]
+            print('Model %s: %s records migrated already, %s left' % (model_name, len(migrated), len(ids)))
+        
         # take into consideration the batch size
-        batches = [ids]
+        batches = [ids] if ids else []
         if len(ids) > batch_size:
             batches = self._split_into_batches(ids, batch_size)
+        
+        # or create hierarchies level by level
+        hierarchy_levels = {}
+        if hierarchy_field:
+            if not isinstance(main_model_fields_map.get(hierarchy_field), str):
+                print('Hierarchy field %s.%s not found in the migration map' % (model_name, hierarchy_field))
+                return False
             
-        for batch in batches:
-            src_data = []
-            tgt_data = []
+            hierarchy_levels = self._get_hierarchy_levels(model_name, ids, hierarchy_field)
+            batches = []
+            for level in sorted(set(hierarchy_levels.values())):
+                level_ids = [_id for _id in ids if hierarchy_levels[_id] == level]
+                batches.extend(self._split_into_batches(level_ids, batch_size))
             
-            try:
-                # get data from source instance
-                recordset = self.source_model.browse(batch)
-                src_data = recordset.read(source_fields)
-                
-                # format it to be feed in the target instance
-                tgt_data = self._format_data(model_name=model_name, data=src_data, recursion_level=recursion_level)
-
-                # creates the records at target instance
-                res = self.target_model.create(tgt_data)
-                
-                self._track_ids(model_name, batch, self.migration_map.get_target_model(model_name), res)
-                
-                self.process_decoupled_relations()
-                
-                # print the results
-                _message = 'Model %s IDs migrated: %s' % (model_name, batch)                
-                print(_message)
-                
-            except Exception as e:
-                result_message = 'Processing error for model % s. Source IDs: %s' % (model_name, batch)
-                
-                l = {"msg": result_message, "error": repr(e)}
-                if self.debug:
-                    stack_trace = traceback.format_exc()
-                    l.update({"stack_trace": stack_trace, "source_data": src_data, "target_data": tgt_data})
-                Pretty.log(l, self.log_path, overwrite=True, mode='a')
-                
-                print(result_message)
-                    
+            print('Model %s hierarchy: %s levels' % (model_name, len(set(hierarchy_levels.values()))))
+        
+        self.metrics.start(model_name, total=len(ids), batches=len(batches))
+            
+        for batch_number, batch in enumerate(batches, start=1):
+            self._migrate_batch(model_name, batch, batch_number, recursion_level=recursion_level, upsert=upsert,
+                                hierarchy_field=hierarchy_field, hierarchy_levels=hierarchy_levels)
+        
+        # never moved backwards, a sync may have gone further
+        if watermark and (self._get_watermark(model_name) or ('', 0)) < watermark:
+            self._set_watermark(model_name, *watermark)
+        
+        self._finish_migration()
+        
         return True
     
-    def _format_data(self, model_name: str, data: Union[dict, list], recursion_level: int = 0) -> dict:
+    def sync(self, model_name: str, recursion_level: int=0, batch_size=50, tracking_db=None) -> int:
         """
-        Formats the data to be feed in the target instance:
-            - Traverse relational fields.
-            - Changes field names.
-            - Executes callables.
+        Catch up the target with the source records changed since the last sync (or migration) of the model.
+        
+        A per model watermark (the ``write_date`` and id of the last record synced) is kept in the tracking db.
+        Source records changed after it are streamed in ``write_date``, id order, a page of ``batch_size`` 
+        records at a time. Records already tracked are updated with the fields that changed, the others are 
+        created (see ``_upsert``). The watermark is moved after every page, so an interrupted sync resumes 
+        where it stopped.
+        
+        .. note:: A migration of the whole model sets the watermark (see ``migrate``). Without one (the model 
+            was neither migrated in full nor synced before) every record of the model is synced. The watermark 
+            stops before the first failed page: the next pages are still synced, and the next sync starts 
+            again from the failed page.
 
         Args:
-            model_name (str): The model name to migrate.
-            data (Union[dict, list]): The data to format.
-            recursion_level (int, optional): The recursion level to apply. Relational field deeper than recursion_level wont be considered/formatted. Defaults to 0.
+            model_name (str): The model name to sync.
+            recursion_level (int): The recursion level to apply. Defaults to 0.
+            batch_size (int): The number of records per page. Defaults to 50.
+            tracking_db (str): The tracking database file path, the one of the initial migration. Defaults to None (creates a new one).
 
         Returns:
-            dict: The data properly formatted to be feed in the target instance.
+            int: The number of records synced.
         """
+        if not self._prepare_migration(model_name, tracking_db=tracking_db):
+            return 0
         
-        # gets the fields mapping for the main model
-        model_fields_map = self.migration_map.get_mapping(model_name)['fields']
+        source_model = self.source_odoo.env[model_name]
+        
+        watermark = self._get_watermark(model_name)
+        domain = self._watermark_domain(watermark)
+        
+        total = source_model.search_count(domain)
+        print('Model %s: %s records changed since %s' % (model_name, total, watermark[0] if watermark else 'ever'))
+        
+        self.metrics.start(model_name, total=total, batches=-(-total // batch_size))
+        
+        synced = 0
+        batch_number = 0
+        failed = False
+        while True:
+            # keyset pagination, so pages dont shift while records are being changed
+            records = source_model.search_read(domain, ['write_date'], order='write_date ASC, id ASC', limit=batch_size)
+            if not records:
+                break
+            
+            batch_number += 1
+            batch = [record['id'] for record in records]
+            if self._migrate_batch(model_name, batch, batch_number, recursion_level=recursion_level, upsert=True):
+                synced += len(batch)
+            else:
+                failed = True
+            
+            # the watermark never moves past a failed page, the next sync picks it up again
+            page_end = (records[-1]['write_date'], records[-1]['id'])
+            if not failed:
+                self._set_watermark(model_name, *page_end)
+            domain = self._watermark_domain(page_end)
+        
+        if failed:
+            print('Model %s: some pages failed, the watermark was kept before the first one. Sync again to retry them' % model_name)
+        
+        self._finish_migration()
+        
+        return synced
+    
+    def _watermark_domain(self, watermark: tuple) -> list:
+        """
+        Get the domain of the records changed after a watermark.
+
+        Args:
+            watermark (tuple): The (write_date, id) of the last record synced, or None.
+
+        Returns:
+            list: The search domain.
+        """
+        if not watermark:
+            return []
+        
+        write_date, last_id = watermark
+        return ['|', ['write_date', '>', write_date], '&', ['write_date', '=', write_date], ['id', '>', last_id]]
+    
+    def _get_source_watermark(self, model_name: str) -> tuple:
+        """
+        Get the (write_date, id) of the last record changed in the source.
+
+        Args:
+            model_name (str): The source model name.
+
+        Returns:
+            tuple: The (write_date, id) of the last record changed, or None if the model is empty or has no ``write_date``.
+        """
+        if not self._get_fields_metadata(1, model_name, ['write_date']):
+            return None
+        
+        records = self.source_odoo.env[model_name].search_read([], ['write_date'], order='write_date DESC, id DESC', limit=1)
+        if not records or not records[0]['write_date']:
+            return None
+        
+        return (records[0]['write_date'], records[0]['id'])
+    
+    def _get_watermark(self, model_name: str) -> tuple:
+        """
+        Get the sync watermark of a model from the tracking db.
+
+        Args:
+            model_name (str): The source model name.
+
+        Returns:
+            tuple: The (write_date, id) of the last record synced, or None.
+        """
+        cursor = self.tracking_db.cursor()
+        cursor.execute('SELECT write_date, last_id FROM sync_watermarks WHERE model_name = ?', (model_name,))
+        return cursor.fetchone()
+    
+    def _set_watermark(self, model_name: str, write_date: str, last_id: int) -> None:
+        """
+        Store the sync watermark of a model in the tracking db.
+
+        Args:
+            model_name (str): The source model name.
+            write_date (str): The write date of the last record synced.
+            last_id (int): The id of the last record synced.
+        """
+        cursor = self.tracking_db.cursor()
+        cursor.execute('INSERT OR REPLACE INTO sync_watermarks VALUES (?, ?, ?)', (model_name, write_date, last_id))
+        self.tracking_db.commit()
+    
+    def _prepare_migration(self, model_name: str, migration_map: Union[dict, list]=None, tracking_db: str=None) -> bool:
+        """
+        Get everything ready to migrate a model: the migration map, the tracking db, the context and the models.
+
+        Args:
+            model_name (str): The model name to migrate.
+            migration_map (Union[dict, list]): The migration map to use. Defaults to None.
+            tracking_db (str): A tracking database file path to reuse it. Defaults to None (creates a new one).
+
+        Returns:
+            bool: False if there is no migration map.
+        """
+        if migration_map is None and self.migration_map.map is None:
+            print('Migration map not provided')
+            return False
+        elif migration_map is not None:
+            self.migration_map.normalice_fields(migration_map)
+        
+        # get or initialize the tracking db
+        self.get_tracking_db(tracking_db)
+        
+        # match target context with source context to avoid translation and datetimes problems
+        self._match_context()
+        
+        # gets the source and target models
+        if self.staging is None:
+            self.source_model = self.source_odoo.env[model_name]
+        self.target_model_name = self.migration_map.get_target_model(model_name)
+        self.target_model = self.target_odoo.env[self.target_model_name]
+        
+        return True
+    
+    def _migrate_batch(self, model_name: str, batch: list, batch_number: int, recursion_level: int=0, upsert: bool=False,
+                       hierarchy_field: str=None, hierarchy_levels: dict=None) -> bool:
+        """
+        Migrate a batch of records. Errors are logged, not raised.
+
+        Args:
+            model_name (str): The model name to migrate.
+            batch (list): The source ids.
+            batch_number (int): The batch number, for the progress and traces.
+            recursion_level (int): The recursion level to apply. Defaults to 0.
+            upsert (bool): Update the records that exist already. Defaults to False.
+            hierarchy_field (str): The many2one field pointing to the parent, in hierarchy mode. Defaults to None.
+            hierarchy_levels (dict): The depth per selected source id, in hierarchy mode. Defaults to None.
+
+        Returns:
+            bool: True if the batch was migrated.
+        """
+        main_model_fields_map = self.migration_map.get_mapping(model_name)["fields"]
+        source_fields = list(main_model_fields_map.keys())
+        
+        src_data = []
+        tgt_data = []
+        success = True
+        self._batch_decoupled = {}
+        
+        with self.tracer.span('batch', model_name=model_name, batch=batch_number, records=len(batch)):
+            try:
+                if model_name == self.attachment_model and not upsert and not hierarchy_field:
+                    # metadata first, contents within the attachment budget (see _create_attachments)
+                    src_data = self._read_source(model_name, batch, self._get_attachment_fields(model_name)[0])
+                    self.metrics.incr(model_name, 'read', len(src_data))
+                    
+                    res = self._create_attachments(model_name, src_data, recursion_level=recursion_level)
+                    self.metrics.incr(model_name, 'created', len(res))
+                    
+                    self._track_ids(model_name, [record['id'] for record in src_data], self.target_model_name, res)
+                elif model_name == self.message_model and not upsert and not hierarchy_field:
+                    self._migrate_messages(model_name, batch, recursion_level=recursion_level)
+                else:
+                    # get data from source instance
+                    src_data = self._read_source(model_name, batch, source_fields)
+                    self.metrics.incr(model_name, 'read', len(src_data))
+                
+                    # parents of previous levels are already created, so dont traverse them
+                    parent_ids = {}
+                    if hierarchy_field:
+                        parent_ids = self._pop_hierarchy_links(src_data, hierarchy_field, hierarchy_levels)
+                
+                    # format it to be feed in the target instance
+                    tgt_data = self._format_data(model_name=model_name, data=src_data, recursion_level=recursion_level)
+                
+                    if parent_ids:
+                        self._set_hierarchy_links(model_name, batch, tgt_data, main_model_fields_map[hierarchy_field], parent_ids)
+
+                    if upsert:
+                        # updates the records that exist already, creates the others
+                        self._upsert(model_name, batch, tgt_data)
+                    else:
+                        # creates the records at target instance
+                        res = self._create_records(model_name, batch, self.target_model_name, tgt_data)
+                        self.metrics.incr(model_name, 'created', len(res))
+                    
+                        self._track_ids(model_name, batch, self.migration_map.get_target_model(model_name), res)
+                
+                # links back to records of the batch tree can be written now
+                self._apply_deferred_links()
+                
+                # the decoupled relations of the records this batch tracked, if their related record exists already
+                for _model_name, source_ids in self._batch_decoupled.items():
+                    self.process_decoupled_relations(_model_name, sorted(source_ids), final=False)
+                
+                # records failed in a previous run are migrated now
+                self._clear_failures(model_name, batch, 'migrate')
+                
+            except Exception as e:
+                success = False
+                
+                # records of a failed batch are not being created anymore
+                self._in_flight.clear()
+                self._pending_children = []
+                
+                result_message = 'Processing error for model % s. Source IDs: %s' % (model_name, batch)
+                
+                l = {"msg": result_message, "model": model_name, "source_ids": batch, "error": repr(e)}
+                debug_payload = None
+                if self.debug:
+                    stack_trace = traceback.format_exc()
+                    debug_payload = {"stack_trace": stack_trace, "source_data": src_data, "target_data": tgt_data}
+                self.logger.log(l, debug_payload=debug_payload)
+                self.metrics.incr(model_name, 'failed', len(batch))
+                self._record_failures(model_name, batch, 'migrate', e)
+                
+                print(result_message)
+            
+        # print the progress, from time to time
+        self.metrics.batch_done(len(batch))
+        
+        return success
+    
+    def _discard_pending_children(self, model_name: str, source_ids: set) -> None:
+        """
+        Forget the one2many children pending of records whose one2many commands are not written.
+
+        Args:
+            model_name (str): The source model name of the parents.
+            source_ids (set): The source ids of the parents.
+        """
+        pending_children = []
+        for entry in self._pending_children:
+            if entry['model'] == model_name and entry['source_id'] in source_ids:
+                self.metrics.incr(entry['child_model'], 'created', -len(entry['child_ids']))
+            else:
+                pending_children.append(entry)
+        self._pending_children = pending_children
+    
+    def _finish_migration(self) -> None:
+        """
+        Write what is left of a migration run: deferred links, decoupled relations, progress, trace and log.
+        """
+        self._apply_deferred_links()
+        self._log_deferred_links()
+        
+        # decoupled relations of this run whose related record is still not migrated are failed now, once.
+        # Those left by previous runs are processed by retry_failed (or the process-decoupled command)
+        pending_decoupled, self._pending_decoupled = self._pending_decoupled, {}
+        for _model_name, source_ids in pending_decoupled.items():
+            self.process_decoupled_relations(_model_name, sorted(source_ids))
+        
+        self.metrics.tick(force=True)
+        
+        self.tracer.save()
+        
+        # make sure every log entry of the run is on disk
+        self.logger.close()
+    
+    def _upsert(self, model_name: str, source_ids: list, data: list) -> None:
+        """
+        Create or update formatted records in the target instance.
+        
+        Records already tracked, or found in the target by the search keys, are updated with the fields 
+        whose value changed (see ``_write_changes``). The others are created with a single call and tracked.
+        
+        .. note:: one2many values of existing records are not updated, and fields emptied in the source are not cleared.
+
+        Args:
+            model_name (str): The source model name.
+            source_ids (list): The source ids, in the data order.
+            data (list): The formatted records.
+        """
+        target_model_name = self.migration_map.get_target_model(model_name)
+        search_keys = self.migration_map.get_search_keys(model_name)
+        
+        # match the records, first in the run memo / tracking db, in bulk
+        migrated = self._find_migrated_many(model_name, source_ids)
+        matched = {source_id: found[1] for source_id, found in migrated.items()}
+        
+        found_source_ids, found_target_ids = [], []
+        for source_id in source_ids:
+            if source_id in matched or not search_keys:
+                continue
+            
+            _found = self.search_in_target(model_name=model_name, source_id=source_id, 
+                                           search_keys=search_keys, target_model_name=target_model_name)
+            if _found:
+                matched[source_id] = _found[0]
+                found_source_ids.append(source_id)
+                found_target_ids.append(_found[0])
+        
+        # one2many commands of existing records are not written, so their children wont be created
+        self._discard_pending_children(model_name, set(matched))
+        
+        for source_id, found in migrated.items():
+            self._in_flight.discard((model_name, source_id))
+            self._resolved[(model_name, source_id)] = tuple(found)
+        
+        if found_source_ids:
+            self._track_ids(model_name, found_source_ids, target_model_name, found_target_ids)
+        
+        self.metrics.incr(model_name, 'matched', len(matched))
+        
+        new_source_ids, new_data, updates = [], [], {}
+        for source_id, values in zip(source_ids, data):
+            if source_id in matched:
+                updates[matched[source_id]] = values
+            else:
+                new_source_ids.append(source_id)
+                new_data.append(values)
+        
+        if updates:
+            updated = self._write_changes(target_model_name, updates)
+            self.metrics.incr(model_name, 'updated', updated)
+        
+        if new_data:
+            res = self._create_records(model_name, new_source_ids, target_model_name, new_data)
+            self.metrics.incr(model_name, 'created', len(res))
+            
+            self._track_ids(model_name, new_source_ids, target_model_name, res)
+    
+    def _write_changes(self, target_model_name: str, values: dict) -> int:
+        """
+        Write on existing target records only the fields whose value changed.
+        
+        The current values are read with one call. Records with identical changes are written with one call.
+        many2one values are compared by id and many2many values as sets (written with a ``(6, 0, ids)`` command).
+        one2many values are skipped.
+
+        Args:
+            target_model_name (str): The target model name.
+            values (dict): The formatted values per target id.
+
+        Returns:
+            int: The number of records updated.
+        """
+        fields_metadata = self.get_fields(2, target_model_name, summary_only=False)
+        fields = sorted({field for _values in values.values() for field in _values if field in fields_metadata})
+        
+        current = {}
+        if fields:
+            records = self.target_odoo.env[target_model_name].browse(list(values.keys())).read(fields)
+            current = {record['id']: record for record in records}
+        
+        writes = {}
+        for target_id, _values in values.items():
+            changes = {}
+            for field, value in _values.items():
+                field_type = fields_metadata.get(field, {}).get('type')
+                if field_type is None or field_type == 'one2many':
+                    continue
+                
+                old_value = current.get(target_id, {}).get(field)
+                
+                if field_type == 'many2many':
+                    if not all(isinstance(_id, int) for _id in value):
+                        continue
+                    if set(old_value or []) != set(value):
+                        changes[field] = [(6, 0, sorted(value))]
+                    continue
+                
+                # many2one values are read as [id, display_name]
+                if field_type == 'many2one' and isinstance(old_value, list):
+                    old_value = old_value[0]
+                
+                if old_value != value and (old_value or value):
+                    changes[field] = value
+            
+            if changes:
+                key = json.dumps(changes, sort_keys=True, default=str)
+                writes.setdefault(key, (changes, []))[1].append(target_id)
+        
+        updated = 0
+        for changes, target_ids in writes.values():
+            self._target_write(target_model_name, target_ids, changes)
+            updated += len(target_ids)
+        
+        return updated
+    
+    def _get_hierarchy_levels(self, model_name: str, ids: list, hierarchy_field: str) -> dict:
+        """
+        Get the depth of every record in the hierarchy made by the selected ids.
+        The parent links are read once. Records whose parent is not selected are roots (depth 0).
+
+        Args:
+            model_name (str): The source model name.
+            ids (list): The selected source ids.
+            hierarchy_field (str): The many2one field pointing to the parent. Ex: parent_id
+
+        Returns:
+            dict: The depth per source id.
+        """
+        parents = {}
+        for batch in self._split_into_batches(ids, 1000):
+            for record in self._read_source(model_name, batch, [hierarchy_field]):
+                value = record.get(hierarchy_field)
+                parents[record['id']] = value[0] if value else None
+        
+        levels = {}
+        for _id in ids:
+            # walk up to a known level or a root
+            path = []
+            current = _id
+            while current not in levels and current in parents and current not in path:
+                path.append(current)
+                current = parents[current]
+            
+            # a cycle, or a parent that is not selected, makes a root
+            level = levels[current] + 1 if current in levels else 0
+            for node in reversed(path):
+                levels[node] = level
+                level += 1
+        
+        return levels
+    
+    def _pop_hierarchy_links(self, data: list, hierarchy_field: str, hierarchy_levels: dict) -> dict:
+        """
+        Take the parent links to selected records out of the source data, so they are not traversed.
+
+        Args:
+            data (list): The source records.
+            hierarchy_field (str): The many2one field pointing to the parent. Ex: parent_id
+            hierarchy_levels (dict): The depth per selected source id. See ``_get_hierarchy_levels``.
+
+        Returns:
+            dict: The source parent id per source id.
+        """
+        parent_ids = {}
+        for record in data:
+            value = record.get(hierarchy_field)
+            
+            # parents out of the selection are processed as any other relation
+            if value and value[0] in hierarchy_levels and hierarchy_levels.get(record['id'], 0) > 0:
+                parent_ids[record['id']] = value[0]
+                record.pop(hierarchy_field)
+        
+        return parent_ids
+    
+    def _set_hierarchy_links(self, model_name: str, source_ids: list, data: list, target_field: str, parent_ids: dict) -> None:
+        """
+        Set the parent links of formatted records, from the parents already migrated.
+
+        Args:
+            model_name (str): The source model name.
+            source_ids (list): The source ids, in the data order.
+            data (list): The formatted records.
+            target_field (str): The target field pointing to the parent.
+            parent_ids (dict): The source parent id per source id.
+        """
+        for source_id, record in zip(source_ids, data):
+            if source_id not in parent_ids:
+                continue
+            
+            found = self._find_migrated(model_name, parent_ids[source_id])
+            if found:
+                record[target_field] = found[1]
+            else:
+                message = "Parent not migrated. %s.id=%s --> %s.id=%s" % (model_name, source_id, model_name, parent_ids[source_id])
+                self.logger.log({'msg': message, 'model': model_name, 'source_id': source_id, 'error': 'Record not migrated'})
+    
+    def extract(self, model_name: str, staging_dir: str, recursion_level: int=0, batch_size=50, source_ids: list=None) -> dict:
+        """
+        Extract source records into a local staging store, to be loaded later with ``load``.
+        
+        The mapped fields of the model records are read in batches, and so are the records of the related 
+        models reached within the recursion level, the same ones ``migrate`` would read. 
+        Every record is read only once, so the source instance is touched by a single sequential read.
+        The documents decoupled relations point to (``model`` / ``res_id``) are extracted too, without their relations, 
+        as ``process_decoupled_relations`` searches them in the target.
+
+        Args:
+            model_name (str): The model name to extract.
+            staging_dir (str): The staging directory to write to. It can hold several extracts.
+            recursion_level (int): The recursion level to apply. Defaults to 0.
+            batch_size (int): The number of records to read per request. Defaults to 50.
+            source_ids (list): A list of source ids to extract. Defaults to None (the whole model).
+
+        Returns:
+            dict: The number of records written per model.
+        """
+        store = StagingStore(staging_dir)
+        
+        # keep what the load phase needs from the source instance
+        store.set_meta('source_context', {key: self.source_odoo.env.context.get(key) for key in ['lang', 'tz']})
+        
+        ids = source_ids or self.source_odoo.env[model_name].search([])
+        store.add_roots(model_name, ids)
+        
+        result = {}
+        documents = {}
+        
+        # breadth first, so every model is first reached with its highest recursion level
+        queue = [(model_name, ids, recursion_level)]
+        while queue:
+            _model_name, _ids, _level = queue.pop(0)
+            
+            model_fields_map = self.migration_map.get_mapping(_model_name)['fields']
+            search_keys = self.migration_map.get_search_keys(_model_name)
+            fields_metadata = self.get_fields(1, _model_name, summary_only=False)
+            
+            fields_to_read = list(model_fields_map.keys()) + self._search_key_fields(search_keys) + ['create_date']
+            fields_to_read = [field for field in dict.fromkeys(fields_to_read) if field in fields_metadata or field == 'display_name']
+            
+            # the documents of decoupled relations are searched in the target while loading (see process_decoupled_relations)
+            decoupled_fields = None
+            if self._has_decoupled_relation(list(model_fields_map.keys())):
+                decoupled_fields = self._get_decoupled_relation_fields(_model_name)
+            
+            related = {}
+            for batch in self._split_into_batches(store.missing(_model_name, _ids), batch_size):
+                records = self.source_odoo.env[_model_name].browse(batch).read(fields_to_read)
+                result[_model_name] = result.get(_model_name, 0) + store.write(_model_name, records)
+                
+                if decoupled_fields:
+                    model_field, id_field = decoupled_fields
+                    for record in records:
+                        if record.get(model_field) in self.migration_map.map and record.get(id_field):
+                            documents.setdefault(record[model_field], []).append(record[id_field])
+                
+                if _level <= 0:
+                    continue
+                
+                # collect the related records the migration will need
+                for field in model_fields_map:
+                    field_data = fields_metadata.get(field, {})
+                    related_model_name = field_data.get('relation')
+                    if field_data.get('type') not in self.relation_types or related_model_name not in self.migration_map.map:
+                        continue
+                    
+                    for record in records:
+                        value = record.get(field)
+                        if not value:
+                            continue
+                        
+                        # many2one values are read as [id, display_name]
+                        related_ids = [value[0]] if field_data['type'] == 'many2one' else value
+                        related.setdefault(related_model_name, []).extend(related_ids)
+            
+            for related_model_name, related_ids in related.items():
+                queue.append((related_model_name, related_ids, _level - 1))
+            
+            print('Model %s extracted: %s records' % (_model_name, result.get(_model_name, 0)))
+            
+            # the documents not reached by the relations, without theirs
+            if not queue and documents:
+                queue = [(document_model_name, document_ids, 0) for document_model_name, document_ids in documents.items()]
+                documents = {}
+        
+        store.flush()
+        
+        return result
+    
+    def load(self, model_name: str, staging_dir: str, recursion_level: int=0, batch_size=50, source_ids: list=None, tracking_db=None,
+             hierarchy_field: str=None, upsert: bool=False) -> bool:
+        """
+        Load records from a staging store (see ``extract``) into the target instance.
+        
+        It works as ``migrate``, but source records are read from the staging store, so the 
+        source instance is not used at all. Loads can be replayed, for example against a fresh target.
+
+        Args:
+            model_name (str): The model name to load.
+            staging_dir (str): The staging directory to read from.
+            recursion_level (int): The recursion level to apply. Should not be higher than the extract one. Defaults to 0.
+            batch_size (int): The batch size to use. Defaults to 50.
+            source_ids (list): A list of source ids to load. Defaults to None (the ids given to ``extract``).
+            tracking_db (str): A tracking database file path to reuse it. Defaults to None (creates a new one).
+            hierarchy_field (str): A many2one field of the model pointing to itself, to load level by level. Defaults to None.
+            upsert (bool): If True, update existing records instead of creating them again. Defaults to False.
+
+        Returns:
+            bool: True when done.
+        """
+        self.staging = StagingStore(staging_dir)
+        try:
+            return self.migrate(model_name, recursion_level=recursion_level, batch_size=batch_size, 
+                                source_ids=source_ids, tracking_db=tracking_db, hierarchy_field=hierarchy_field,
+                                upsert=upsert)
+        finally:
+            self.staging = None
+    
+    @traced('_migrate_messages', 'model_name', 'batch')
+    def _migrate_messages(self, model_name: str, batch: list, recursion_level: int=0) -> list:
+        """
+        Migrate a batch of messages, in bulk.
+        
+        - The documents of the messages (``model`` / ``res_id``) are searched in the tracking db with a lookup per 
+          document model, and set on create. Only messages of documents not migrated yet are left to 
+          ``process_decoupled_relations``.
+        - The one2many children (tracking values, notifications, ...) of the whole batch are read and formatted 
+          in one go per field, and created along with their messages.
+        - Parents (``parent_id``) in the batch are created first, in waves, so threads are linked on create. 
+          Replies (``child_ids``) are not traversed, they are migrated by the stream.
+        
+        The batch is created in the ``message_order`` order. Other relations are processed as usual (see ``_format_data``).
+
+        Args:
+            model_name (str): The source model name.
+            batch (list): The source ids.
+            recursion_level (int, optional): The recursion level to apply. Defaults to 0.
+
+        Returns:
+            list: The target ids, in the created order.
+        """
+        target_model_name = self.migration_map.get_target_model(model_name)
+        model_fields_map = self.migration_map.get_mapping(model_name)['fields']
+        model_fields_metadata = self._get_fields_metadata(1, model_name, list(model_fields_map.keys()))
+        model_field, id_field = self._get_decoupled_relation_fields(model_name)
+        
+        records = self._read_source(model_name, batch, list(model_fields_map.keys()))
+        self.metrics.incr(model_name, 'read', len(records))
+        records.sort(key=lambda record: (record.get(model_field) or '', record.get(id_field) or 0, 
+                                         record.get('create_date') or '', record['id']))
+        
+        # the documents, a lookup per document model
+        res_ids = {}
+        for record in records:
+            if record.get(model_field) and record.get(id_field):
+                res_ids.setdefault(record[model_field], set()).add(record[id_field])
+        documents = {}
+        for res_model, ids in res_ids.items():
+            for res_id, found in self._find_migrated_many(res_model, list(ids)).items():
+                documents[(res_model, res_id)] = found
+        
+        # the parents created in this batch or before. The others are processed as usual
+        batch_ids = {record['id'] for record in records}
+        parent_field = 'parent_id' if isinstance(model_fields_map.get('parent_id'), str) else None
+        parents = {}
+        parents_migrated = {}
+        if parent_field:
+            parent_ids = {record[parent_field][0] for record in records if record.get(parent_field)}
+            migrated = self._find_migrated_many(model_name, list(parent_ids - batch_ids))
+            for record in records:
+                parent_id = record[parent_field][0] if record.get(parent_field) else None
+                if parent_id in batch_ids or parent_id in migrated:
+                    parents[record['id']] = parent_id
+                    record.pop(parent_field)
+            parents_migrated = {parent_id: found[1] for parent_id, found in migrated.items()}
+        
+        # the one2many children of the batch, in bulk per field
+        children = {}
+        for field_name, target_field_name in model_fields_map.items():
+            field = model_fields_metadata.get(field_name, {})
+            if field.get('type') != 'one2many' or not isinstance(target_field_name, str):
+                continue
+            
+            # replies are messages of the stream
+            relation = field['relation']
+            if relation == model_name:
+                for record in records:
+                    record.pop(field_name, None)
+                continue
+            
+            # children with decoupled relations, or too deep, are processed as usual
+            if recursion_level <= 0 or relation not in (self.migration_map.map or {}):
+                continue
+            child_fields = list(self.migration_map.get_mapping(relation)['fields'].keys())
+            if self._has_decoupled_relation(child_fields):
+                continue
+            
+            child_ids = [child_id for record in records for child_id in (record.get(field_name) or [])]
+            if child_ids:
+                # the children are linked to their message on create, so their link back is not read
+                child_fields = [child_field for child_field in child_fields if child_field != field.get('relation_field')]
+                child_data = self._read_source(relation, child_ids, child_fields)
+                self.metrics.incr(relation, 'read', len(child_data))
+                
+                child_values = self._format_data(model_name=relation, data=child_data, recursion_level=recursion_level - 1)
+                child_values = {child['id']: values for child, values in zip(child_data, child_values)}
+            
+            for record in records:
+                ids = [child_id for child_id in (record.pop(field_name, None) or []) if child_id in child_values] if child_ids else []
+                if ids:
+                    children.setdefault(record['id'], []).append((target_field_name, relation, ids, [(0, 0, child_values[_id]) for _id in ids]))
+        
+        # the messages
+        links = [(record['id'], record.pop(model_field, False), record.pop(id_field, False)) for record in records]
+        values_list = self._format_data(model_name=model_name, data=records, recursion_level=recursion_level)
+        
+        pending = []
+        for (source_id, res_model, res_id), values in zip(links, values_list):
+            document = documents.get((res_model, res_id))
+            if document:
+                values[model_fields_map[model_field]] = document[0]
+                values[model_fields_map[id_field]] = document[1]
+            
+            for target_field_name, relation, ids, commands in children.get(source_id, []):
+                values[target_field_name] = commands
+                self._pending_children.append({
+                    "model": model_name, "source_id": source_id, "field": target_field_name,
+                    "child_model": relation, "child_ids": ids,
+                })
+            
+            # messages of documents not migrated yet are linked later
+            unresolved = bool(res_model and res_id and not document)
+            pending.append((source_id, values, parents.get(source_id), unresolved))
+        
+        # parents first, in waves
+        created = {}
+        result = []
+        while pending:
+            waiting = {item[0] for item in pending}
+            wave = [item for item in pending if item[2] not in waiting] or pending
+            wave_ids = {item[0] for item in wave}
+            pending = [item for item in pending if item[0] not in wave_ids]
+            
+            for source_id, values, parent_id, unresolved in wave:
+                if parent_id:
+                    parent_target_id = created.get(parent_id) or parents_migrated.get(parent_id)
+                    if parent_target_id:
+                        values[model_fields_map[parent_field]] = parent_target_id
+            
+            ids = self._create_records(model_name, [item[0] for item in wave], target_model_name, [item[1] for item in wave])
+            self.metrics.incr(model_name, 'created', len(ids))
+            
+            # the children are created along with their messages
+            for source_id in wave_ids:
+                for target_field_name, relation, child_ids, commands in children.get(source_id, []):
+                    self.metrics.incr(relation, 'created', len(child_ids))
+            
+            for unresolved in (False, True):
+                tracked = [(item[0], _id) for item, _id in zip(wave, ids) if item[3] == unresolved]
+                if tracked:
+                    self._track_ids(model_name, [source_id for source_id, _id in tracked], target_model_name, 
+                                    [_id for source_id, _id in tracked], has_decoupled_relation=unresolved, update_required=unresolved)
+            
+            created.update(zip([item[0] for item in wave], ids))
+            result.extend(ids)
+        
+        return result
+    
+    def _get_attachment_fields(self, model_name: str) -> tuple:
+        """
+        Get the fields of an attachments model, split in metadata and content.
+
+        Args:
+            model_name (str): The source model name.
+
+        Returns:
+            tuple: The metadata fields (``checksum`` and ``file_size`` included), and the content (binary) fields to read. 
+                ``datas``, if mapped, is the only content field read, the other binary fields hold the same content.
+        """
+        model_field_list = list(self.migration_map.get_mapping(model_name)['fields'].keys())
+        model_fields_metadata = self._get_fields_metadata(1, model_name, model_field_list)
+        
+        binary_fields = [field for field in model_field_list if model_fields_metadata.get(field, {}).get('type') == 'binary']
+        metadata_fields = [field for field in model_field_list if field not in binary_fields]
+        metadata_fields += [field for field in ('checksum', 'file_size') if field not in metadata_fields]
+        
+        content_fields = ['datas'] if 'datas' in binary_fields else binary_fields[:1]
+        
+        return metadata_fields, content_fields
+    
+    @traced('_create_attachments', 'model_name', 'data')
+    def _create_attachments(self, model_name: str, data: list, recursion_level: int=0) -> list:
+        """
+        Create attachments in the target instance, given their metadata, with bounded memory.
+        
+        - Contents already in the target are not transferred: the checksums are searched in the target in bulk, 
+          and the found attachments are copied (the content is copied by the target itself).
+        - The other contents are read from the source and created in chunks of at most ``attachment_budget`` bytes 
+          (an attachment bigger than the budget goes alone), so the memory used doesnt depend on the batch size.
+          Attachments with the same content in the batch are transferred once.
+
+        Args:
+            model_name (str): The source model name.
+            data (list): The attachments metadata, as read from the source (see ``_get_attachment_fields``).
+            recursion_level (int, optional): The recursion level to apply. Defaults to 0.
+
+        Returns:
+            list: The target ids, in the data order.
+        """
+        target_model_name = self.migration_map.get_target_model(model_name)
+        content_fields = self._get_attachment_fields(model_name)[1]
+        
+        # the contents in the target already, in bulk
+        blobs = {}
+        checksums = list({record['checksum'] for record in data if record.get('checksum')})
+        for batch in self._split_into_batches(checksums, 500):
+            for found in self.target_odoo.env[target_model_name].search_read([['checksum', 'in', batch]], ['checksum']):
+                blobs.setdefault(found['checksum'], found['id'])
+        
+        # every content is transferred once, the attachments sharing it are copies
+        transfer, copies = [], []
+        seen = set(blobs)
+        for record in data:
+            checksum = record.get('checksum')
+            if checksum and checksum in seen:
+                copies.append(record)
+            else:
+                transfer.append(record)
+                if checksum:
+                    seen.add(checksum)
+        
+        ids = {}
+        for chunk in self._split_into_batches_by_size(transfer, self.attachment_budget):
+            source_ids = [record['id'] for record in chunk]
+            contents = {record['id']: record for record in self._read_source(model_name, source_ids, content_fields)}
+            
+            chunk_data = [dict(record, **{field: contents.get(record['id'], {}).get(field) for field in content_fields}) for record in chunk]
+            del contents
+            
+            chunk_data = self._format_data(model_name=model_name, data=chunk_data, recursion_level=recursion_level)
+            res = self._create_records(model_name, source_ids, target_model_name, chunk_data)
+            del chunk_data
+            
+            for record, _id in zip(chunk, res):
+                ids[record['id']] = _id
+                if record.get('checksum'):
+                    blobs.setdefault(record['checksum'], _id)
+        
+        if copies:
+            copies_data = self._format_data(model_name=model_name, data=copies, recursion_level=recursion_level)
+            for record, values in zip(copies, copies_data):
+                ids[record['id']] = self._target_copy(target_model_name, blobs[record['checksum']], values)
+        
+        return [ids[record['id']] for record in data]
+    
+    def _split_into_batches_by_size(self, records: list, budget: int) -> list:
+        """
+        Split attachments metadata into chunks whose contents add up to at most ``budget`` bytes, base64 encoded.
+
+        Args:
+            records (list): The attachments metadata, with ``file_size``.
+            budget (int): The bytes per chunk.
+
+        Returns:
+            list: The chunks. An attachment bigger than the budget goes alone.
+        """
+        chunks = []
+        chunk, chunk_size = [], 0
+        for record in records:
+            size = (record.get('file_size') or 0) * 4 // 3
+            if chunk and chunk_size + size > budget:
+                chunks.append(chunk)
+                chunk, chunk_size = [], 0
+            
+            chunk.append(record)
+            chunk_size += size
+        
+        if chunk:
+            chunks.append(chunk)
+        
+        return chunks
+    
+    def _create_records(self, model_name: str, source_ids: list, target_model_name: str, data: list) -> list:
+        """
+        Create formatted records in the target instance, as set by ``write_mode``.
+
+        Args:
+            model_name (str): The source model name.
+            source_ids (list): The source ids, in the data order.
+            target_model_name (str): The target model name.
+            data (list): The formatted records.
+
+        Returns:
+            list: The target ids, in the data order.
+        """
+        if self.write_mode == 'load':
+            xmlids = [self.get_xmlid(model_name, source_id) for source_id in source_ids]
+            
+            # records loaded by a previous run are updated, but their one2many commands would duplicate the children
+            field_types = {name: field['type'] for name, field in self.get_fields(2, target_model_name, summary_only=False).items()}
+            has_one2many = any(field_types.get(name) == 'one2many' for record in data for name in record)
+            existing = self._find_xmlids(xmlids) if has_one2many else set()
+            if existing:
+                existing_ids = {source_id for source_id, xmlid in zip(source_ids, xmlids) if xmlid in existing}
+                data = [{name: value for name, value in record.items() if field_types.get(name) != 'one2many'} 
+                        if xmlid in existing else record for record, xmlid in zip(data, xmlids)]
+                self._discard_pending_children(model_name, existing_ids)
+            
+            return self._target_load(target_model_name, xmlids, data)
+        
+        return self._target_create(target_model_name, data)
+    
+    def _find_xmlids(self, xmlids: list) -> set:
+        """
+        Get the external ids that exist already in the target instance.
+
+        Args:
+            xmlids (list): The external ids, of the ``xmlid_module`` module.
+
+        Returns:
+            set: The existing external ids.
+        """
+        names = [xmlid.split('.', 1)[1] for xmlid in xmlids]
+        found = self.target_odoo.env['ir.model.data'].search_read([['module', '=', self.xmlid_module], ['name', 'in', names]], ['name'])
+        
+        return {'%s.%s' % (self.xmlid_module, entry['name']) for entry in found}
+    
+    def get_xmlid(self, model_name: str, source_id: int) -> str:
+        """
+        Get the external id of a migrated record, in ``load`` write mode. Ex: __migration__.res_partner_12
+
+        Args:
+            model_name (str): The source model name.
+            source_id (int): The source id.
+
+        Returns:
+            str: The external id.
+        """
+        return '%s.%s_%s' % (self.xmlid_module, model_name.replace('.', '_'), source_id)
+    
+    @traced('load', 'target_model_name', 'data')
+    def _target_load(self, target_model_name: str, xmlids: list, data: list) -> list:
+        """
+        Create or update records in the target instance with its ``load`` method, by external id.
+        
+        Values are sent as strings, many2one and many2many values as database ids (``field/.id`` columns).
+        Records are sent in a call per set of fields, so missing fields are not emptied on existing records.
+        one2many values cant be sent as a single row, they are written on each record after the load.
+
+        Args:
+            target_model_name (str): The target model name.
+            xmlids (list): The external ids, in the data order.
+            data (list): The formatted records.
+
+        Raises:
+            LoadException: Raised when the target reports errors.
+
+        Returns:
+            list: The target ids, in the data order.
+        """
+        target_model = self._get_target_model(target_model_name)
+        fields_metadata = self.get_fields(2, target_model_name, summary_only=False)
+        field_types = {name: fields_metadata.get(name, {}).get('type') for record in data for name in record}
+        
+        # records with the same fields go in the same call
+        groups = {}
+        one2many_values = {}
+        for idx, record in enumerate(data):
+            fields = tuple(name for name in record if field_types[name] != 'one2many')
+            groups.setdefault(fields, []).append(idx)
+            
+            values = {name: value for name, value in record.items() if field_types[name] == 'one2many'}
+            if values:
+                one2many_values[idx] = values
+        
+        ids = [None] * len(data)
+        for fields, indexes in groups.items():
+            columns = ['id'] + ['%s/.id' % name if field_types[name] in ('many2one', 'many2many') else name for name in fields]
+            rows = [[xmlids[idx]] + [self._load_value(field_types[name], data[idx][name]) for name in fields] for idx in indexes]
+            
+            res = target_model.load(columns, rows)
+            
+            errors = [message for message in res.get('messages', []) if message.get('type') == 'error']
+            if errors or not res.get('ids'):
+                raise LoadException('Could not load %s records: %s' % (target_model_name, 
+                                                                       '; '.join(message.get('message', '') for message in errors)))
+            
+            for idx, _id in zip(indexes, res['ids']):
+                ids[idx] = _id
+        
+        for idx, values in one2many_values.items():
+            self._target_write(target_model_name, [ids[idx]], values)
+        
+        return ids
+    
+    def _load_value(self, field_type: str, value) -> str:
+        """
+        Get the ``load`` representation of a formatted value.
+
+        Args:
+            field_type (str): The target field type.
+            value: The formatted value.
+
+        Returns:
+            str: The value as a string. Relations as comma separated database ids.
+        """
+        if value is None or value is False:
+            return ''
+        if value is True:
+            return '1'
+        
+        if field_type == 'many2one':
+            return str(value[0] if isinstance(value, (list, tuple)) else value)
+        
+        if field_type == 'many2many':
+            ids = []
+            for item in value:
+                # commands, as written by _write_changes. Ex: [(6, 0, [1, 2])]
+                if isinstance(item, (list, tuple)):
+                    ids.extend(item[2] if item[0] == 6 else [item[1]])
+                else:
+                    ids.append(item)
+            return ','.join(str(_id) for _id in ids)
+        
+        return str(value)
+    
+    @traced('create', 'target_model_name', 'data')
+    def _target_create(self, target_model_name: str, data: Union[dict, list]) -> list:
+        """
+        Create records in the target instance.
+
+        Args:
+            target_model_name (str): The target model name.
+            data (Union[dict, list]): The formatted data of the records to create.
+
+        Returns:
+            list: The created ids.
+        """
+        return self._get_target_model(target_model_name).create(data)
+    
+    @traced('_format_data', 'model_name', 'data', 'recursion_level')
+    def _format_data(self, model_name: str, data: Union[dict, list], recursion_level: int = 0) -> dict:
+        """
+        Formats the data to be feed in the target instance:
+            - Traverse relational fields.
+            - Changes field names.
+            - Executes callables.
+
+        Args:
+            model_name (str): The model name to migrate.
+            data (Union[dict, list]): The data to format.
+            recursion_level (int, optional): The recursion level to apply. Relational field deeper than recursion_level wont be considered/formatted. Defaults to 0.
+
+        Returns:
+            dict: The data properly formatted to be feed in the target instance.
+        """
+        
+        # gets the fields mapping for the main model
+        model_fields_map = self.migration_map.get_mapping(model_name)['fields']
         
         # get the source fields metadata
         model_field_list = list(model_fields_map.keys())
-        source_model = self.source_odoo.env[model_name]
-        model_fields_metadata = source_model.fields_get(model_field_list)
+        model_fields_metadata = self._get_fields_metadata(1, model_name, model_field_list)
         
         # ensure data consistency
         _data = copy.deepcopy(data)
@@ -409,6 +1972,11 @@ class Executor(object):
             fields = list(record.keys())
             has_a_decoupled_relation = self._has_decoupled_relation(fields)
             
+            # the record is being created, links back to it are deferred until it exists
+            source_id = record.get('id')
+            if source_id:
+                self._in_flight.add((model_name, source_id))
+            
             for column_name in fields:
                 
                 # drop decoupled relations fields, will be processed later
@@ -438,11 +2006,19 @@ class Executor(object):
                     if field_type in self.relation_types:
                         new_source_model_name = model_fields_metadata[column_name]['relation']
                         if recursion_level > 0:
+                            # dont traverse back to records being created, link them later
+                            col_data = self._defer_in_flight_links(model_name, source_id, column_name, field_type,
+                                                                   new_source_model_name, record[column_name])
+                            if not col_data:
+                                record.pop(column_name)
+                                continue
+                            
                             col_value = self._process_relation(model_name=new_source_model_name, 
                                                             relation_type=field_type, 
                                                             field_name=column_name,
-                                                            data=record[column_name], 
-                                                            recursion_level=recursion_level)
+                                                            data=col_data, 
+                                                            recursion_level=recursion_level,
+                                                            owner=(model_name, source_id))
                             record[column_name] = col_value
                         elif self.recursion_mode == 'w':
                             print('Removing %s.%s --> %s from migration because of recursion level.' % (model_name, column_name, new_source_model_name))
@@ -459,7 +2035,8 @@ class Executor(object):
                         else:
                             raise UnsupportedRelationException('Relation type %s is not supported yet' % field_type)
                 except Exception as e:
-                    Pretty.log('Error processing %s.%s --> %s' % (model_name, column_name, new_source_model_name), self.log_path, overwrite=True, mode='a')
+                    self.logger.log({"msg": 'Error processing %s.%s --> %s' % (model_name, column_name, new_source_model_name), 
+                                     "model": model_name, "field": column_name, "error": repr(e)})
                     raise
                 
                 # test for and do field name changes / transformations with callables
@@ -482,7 +2059,9 @@ class Executor(object):
             
         return _data
     
-    def _process_relation(self, model_name: str, relation_type: str, field_name: str, data: Union[dict, list], recursion_level: int = 0) -> Union[int, list]:
+    @traced('_process_relation', 'model_name', 'relation_type', 'field_name', 'recursion_level')
+    def _process_relation(self, model_name: str, relation_type: str, field_name: str, data: Union[dict, list], recursion_level: int = 0,
+                          owner: tuple=None) -> Union[int, list]:
         """
         Process / traverses the relational fields in data
 
@@ -492,6 +2071,8 @@ class Executor(object):
             field_name (str): The field name to process.
             data (Union[dict, list]): The data to process.
             recursion_level (int): The recursion level to apply. Relational field deeper than recursion_level wont be considered/formatted. Defaults to 0.
+            owner (tuple): The (source model name, source id) of the record holding the field. Used to track one2many 
+                children created along with it. Defaults to None.
         
         Returns:
             data (Union[int, list]): The data for the relational field ready to feed into the target instance.
@@ -506,17 +2087,12 @@ class Executor(object):
         # gets the fields mapping for the model
         model_fields_map = self.migration_map.get_mapping(model_name)['fields']
         
-        # gets the source model to sync from
-        source_model = self.source_odoo.env[model_name]
-        
         # get the source fields metadata
         model_field_list = list(model_fields_map.keys())
-        model_fields_metadata = source_model.fields_get(model_field_list)
+        model_fields_metadata = self._get_fields_metadata(1, model_name, model_field_list)
 
-        # get the target model and fields to sync to
+        # get the target model to sync to
         target_model_name = self.migration_map.get_target_model(model_name)
-        target_model = self.target_odoo.env[target_model_name]
-        target_field_list = list(model_fields_map.values())
         
         # get the search keys
         search_keys = self.migration_map.get_search_keys(model_name)
@@ -530,53 +2106,68 @@ class Executor(object):
         # that way the reverse relation is created automatically
         if relation_type == 'many2many' or (relation_type == 'one2many' and has_a_decoupled_relation):
             
-            _data = []
-            
             # get the source data
             # data Ex: [35, 33, 34] Note the order is unknown/random 
-            related_source_ids = data
+            # records already migrated are not read again. First search in the run memo / tracking db, in bulk
+            migrated = self._find_migrated_many(model_name, data)
+            _data = [migrated[_id][1] for _id in data if _id in migrated]
+            self.metrics.incr(model_name, 'matched', len(_data))
             
-            # turns outs that not every model has the automatic field create_date
-            # if create_date is present, order by it, because its important for example for messages
-            if "create_date" in model_fields_metadata.keys():
-                related_source_ids = source_model.search([['id', 'in', data]], order='create_date ASC')
-                
-            related_source_recordset = source_model.browse(related_source_ids)
-            related_source_data = related_source_recordset.read(model_field_list)
-                               
+            related_source_ids = [_id for _id in data if _id not in migrated]
+            
+            # attachment contents are read later, within the attachment budget
+            is_attachment = model_name == self.attachment_model
+            read_fields = self._get_attachment_fields(model_name)[0] if is_attachment else model_field_list
+            
+            related_source_data = []
+            if related_source_ids:
+                # if create_date is present, order by it, because its important for example for messages
+                related_source_ids = self._order_source_ids(model_name, related_source_ids, model_fields_metadata)
+                related_source_data = self._read_source(model_name, related_source_ids, read_fields)
+                self.metrics.incr(model_name, 'read', len(related_source_data))
+            
+            found_source_ids, found_target_ids = [], []
+            missing = []
             for record in related_source_data:
                 record_id = record['id']
                 
-                # first search in the tracking db
-                _found = self.search_in_tracking_db(model_name, record_id)
-                
+                # the search remote
+                _found = self.search_in_target(model_name=model_name, 
+                                                source_id=record_id, 
+                                                search_keys=search_keys, 
+                                                target_model_name=target_model_name)
                 if _found:
-                    _data.append(_found[1])
+                    found_source_ids.append(record_id)
+                    found_target_ids.append(_found[0])
                 else:
-                    # the search remote
-                    _found = self.search_in_target(model_name=model_name, 
-                                                    source_id=record_id, 
-                                                    search_keys=search_keys, 
-                                                    target_model_name=target_model_name)
-                    if _found:
-                        _data.append(_found[0])
-                        
-                        # tracking
-                        self._track_ids(model_name, [record_id], target_model_name, [_found[0]])
-                    else:
-                        # data may contain new relations, so we have to format them
-                        _new_data = self._format_data(model_name=model_name, 
-                                                    data=record, 
-                                                    recursion_level=recursion_level - 1)
-                        
-                        
-                        _id = target_model.create(_new_data)
-                        _data.append(_id[0])
-                    
-                        # tracking
-                        self._track_ids(source_model_name=model_name, source_ids=[record_id], 
-                                        target_model_name=target_model_name, target_ids=[_id[0]],
-                                        has_decoupled_relation=has_a_decoupled_relation, update_required=has_a_decoupled_relation)
+                    missing.append(record)
+            
+            if found_source_ids:
+                _data.extend(found_target_ids)
+                self.metrics.incr(model_name, 'matched', len(found_target_ids))
+                
+                # tracking
+                self._track_ids(model_name, found_source_ids, target_model_name, found_target_ids)
+            
+            if missing and is_attachment:
+                _ids = self._create_attachments(model_name, missing, recursion_level=recursion_level - 1)
+            elif missing:
+                # data may contain new relations, so we have to format them.
+                # All the missing records at once, and created with a single call, in the create_date order
+                _new_data = self._format_data(model_name=model_name, 
+                                            data=missing, 
+                                            recursion_level=recursion_level - 1)
+                
+                _ids = self._create_records(model_name, [record['id'] for record in missing], target_model_name, _new_data)
+            
+            if missing:
+                _data.extend(_ids)
+                self.metrics.incr(model_name, 'created', len(_ids))
+            
+                # tracking
+                self._track_ids(source_model_name=model_name, source_ids=[record['id'] for record in missing], 
+                                target_model_name=target_model_name, target_ids=_ids,
+                                has_decoupled_relation=has_a_decoupled_relation, update_required=has_a_decoupled_relation)
                                                         
         elif relation_type == 'one2many':
             _data = []
@@ -585,30 +2176,40 @@ class Executor(object):
             # data Ex: [35, 33, 34] Note the order is unknown/random 
             related_source_ids = data
             
-            # turns outs that not every model has the automatic field create_date
             # if create_date is present, order by it, because its important for example for messages
-            if "create_date" in model_fields_metadata.keys():
-                related_source_ids = source_model.search([['id', 'in', data]], order='create_date ASC')
-                
-            related_source_recordset = source_model.browse(related_source_ids)
-            related_source_data = related_source_recordset.read(model_field_list)
+            related_source_ids = self._order_source_ids(model_name, related_source_ids, model_fields_metadata)
+            related_source_data = self._read_source(model_name, related_source_ids, model_field_list)
+            self.metrics.incr(model_name, 'read', len(related_source_data))
 
             # data may contain new relations, so we have to format them
             _new_data = self._format_data(model_name=model_name, data=related_source_data, recursion_level=recursion_level - 1)    
             _data = [(0, 0, e) for e in _new_data]
+            self.metrics.incr(model_name, 'created', len(_data))
             
-            #: TODO how to do tracking in this case?
+            # the children are created along with the parent, so they are tracked once the parent exists
+            owner_field = self.migration_map.get_mapping(owner[0])['fields'].get(field_name) if owner else None
+            if owner and owner[1] and isinstance(owner_field, str):
+                self._pending_children.append({
+                    "model": owner[0], "source_id": owner[1], "field": owner_field,
+                    "child_model": model_name, "child_ids": [record['id'] for record in related_source_data],
+                })
+            else:
+                # they cant be tracked, so links from them cant be written later
+                children = {(model_name, record['id']) for record in related_source_data}
+                self._in_flight.difference_update(children)
+                self._deferred_links = [link for link in self._deferred_links if (link['model'], link['source_id']) not in children]
 
         elif relation_type == 'many2one':
             
             # get the source data
             related_source_id, related_source_display_name = data # Ex: [33, 'MXN']                            
             
-            #first search in the tracking db
-            _found = self.search_in_tracking_db(model_name, related_source_id)
+            #first search in the run memo / tracking db
+            _found = self._find_migrated(model_name, related_source_id)
             
             if _found:
                 _data = _found[1]
+                self.metrics.incr(model_name, 'matched')
             else:
                 # search it by every search key
                 _found = self.search_in_target(model_name=model_name, 
@@ -619,15 +2220,18 @@ class Executor(object):
                 # if still not found, create it
                 if not _found:
                     
-                    related_source_recordset = source_model.browse(related_source_id)
-                    related_source_data = related_source_recordset.read(model_field_list)[0]
+                    related_source_data = self._read_source(model_name, [related_source_id], model_field_list)[0]
+                    self.metrics.incr(model_name, 'read')
 
                                         
                     # data may contain new relations, so we have to format them
                     new_target_data = self._format_data(model_name=model_name, data=related_source_data, recursion_level=recursion_level - 1)
 
                     # create the record in target instance/model
-                    _found = target_model.create(new_target_data)
+                    _found = self._create_records(model_name, [related_source_id], target_model_name, new_target_data)
+                    self.metrics.incr(model_name, 'created')
+                else:
+                    self.metrics.incr(model_name, 'matched')
 
                 _data = _found[0]
                 
@@ -638,9 +2242,116 @@ class Executor(object):
                                 has_decoupled_relation=has_a_decoupled_relation, update_required=has_a_decoupled_relation)
         
         else:
-            raise UnsupportedRelationException('%s relations are not supported yet', relation_type)
-          
-        return _data
+            raise UnsupportedRelationException('%s relations are not supported yet', relation_type)
+          
+        return _data
+
+    def _defer_in_flight_links(self, model_name: str, source_id: int, field_name: str, relation_type: str, 
+                               related_model_name: str, data: Union[int, list]) -> Union[int, list]:
+        """
+        Take out of a relational field value the records being created (in flight), and defer the links to them.
+        Traversing them again would read and format them at every level, or create them twice.
+        The deferred links are written by ``_apply_deferred_links`` once both records exist.
+
+        Args:
+            model_name (str): The model of the record holding the field.
+            source_id (int): The source id of the record holding the field.
+            field_name (str): The relational field name.
+            relation_type (str): The relation type.
+            related_model_name (str): The related model name.
+            data (Union[int, list]): The field value, as read from the source.
+
+        Returns:
+            Union[int, list]: The field value without the in flight records. None if nothing is left.
+        """
+        target_field = self.migration_map.get_mapping(model_name)['fields'][field_name]
+        
+        # links can only be written to a known target field
+        if not source_id or not isinstance(target_field, str):
+            return data
+        
+        if relation_type == 'many2one':
+            # data Ex: [33, 'MXN']
+            related_ids = [data[0]]
+        else:
+            related_ids = data
+        
+        in_flight = [_id for _id in related_ids if (related_model_name, _id) in self._in_flight]
+        for related_id in in_flight:
+            self._deferred_links.append({
+                "model": model_name, "source_id": source_id, "field": target_field, "relation_type": relation_type,
+                "related_model": related_model_name, "related_id": related_id,
+            })
+        
+        if relation_type == 'many2one':
+            return None if in_flight else data
+        
+        return [_id for _id in related_ids if _id not in in_flight] or None
+    
+    def _apply_deferred_links(self) -> None:
+        """
+        Write the deferred links whose records both exist already.
+        Links with the same target model, field and value are written with one call.
+        """
+        if not self._deferred_links:
+            return
+        
+        pending = []
+        values = {}
+        for link in self._deferred_links:
+            owner = self._find_migrated(link['model'], link['source_id'])
+            related = self._find_migrated(link['related_model'], link['related_id'])
+            if not owner or not related:
+                pending.append(link)
+                continue
+            
+            key = (owner[0], owner[1], link['field'])
+            if link['relation_type'] == 'many2one':
+                values[key] = related[1]
+            else:
+                values.setdefault(key, []).append((4, related[1]))
+        
+        self._deferred_links = pending
+        
+        # group the records to write by target model, field and value
+        writes = {}
+        for (target_model_name, target_id, field), value in values.items():
+            if isinstance(value, list):
+                value = sorted(value)
+            writes.setdefault((target_model_name, field, json.dumps(value)), (value, []))[1].append(target_id)
+        
+        for (target_model_name, field, _), (value, target_ids) in writes.items():
+            try:
+                self._target_write(target_model_name, target_ids, {field: value})
+            except Exception as e:
+                message = "Could not write deferred links. %s.%s --> %s" % (target_model_name, field, value)
+                self.logger.log({'msg': message, 'model': target_model_name, 'target_ids': target_ids, 'error': repr(e)})
+                print(message)
+    
+    def _log_deferred_links(self) -> None:
+        """
+        Log the deferred links that could not be written, because one of their records was not migrated.
+        """
+        for link in self._deferred_links:
+            message = "Could not write deferred link. %s.id=%s.%s --> %s.id=%s" % (link['model'], link['source_id'], link['field'],
+                                                                                  link['related_model'], link['related_id'])
+            self.logger.log({'msg': message, 'model': link['model'], 'source_id': link['source_id'], 
+                             'error': 'Record not migrated'})
+    
+    @traced('write', 'target_model_name', 'ids')
+    def _target_write(self, target_model_name: str, ids: list, values: dict) -> bool:
+        """
+        Write values on records of the target instance.
+
+        Args:
+            target_model_name (str): The target model name.
+            ids (list): The target ids.
+            values (dict): The formatted values to write.
+
+        Returns:
+            bool: True if written.
+        """
+        return self._get_target_model(target_model_name).write(ids, values)
 
     def _get_decoupled_relation_fields(self, model_name: str) -> list:
         """
@@ -669,7 +2380,8 @@ class Executor(object):
         
         return decoupled_relation_fields
 
-    def process_decoupled_relations(self):
+    @traced('process_decoupled_relations')
+    def process_decoupled_relations(self, model_name: str=None, source_ids: list=None, final: bool=True):
         """
         Process / updates records with special fields used to make a decoupled relation to other models.
         This are fields that points to another record using a ``model``and ``res_id`` schema. 
@@ -679,6 +2391,12 @@ class Executor(object):
             - Models with a messages_ids field, pointing to a mail.message which in turn has the fields ``model`` and ``res_id``
               that points back to a parent/associated model
         
+        Args:
+            model_name (str, optional): Only process records of this source model. Defaults to None (all).
+            source_ids (list, optional): Only process these source ids of ``model_name``. Defaults to None (all).
+            final (bool, optional): If False, records whose related record is not migrated yet are left pending, 
+                to be processed later in the run. Defaults to True (they are logged and stored as failed).
+        
         Returns:
             dict: A dictionary with model names and the number of records updated per model
 
@@ -686,23 +2404,32 @@ class Executor(object):
                 
         # get records with decoupled relations requiring an update
         cursor = self.tracking_db.cursor()
-        cursor.execute('SELECT source_model_name, source_id, target_model_name, target_id FROM ids_tracking WHERE has_decoupled_relation = 1 AND update_required = 1')
-        records = cursor.fetchall()
+        query = 'SELECT source_model_name, source_id, target_model_name, target_id FROM ids_tracking WHERE has_decoupled_relation = 1 AND update_required = 1'
+        
+        if not model_name:
+            cursor.execute(query)
+            records = cursor.fetchall()
+        elif source_ids is None:
+            cursor.execute(query + ' AND source_model_name = ?', (model_name,))
+            records = cursor.fetchall()
+        else:
+            # keep well below the sqlite variables limit
+            records = []
+            for batch in self._split_into_batches(list(dict.fromkeys(source_ids)), 500):
+                cursor.execute(query + ' AND source_model_name = ? AND source_id IN (%s)' % ','.join('?' * len(batch)), [model_name] + batch)
+                records.extend(cursor.fetchall())
         
         result = {}
         
         for rec in records:
             try:
                 source_model_name, source_id, target_model_name, target_id = rec
-                source_model = self.source_odoo.env[source_model_name]
-                target_model = self.target_odoo.env[target_model_name] 
                 
                 # Some models use a ``model`` field name while others use a ``res_model`` field name :|
                 model_field, id_field = self._get_decoupled_relation_fields(source_model_name)
                 decoupled_relation_fields = [model_field, id_field]
                 
-                source_recordset = source_model.browse(source_id)
-                source_data = source_recordset.read(decoupled_relation_fields)
+                source_data = self._read_source(source_model_name, [source_id], decoupled_relation_fields)
                 source_data = source_data[0]
                 
                 related_model_name = source_data[model_field]
@@ -714,11 +2441,13 @@ class Executor(object):
                 if related_rec:
                     related_source_model_name, related_source_id, related_target_model_name, related_target_id = related_rec
                                         
-                    res = target_model.write([target_id], {model_field: related_target_model_name, id_field: related_target_id})
+                    res = self._target_write(target_model_name, [target_id], {model_field: related_target_model_name, id_field: related_target_id})
                                         
                     # update the ids_tracking db
                     uc = cursor.execute('UPDATE ids_tracking SET update_required = 0 WHERE source_model_name = ? AND source_id = ?', (source_model_name, source_id))
                     self.tracking_db.commit()
+                    self.metrics.incr(source_model_name, 'pending_decoupled', -uc.rowcount)
+                    self._clear_failures(source_model_name, [source_id], 'decoupled')
                     
                     if target_model_name in result:
                         result[target_model_name] += uc.rowcount
@@ -731,37 +2460,171 @@ class Executor(object):
                     related_target_model_name = self.migration_map.get_target_model(related_model_name)
                     res = self.search_in_target(model_name=related_model_name, source_id=related_id, target_model_name=related_target_model_name)
                     if res:
-                        target_model.write([target_id], {model_field: related_target_model_name, id_field: res[0]})
+                        self._target_write(target_model_name, [target_id], {model_field: related_target_model_name, id_field: res[0]})
                                         
                         # update the ids_tracking db
                         uc = cursor.execute('UPDATE ids_tracking SET update_required = 0 WHERE source_model_name = ? AND source_id = ?', (source_model_name, source_id))
                         self.tracking_db.commit()
+                        self.metrics.incr(source_model_name, 'pending_decoupled', -uc.rowcount)
+                        self._clear_failures(source_model_name, [source_id], 'decoupled')
                         
                         if target_model_name in result:
                             result[target_model_name] += uc.rowcount
                         else:
                             result[target_model_name] = uc.rowcount
 
+                    elif not final:
+                        # the related record may be migrated later in the run
+                        continue
                     else:
                         message = "Could not process decoupled relation. %s.id=%s --> %s.id=%s" % (source_model_name, source_id, target_model_name, target_id)
                         error = "Record not found in ids_tracking db nor in target instance model %s.id=%s" % (related_model_name, related_id)
-                        log_entry = {'message': message, 'error': error}
-                        Pretty.log(log_entry, self.log_path, overwrite=True, mode='a')
+                        log_entry = {'msg': message, 'model': source_model_name, 'source_id': source_id, 'error': error}
+                        self.logger.log(log_entry)
+                        self._record_failures(source_model_name, [source_id], 'decoupled', error, error_class='RelatedRecordNotFound')
                         print(message)
             except Exception as e:
                 
                 message = "Could not process decoupled relation. %s.id=%s --> %s.id=%s" % (source_model_name, source_id, target_model_name, target_id)
-                log_entry = {'message': message, 'error': repr(e)}
+                log_entry = {'msg': message, 'model': source_model_name, 'source_id': source_id, 'error': repr(e)}
                 
+                debug_payload = None
                 if self.debug:
-                    stack_trace = traceback.format_exc()
-                    log_entry.update({"stack_trace": stack_trace})
+                    debug_payload = {"stack_trace": traceback.format_exc()}
                 
-                Pretty.log(log_entry, self.log_path, overwrite=True, mode='a')
+                self.logger.log(log_entry, debug_payload=debug_payload)
+                self._record_failures(source_model_name, [source_id], 'decoupled', e)
                 print(message)
             
+            # processed (written or failed), not pending in this run anymore
+            self._pending_decoupled.get(source_model_name, set()).discard(source_id)
+            
         return result
 
+    def _record_failures(self, model_name: str, source_ids: list, phase: str, error, error_class: str=None) -> None:
+        """
+        Store failed records in the tracking db, to retry them later (see ``retry_failed``). 
+        Records failed before get their attempts count increased.
+
+        Args:
+            model_name (str): The source model name.
+            source_ids (list): The source ids.
+            phase (str): The phase that failed: ``migrate`` or ``decoupled``.
+            error (Union[Exception, str]): The error.
+            error_class (str, optional): The error class. Defaults to None (the exception class name).
+        """
+        if self.tracking_db is None:
+            return
+        
+        if error_class is None:
+            error_class = type(error).__name__
+        now = datetime.now().isoformat(timespec='seconds')
+        
+        cursor = self.tracking_db.cursor()
+        cursor.executemany('''INSERT INTO failed_records (model_name, source_id, phase, error_class, error, attempts, last_attempt) 
+                              VALUES (?, ?, ?, ?, ?, 1, ?)
+                              ON CONFLICT (model_name, source_id, phase) DO UPDATE SET 
+                              error_class = excluded.error_class, error = excluded.error, 
+                              attempts = attempts + 1, last_attempt = excluded.last_attempt''',
+                           [(model_name, source_id, phase, error_class, str(error), now) for source_id in source_ids])
+        self.tracking_db.commit()
+    
+    def _clear_failures(self, model_name: str, source_ids: list, phase: str) -> None:
+        """
+        Remove records from the failed records, once processed.
+
+        Args:
+            model_name (str): The source model name.
+            source_ids (list): The source ids.
+            phase (str): The phase: ``migrate`` or ``decoupled``.
+        """
+        cursor = self.tracking_db.cursor()
+        cursor.executemany('DELETE FROM failed_records WHERE model_name = ? AND source_id = ? AND phase = ?', 
+                           [(model_name, source_id, phase) for source_id in source_ids])
+        self.tracking_db.commit()
+    
+    def get_failed_models(self, tracking_db: str=None) -> list:
+        """
+        Get the models with failed records in the tracking db.
+
+        Args:
+            tracking_db (str, optional): The tracking database file path. Defaults to None (the current one).
+
+        Returns:
+            list: The source model names.
+        """
+        if tracking_db:
+            self.get_tracking_db(tracking_db)
+        
+        cursor = self.tracking_db.cursor()
+        cursor.execute('SELECT DISTINCT model_name FROM failed_records ORDER BY model_name')
+        
+        return [row[0] for row in cursor.fetchall()]
+    
+    def retry_failed(self, model_name: str, tracking_db: str, recursion_level: int=0, batch_size: int=50, 
+                     max_attempts: int=3, upsert: bool=False) -> dict:
+        """
+        Process again the failed records of a model, stored in the tracking db.
+        
+        Records are retried in bulk, grouped by phase and error class: failed batches are migrated again 
+        (see ``migrate``), and failed decoupled relations processed again (see ``process_decoupled_relations``).
+        Records that still fail get their attempts count increased, and are not retried after ``max_attempts``.
+
+        Args:
+            model_name (str): The source model name.
+            tracking_db (str): The tracking database file path of the migration.
+            recursion_level (int, optional): The recursion level to apply. Defaults to 0.
+            batch_size (int, optional): The batch size to use. Defaults to 50.
+            max_attempts (int, optional): The attempts after which records are not retried anymore. Defaults to 3.
+            upsert (bool, optional): Update the records that exist already, instead of creating them. Defaults to False.
+
+        Returns:
+            dict: The retried, recovered and given up records per phase and error class.
+        """
+        if not self._prepare_migration(model_name, tracking_db=tracking_db):
+            return {}
+        
+        cursor = self.tracking_db.cursor()
+        cursor.execute('SELECT phase, error_class, source_id, attempts FROM failed_records WHERE model_name = ? ORDER BY phase, error_class, source_id', 
+                       (model_name,))
+        
+        groups = {}
+        result = {}
+        for phase, error_class, source_id, attempts in cursor.fetchall():
+            key = '%s: %s' % (phase, error_class)
+            counts = result.setdefault(key, {"retried": 0, "recovered": 0, "given_up": 0})
+            if attempts >= max_attempts:
+                counts["given_up"] += 1
+            else:
+                groups.setdefault((phase, error_class), []).append(source_id)
+        
+        migrate_ids = [source_id for (phase, error_class), ids in groups.items() if phase == 'migrate' for source_id in ids]
+        batches = self._split_into_batches(migrate_ids, batch_size)
+        self.metrics.start(model_name, total=len(migrate_ids), batches=len(batches))
+        
+        for (phase, error_class), ids in groups.items():
+            print('Retrying %s %s records of model %s (%s)' % (len(ids), phase, model_name, error_class))
+            
+            if phase == 'migrate':
+                for batch_number, batch in enumerate(self._split_into_batches(ids, batch_size), start=1):
+                    self._migrate_batch(model_name, batch, batch_number, recursion_level=recursion_level, upsert=upsert)
+            else:
+                self.process_decoupled_relations(model_name, ids)
+            
+            still_failed = set()
+            for batch in self._split_into_batches(ids, 500):
+                cursor.execute('SELECT source_id FROM failed_records WHERE model_name = ? AND phase = ? AND source_id IN (%s)' % ','.join('?' * len(batch)),
+                               [model_name, phase] + list(batch))
+                still_failed.update(row[0] for row in cursor.fetchall())
+            
+            counts = result['%s: %s' % (phase, error_class)]
+            counts["retried"] += len(ids)
+            counts["recovered"] += len(ids) - len(still_failed)
+        
+        self._finish_migration()
+        
+        return result
+    
     def _init_tracking_db(self):
         """
         Initialize the ids tracking database
@@ -777,6 +2640,34 @@ class Executor(object):
                             update_required BOOLEAN DEFAULT FALSE
                         )
                         ''')
+        cursor.execute('''CREATE TABLE IF NOT EXISTS sync_watermarks
+                        (
+                            model_name TEXT PRIMARY KEY,
+                            write_date TEXT,
+                            last_id INTEGER
+                        )
+                        ''')
+        cursor.execute('''CREATE TABLE IF NOT EXISTS failed_records
+                        (
+                            model_name TEXT,
+                            source_id INTEGER,
+                            phase TEXT,
+                            error_class TEXT,
+                            error TEXT,
+                            attempts INTEGER DEFAULT 1,
+                            last_attempt TEXT,
+                            PRIMARY KEY (model_name, source_id, phase)
+                        )
+                        ''')
+        cursor.execute('''CREATE TABLE IF NOT EXISTS manifest_steps
+                        (
+                            step TEXT PRIMARY KEY,
+                            model_name TEXT,
+                            status TEXT,
+                            started TEXT,
+                            finished TEXT
+                        )
+                        ''')
         self.tracking_db.commit()
 
     def get_tracking_db(self, tracking_db: str=None) -> SQLite3Connection:
@@ -792,15 +2683,21 @@ class Executor(object):
         if not tracking_db:
             db_file_name = "%s.db" % self.run_id
             db_path = os.path.join(working_dir, db_file_name)
-        
-            # get a db connection and initialize it
-            self.tracking_db = sqlite3.connect(db_path)
-            self._init_tracking_db()
         else:
-            self.tracking_db = sqlite3.connect(tracking_db)
+            db_path = os.path.abspath(tracking_db)
+        
+        # runs of the same executor share the connection
+        if self.tracking_db is not None and self._tracking_db_path == db_path:
+            return self.tracking_db
+        
+        # get a db connection and initialize it (tables added by newer versions too)
+        self.tracking_db = sqlite3.connect(db_path)
+        self._tracking_db_path = db_path
+        self._init_tracking_db()
         
         return self.tracking_db
 
+    @traced('_track_ids', 'source_model_name', 'source_ids')
     def _track_ids(self, source_model_name: str, source_ids: list, target_model_name: str, target_ids: list, has_decoupled_relation: bool=False, update_required:bool=False) -> None:
         """
         Track the ids of the migrated records into a sqlite database.
@@ -819,24 +2716,85 @@ class Executor(object):
             update_required (bool): If an update is required in the target instance. Defaults to False.
         """
        
+        # keep the run memo up to date
+        for source_id, target_id in zip(source_ids, target_ids):
+            self._in_flight.discard((source_model_name, source_id))
+            self._resolved[(source_model_name, source_id)] = (target_model_name, target_id)
+        
+        # the one2many children created along with these records can be tracked now
+        if self._pending_children:
+            self._track_children()
+        
         cursor = self.tracking_db.cursor()
         
-        for idx, source_id in enumerate(source_ids):
+        try:
+            if len(source_ids) != len(target_ids):
+                raise ValueError('Got %s source ids and %s target ids' % (len(source_ids), len(target_ids)))
+            
+            # all the rows at once, in a single transaction
+            cursor.executemany('INSERT INTO ids_tracking VALUES (?, ?, ?, ?, ?, ?)', 
+                               [(source_model_name, source_id, target_model_name, target_id, has_decoupled_relation, update_required)
+                                for source_id, target_id in zip(source_ids, target_ids)])
+            self.tracking_db.commit()
+            
+            if update_required:
+                self.metrics.incr(source_model_name, 'pending_decoupled', len(source_ids))
+                self._pending_decoupled.setdefault(source_model_name, set()).update(source_ids)
+                self._batch_decoupled.setdefault(source_model_name, set()).update(source_ids)
+        except Exception as e:
+            message = "Error tracking ids. %s.id=%s --> %s.id=%s" % (source_model_name, source_ids, target_model_name, target_ids)
+            log_entry = {'msg': message, 'model': source_model_name, 'source_ids': source_ids, 'error': repr(e)}
+            
+            debug_payload = None
+            if self.debug:
+                debug_payload = {"stack_trace": traceback.format_exc()}
+            
+            self.logger.log(log_entry, debug_payload=debug_payload)
+            print(message)
+
+    def _track_children(self) -> None:
+        """
+        Track the one2many children created with ``(0, 0, values)`` commands, once their parents exist.
+        
+        The one2many field of the parents is read in one call per target model and field. Children are created 
+        in the commands order, so their target ids, sorted, match the source ids in the commands order.
+        """
+        ready = [entry for entry in self._pending_children if (entry['model'], entry['source_id']) in self._resolved]
+        if not ready:
+            return
+        self._pending_children = [entry for entry in self._pending_children if entry not in ready]
+        
+        groups = {}
+        for entry in ready:
+            target_model_name, target_id = self._resolved[(entry['model'], entry['source_id'])]
+            groups.setdefault((target_model_name, entry['field']), []).append((target_id, entry))
+        
+        for (target_model_name, field), entries in groups.items():
             try:
-                target_id = target_ids[idx]
-                cursor.execute('INSERT INTO ids_tracking VALUES (?, ?, ?, ?, ?, ?)', 
-                                        (source_model_name, source_id, target_model_name, target_id, has_decoupled_relation, update_required))
-                self.tracking_db.commit()
+                records = self.target_odoo.env[target_model_name].browse([target_id for target_id, entry in entries]).read([field])
             except Exception as e:
-                message = "Error tracking ids. %s.id=%s --> %s.id=%s" % (source_model_name, source_ids, target_model_name, target_ids)
-                log_entry = {'message': message, 'error': repr(e)}
-                
-                if self.debug:
-                    stack_trace = traceback.format_exc()
-                    log_entry.update({"stack_trace": stack_trace})
-                
-                Pretty.log(log_entry, self.log_path, overwrite=True, mode='a')
+                message = "Error reading one2many children. %s.%s" % (target_model_name, field)
+                self.logger.log({'msg': message, 'model': target_model_name, 'error': repr(e)})
                 print(message)
+                continue
+            
+            children = {record['id']: sorted(record[field] or []) for record in records}
+            
+            tracked = {}
+            for target_id, entry in entries:
+                child_target_ids = children.get(target_id, [])
+                if len(child_target_ids) != len(entry['child_ids']):
+                    message = "Could not track one2many children. %s.id=%s.%s" % (entry['model'], entry['source_id'], entry['field'])
+                    error = "Got %s target children for %s source children" % (len(child_target_ids), len(entry['child_ids']))
+                    self.logger.log({'msg': message, 'model': entry['model'], 'source_id': entry['source_id'], 'error': error})
+                    continue
+                
+                source_list, target_list = tracked.setdefault(entry['child_model'], ([], []))
+                source_list.extend(entry['child_ids'])
+                target_list.extend(child_target_ids)
+            
+            for child_model_name, (child_source_ids, child_target_ids) in tracked.items():
+                self._track_ids(child_model_name, child_source_ids, self.migration_map.get_target_model(child_model_name), child_target_ids)
 
     def remove_phantom_ids(self, model_name: str, tracking_db: str=None) -> None:
         """
@@ -883,6 +2841,399 @@ class Executor(object):
                     
         return result
 
+    def verify(self, model_name: str, tracking_db: str, migration_map: Union[dict, list]=None, chunk_size: int=1000, 
+               max_mismatches: int=1000) -> dict:
+        """
+        Compare a migrated model between the source and the target instances, in chunks.
+        
+        Counts are compared first: the source and target records (``search_count``) against the tracked ones, so 
+        records created out of the migration, or missed by it, show up. Target records tracked for several source 
+        records (duplicates merged by the search keys) are reported as ``duplicated_targets``.
+        
+        Then the tracked records are read from both instances in chunks of ``chunk_size``, joined through 
+        ``ids_tracking``, and a hash of the mapped fields is computed per chunk and instance. Only the 
+        chunks whose hashes differ are compared record by record.
+        
+        Relational values are compared through the tracking db: a source relation matches when its tracked target id 
+        is the target value. Fields mapped to callables, and relations to models out of the map, are not compared.
+
+        Args:
+            model_name (str): The source model name.
+            tracking_db (str): The tracking database file path of the migration.
+            migration_map (Union[dict, list]): The migration map to use. Defaults to None.
+            chunk_size (int, optional): The number of records read and hashed per request. Defaults to 1000.
+            max_mismatches (int, optional): The maximum number of mismatching records reported. Defaults to 1000.
+
+        Returns:
+            dict: The report.
+        """
+        if migration_map is not None:
+            self.migration_map.normalice_fields(migration_map)
+        
+        self.get_tracking_db(tracking_db)
+        self._match_context()
+        
+        target_model_name = self.migration_map.get_target_model(model_name)
+        source_model = self.source_odoo.env[model_name].with_context(active_test=False)
+        target_model = self.target_odoo.env[target_model_name].with_context(active_test=False)
+        
+        # the comparable fields: source field --> (target field, relation model, field type)
+        model_fields_map = self.migration_map.get_mapping(model_name)['fields']
+        model_fields_metadata = self._get_fields_metadata(1, model_name, list(model_fields_map.keys()))
+        fields = {}
+        for field_name, target_field_name in model_fields_map.items():
+            if field_name == 'id' or not isinstance(target_field_name, str) or field_name not in model_fields_metadata:
+                continue
+            
+            field_type = model_fields_metadata[field_name]['type']
+            relation = model_fields_metadata[field_name].get('relation')
+            if field_type in self.relation_types and relation not in (self.migration_map.map or {}):
+                continue
+            
+            fields[field_name] = (target_field_name, relation if field_type in self.relation_types else None, field_type)
+        
+        cursor = self.tracking_db.cursor()
+        cursor.execute('SELECT COUNT(*), COUNT(DISTINCT source_id), COUNT(DISTINCT target_id) FROM ids_tracking '
+                       'WHERE source_model_name = ? AND target_model_name = ?', (model_name, target_model_name))
+        tracked_count, tracked_sources, tracked_targets = cursor.fetchone()
+        
+        source_count = source_model.search_count([])
+        target_count = target_model.search_count([])
+        
+        cursor.execute('SELECT target_id, GROUP_CONCAT(source_id) FROM ids_tracking WHERE source_model_name = ? AND target_model_name = ? '
+                       'GROUP BY target_id HAVING COUNT(*) > 1 ORDER BY target_id', (model_name, target_model_name))
+        duplicated_targets = [{"target_id": target_id, "source_ids": sorted(int(_id) for _id in source_ids.split(','))} 
+                              for target_id, source_ids in cursor.fetchall()]
+        
+        report = {
+            "model": model_name,
+            "target_model": target_model_name,
+            "source_count": source_count,
+            "target_count": target_count,
+            "tracked_count": tracked_count,
+            # source records not migrated, target records not created by the migration. Set once the tracked ones are read
+            "untracked_in_source": 0,
+            "untracked_in_target": 0,
+            "duplicated_targets_count": len(duplicated_targets),
+            "duplicated_targets": duplicated_targets[:max_mismatches],
+            "fields": list(fields.keys()),
+            "chunks": 0,
+            "mismatching_chunks": 0,
+            "missing_in_source": 0,
+            "missing_in_target": 0,
+            "mismatching_records": 0,
+            "mismatches": [],
+        }
+        
+        cursor.execute('SELECT source_id, target_id FROM ids_tracking WHERE source_model_name = ? AND target_model_name = ? ORDER BY source_id', 
+                       (model_name, target_model_name))
+        
+        while True:
+            pairs = cursor.fetchmany(chunk_size)
+            if not pairs:
+                break
+            
+            report["chunks"] += 1
+            
+            # a target record may be tracked for several source records, see duplicated_targets
+            target_to_sources = {}
+            for source_id, target_id in pairs:
+                target_to_sources.setdefault(target_id, []).append(source_id)
+            
+            source_data = source_model.search_read([['id', 'in', [source_id for source_id, target_id in pairs]]], list(fields.keys()))
+            target_data = target_model.search_read([['id', 'in', list(target_to_sources)]], 
+                                                   list({target_field for target_field, relation, field_type in fields.values()}))
+            
+            # both sides keyed by source id
+            source_values = self._verify_values(source_data, fields, source=True)
+            target_values = self._verify_values(target_data, fields, source=False)
+            tracked_targets -= len(target_to_sources) - len(target_values)
+            target_values = {source_id: values for target_id, values in target_values.items() for source_id in target_to_sources[target_id]}
+            
+            report["missing_in_source"] += len(pairs) - len(source_values)
+            report["missing_in_target"] += len(pairs) - len(target_values)
+            
+            if self._verify_hash(source_values) == self._verify_hash(target_values):
+                continue
+            
+            # drill down the mismatching chunk, record by record
+            report["mismatching_chunks"] += 1
+            for source_id, target_id in pairs:
+                source_record = source_values.get(source_id)
+                target_record = target_values.get(source_id)
+                if source_record == target_record:
+                    continue
+                
+                report["mismatching_records"] += 1
+                if len(report["mismatches"]) >= max_mismatches:
+                    continue
+                
+                if source_record is None or target_record is None:
+                    differences = 'missing in %s' % ('source' if source_record is None else 'target')
+                else:
+                    differences = {field_name: [source_record[field_name], target_record[field_name]] 
+                                   for field_name in fields if source_record[field_name] != target_record[field_name]}
+                report["mismatches"].append({"source_id": source_id, "target_id": target_id, "differences": differences})
+        
+        report["untracked_in_source"] = source_count - (tracked_sources - report["missing_in_source"])
+        report["untracked_in_target"] = target_count - tracked_targets
+        
+        print('Model %s: %s source, %s target and %s tracked records, %s duplicated targets, %s chunks, %s mismatching records' % (
+            model_name, source_count, target_count, tracked_count, len(duplicated_targets), report["chunks"], report["mismatching_records"]))
+        
+        return report
+    
+    def _verify_values(self, data: list, fields: dict, source: bool) -> dict:
+        """
+        Get the comparable values of records read from an instance. Relations are expressed as target ids, through the tracking db.
+
+        Args:
+            data (list): The records, as read.
+            fields (dict): The compared fields: source field --> (target field, relation model, field type).
+            source (bool): True if the records were read from the source instance.
+
+        Returns:
+            dict: The values per source field, per record id.
+        """
+        # the related source records of the chunk, mapped in bulk
+        related = {}
+        if source:
+            for field_name, (target_field_name, relation, field_type) in fields.items():
+                if relation:
+                    ids = related.setdefault(relation, set())
+                    for record in data:
+                        value = record.get(field_name)
+                        if value:
+                            ids.update([value[0]] if field_type == 'many2one' else value)
+            related = {relation: self._find_migrated_many(relation, list(ids)) for relation, ids in related.items()}
+        
+        result = {}
+        for record in data:
+            values = {}
+            for field_name, (target_field_name, relation, field_type) in fields.items():
+                value = record.get(field_name if source else target_field_name)
+                
+                if relation:
+                    ids = ([value[0]] if value else []) if field_type == 'many2one' else (value or [])
+                    if source:
+                        # untracked related records dont match any target id
+                        ids = [related[relation][_id][1] if _id in related[relation] else 'untracked:%s' % _id for _id in ids]
+                    value = sorted(ids, key=str)
+                elif isinstance(value, float):
+                    value = round(value, 6)
+                elif value is None:
+                    value = False
+                
+                values[field_name] = value
+            result[record['id']] = values
+        
+        return result
+    
+    def _verify_hash(self, values: dict) -> str:
+        """
+        Get the hash of the comparable values of a chunk.
+
+        Args:
+            values (dict): The values per source field, per source id.
+
+        Returns:
+            str: The hex digest.
+        """
+        return hashlib.sha1(json.dumps(sorted(values.items()), sort_keys=True, default=str).encode('utf-8')).hexdigest()
+    
+    def rebuild_tracking_db(self, model_name: str, migration_map: Union[dict, list]=None, tracking_db: str=None, 
+                            page_size: int=1000) -> int:
+        """
+        Rebuild the tracking of a model from the external ids of the target, given to records created in ``load`` write mode.
+        
+        ``ir.model.data`` records of the model are read in pages, and the ones not tracked yet are added to the tracking db.
+        
+        .. note:: Decoupled relations of the rebuilt records are not flagged as pending.
+
+        Args:
+            model_name (str): The source model name.
+            migration_map (Union[dict, list]): The migration map, to get the target model. Defaults to None.
+            tracking_db (str): The tracking database file path to rebuild. Defaults to None (creates a new one).
+            page_size (int, optional): The number of external ids read per request. Defaults to 1000.
+
+        Returns:
+            int: The number of records added to the tracking db.
+        """
+        if migration_map is not None:
+            self.migration_map.normalice_fields(migration_map)
+        target_model_name = self.migration_map.get_target_model(model_name) if self.migration_map.map else model_name
+        
+        self.get_tracking_db(tracking_db)
+        
+        prefix = self.get_xmlid(model_name, '').split('.', 1)[1]
+        domain = [['module', '=', self.xmlid_module], ['model', '=', target_model_name], ['name', '=like', prefix + '%']]
+        
+        ir_model_data = self.target_odoo.env['ir.model.data']
+        added = 0
+        last_id = 0
+        while True:
+            page = ir_model_data.search_read(domain + [['id', '>', last_id]], ['name', 'res_id'], order='id ASC', limit=page_size)
+            if not page:
+                break
+            last_id = page[-1]['id']
+            
+            # the source id is the external id suffix
+            target_ids = {}
+            for entry in page:
+                suffix = entry['name'][len(prefix):]
+                if suffix.isdigit():
+                    target_ids[int(suffix)] = entry['res_id']
+            
+            migrated = self._find_migrated_many(model_name, list(target_ids))
+            source_ids = [source_id for source_id in target_ids if source_id not in migrated]
+            if source_ids:
+                self._track_ids(model_name, source_ids, target_model_name, [target_ids[source_id] for source_id in source_ids])
+                added += len(source_ids)
+        
+        print('Model %s: %s records added to the tracking db' % (model_name, added))
+        
+        return added
+    
+    def sync_deletes(self, model_name: str, tracking_db: str, mode: str="archive", dry_run: bool=False, 
+                     page_size: int=5000, chunk_size: int=500) -> dict:
+        """
+        Propagate to the target the records deleted in the source since they were migrated.
+        
+        Every current source id of the model (archived ones included) is streamed with keyset pagination 
+        into a temporary table of the tracking db, and diffed there against ``ids_tracking``. The target records 
+        of the tracked ids missing in the source are archived or unlinked in chunks, and their tracking rows removed.
+
+        Args:
+            model_name (str): The source model name.
+            tracking_db (str): The tracking database file path, the one of the migration.
+            mode (str, optional): ``archive`` (set ``active`` to False) or ``unlink``. Defaults to "archive".
+                Target models without an ``active`` field cant be archived, their records are reported as skipped.
+            dry_run (bool, optional): If True, only report what would be removed. Defaults to False.
+            page_size (int, optional): The number of source ids read per request. Defaults to 5000.
+            chunk_size (int, optional): The number of target records archived / unlinked per request. Defaults to 500.
+
+        Returns:
+            dict: The report: the removed, skipped and failed records per target model.
+        """
+        if mode not in ('archive', 'unlink'):
+            raise ValueError('Unsupported mode %s, use archive or unlink' % mode)
+        
+        self.get_tracking_db(tracking_db)
+        cursor = self.tracking_db.cursor()
+        
+        # stream the source ids into an id set
+        cursor.execute('CREATE TEMP TABLE IF NOT EXISTS source_ids (id INTEGER PRIMARY KEY)')
+        cursor.execute('DELETE FROM temp.source_ids')
+        
+        source_model = self.source_odoo.env[model_name].with_context(active_test=False)
+        last_id = 0
+        while True:
+            ids = source_model.search([['id', '>', last_id]], order='id ASC', limit=page_size)
+            if not ids:
+                break
+            cursor.executemany('INSERT OR IGNORE INTO temp.source_ids VALUES (?)', [(_id,) for _id in ids])
+            last_id = ids[-1]
+        
+        cursor.execute('SELECT COUNT(*) FROM temp.source_ids')
+        source_count = cursor.fetchone()[0]
+        
+        # the diff
+        cursor.execute('''SELECT source_id, target_model_name, target_id FROM ids_tracking 
+                          WHERE source_model_name = ? AND source_id NOT IN (SELECT id FROM temp.source_ids)
+                          ORDER BY target_model_name, target_id''', (model_name,))
+        deleted = {}
+        for source_id, target_model_name, target_id in cursor.fetchall():
+            deleted.setdefault(target_model_name, []).append((source_id, target_id))
+        
+        report = {"model": model_name, "mode": mode, "dry_run": dry_run, "source_records": source_count, 
+                  "removed": {}, "skipped": {}, "failed": {}}
+        
+        for target_model_name, rows in deleted.items():
+            if mode == 'archive' and 'active' not in self.get_fields(2, target_model_name):
+                report["skipped"][target_model_name] = [{"source_id": s, "target_id": t} for s, t in rows]
+                continue
+            
+            for chunk in self._split_into_batches(rows, chunk_size):
+                entries = [{"source_id": s, "target_id": t} for s, t in chunk]
+                target_ids = [t for s, t in chunk]
+                
+                if not dry_run:
+                    try:
+                        if mode == 'archive':
+                            self._target_write(target_model_name, target_ids, {'active': False})
+                        else:
+                            self._target_unlink(target_model_name, target_ids)
+                    except Exception as e:
+                        message = "Could not %s deleted records. %s.id=%s" % (mode, target_model_name, target_ids)
+                        self.logger.log({'msg': message, 'model': model_name, 'target_ids': target_ids, 'error': repr(e)})
+                        print(message)
+                        report["failed"].setdefault(target_model_name, []).extend(entries)
+                        continue
+                    
+                    cursor.executemany('DELETE FROM ids_tracking WHERE source_model_name = ? AND source_id = ?', 
+                                       [(model_name, s) for s, t in chunk])
+                    self.tracking_db.commit()
+                
+                report["removed"].setdefault(target_model_name, []).extend(entries)
+        
+        # end the id set transaction, it locks the tracking db for other connections
+        cursor.execute('DROP TABLE temp.source_ids')
+        self.tracking_db.commit()
+        
+        self.logger.close()
+        
+        return report
+    
+    @traced('unlink', 'target_model_name', 'ids')
+    def _target_unlink(self, target_model_name: str, ids: list) -> bool:
+        """
+        Delete records of the target instance.
+
+        Args:
+            target_model_name (str): The target model name.
+            ids (list): The target ids.
+
+        Returns:
+            bool: True if deleted.
+        """
+        return self._get_target_model(target_model_name).unlink(ids)
+    
+    @traced('copy', 'target_model_name')
+    def _target_copy(self, target_model_name: str, target_id: int, values: dict) -> int:
+        """
+        Copy a record of the target instance.
+
+        Args:
+            target_model_name (str): The target model name.
+            target_id (int): The id of the record to copy.
+            values (dict): The values to set on the copy.
+
+        Returns:
+            int: The id of the copy.
+        """
+        res = self._get_target_model(target_model_name).copy(target_id, values)
+        
+        # recent versions return a list of ids
+        return res[0] if isinstance(res, list) else res
+    
+    def _get_target_model(self, target_model_name: str):
+        """
+        Get a target model with the context of the profiles enabled for it in the map (see ``MigrationMap.get_context``).
+
+        Args:
+            target_model_name (str): The target model name.
+
+        Returns:
+            odoorpc.models.Model: The target model.
+        """
+        target_model = self.target_odoo.env[target_model_name]
+        
+        context = self.migration_map.get_context(target_model_name)
+        if context:
+            target_model = target_model.with_context(**context)
+        
+        return target_model
+
     def _remove_implicit_fields(self, fields):
         """
         Remove implicit fields from the fields list
@@ -931,7 +3282,7 @@ class Executor(object):
             batches.append(batch)
         return batches
     
-    def _match_context(self, source_odoo: odoorpc.ODOO=None, target_odoo: odoorpc.ODOO=None) -> bool:
+    def _match_context(self, source_odoo: "odoorpc.ODOO"=None, target_odoo: "odoorpc.ODOO"=None) -> bool:
         """
         Apply the source context to the target odoo instance to avoid translation and datetimes problems.
 
@@ -943,18 +3294,25 @@ class Executor(object):
             bool: True if everything went ok.
         """
         
-        if source_odoo is None:
-            source_odoo = self.source_odoo
         if target_odoo is None:
             target_odoo = self.target_odoo
         
-        if source_odoo is None or target_odoo is None:
-            return False
-        
         _to_match = ['lang', 'tz']
         
+        # when loading from a staging store, the source context was saved at extract time
+        if source_odoo is None and self.staging is not None:
+            source_context = self.staging.get_meta('source_context', {})
+        else:
+            if source_odoo is None:
+                source_odoo = self.source_odoo
+            source_context = source_odoo.env.context if source_odoo is not None else None
+        
+        if source_context is None or target_odoo is None:
+            return False
+        
         for key in _to_match:
-            target_odoo.env.context[key] = source_odoo.env.context[key]
+            if key in source_context:
+                target_odoo.env.context[key] = source_context[key]
         
         target_odoo.env.context.update(self.record_create_options)
                 
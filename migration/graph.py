@@ -0,0 +1,337 @@
+# -*- coding: utf-8 -*-
+
+"""
+This module provides the RelationGraph class, a graph of the relations between odoo models
+used to explore big schemas, render relation trees and export them.
+"""
+
+import json
+from collections import deque
+
+
+class RelationGraph:
+    """
+    A graph with one node per model and one edge per relational field.
+
+    Every model metadata is fetched only once, no matter how many relations point to it,
+    so building the graph is linear in the number of models. Relation trees like the ones
+    made by ``make-tree`` are rendered lazily from the graph.
+
+    Example usage::
+
+        graph = RelationGraph.build(executor, 'crm.lead', recursion_level=4)
+        graph.save_tree('crm.lead_tree.txt')
+        graph.reachable('crm.lead', depth=2)
+        graph.cycles()
+    """
+
+    nodes = None
+    """
+    A dict with the models in the graph and the number of fields of each one.
+    The value is None when the model metadata was not fetched (it is beyond the build depth).
+    """
+
+    edges = None
+    """
+    A dict with the relations of every model::
+
+        {
+            'model_name': [(field_name, relation_type, related_model_name), ...]
+        }
+
+    """
+
+    #: The model the graph was built from
+    root = None
+
+    #: The depth the graph was built with
+    depth = None
+
+    def __init__(self, root: str=None, depth: int=None):
+        """ Initialize the RelationGraph class.
+
+        Args:
+            root (str, optional): The model the graph is built from. Defaults to None.
+            depth (int, optional): The depth the graph is built with. Defaults to None.
+        """
+        self.nodes = {}
+        self.edges = {}
+        self.root = root
+        self.depth = depth
+
+    @classmethod
+    def build(cls, executor: object, model_name: str, recursion_level: int=0, instance: int=1, max_workers: int=8) -> "RelationGraph":
+        """
+        Build the relation graph for a model until the recursion level.
+        Models are visited breadth first and the metadata of every level is fetched concurrently.
+
+        Args:
+            executor (object): An ``Executor`` instance, used to get the fields metadata.
+            model_name (str): The model to build the graph from.
+            recursion_level (int): How many relations deep to go. Defaults to 0.
+            instance (int): The instance to get the metadata from (1: source, 2: target). Defaults to 1.
+            max_workers (int): The maximum number of concurrent metadata requests. Defaults to 8.
+
+        Returns:
+            RelationGraph: The relation graph.
+        """
+        graph = cls(root=model_name, depth=recursion_level)
+        graph.add_node(model_name)
+
+        visited = {model_name}
+        queue = [model_name]
+        level = 0
+
+        while queue and level < recursion_level:
+            metadata = executor.get_fields_many([(instance, _model_name) for _model_name in queue], max_workers=max_workers)
+
+            next_queue = []
+            for _model_name in queue:
+                fields = metadata[(instance, _model_name)]
+                graph.add_node(_model_name, field_count=len(fields))
+
+                for field, field_data in fields.items():
+                    if field_data['type'] in executor.relation_types:
+                        related_model_name = field_data['relation']
+                        graph.add_edge(_model_name, field, field_data['type'], related_model_name)
+
+                        if related_model_name not in visited:
+                            visited.add(related_model_name)
+                            next_queue.append(related_model_name)
+
+            queue = next_queue
+            level += 1
+
+        return graph
+
+    def add_node(self, model_name: str, field_count: int=None) -> None:
+        """
+        Add a model to the graph.
+
+        Args:
+            model_name (str): The model name.
+            field_count (int, optional): The number of fields of the model. Defaults to None (not fetched).
+        """
+        if field_count is not None or model_name not in self.nodes:
+            self.nodes[model_name] = field_count
+        self.edges.setdefault(model_name, [])
+
+    def add_edge(self, model_name: str, field: str, relation_type: str, related_model_name: str) -> None:
+        """
+        Add a relation to the graph.
+
+        Args:
+            model_name (str): The model holding the relational field.
+            field (str): The relational field name.
+            relation_type (str): The relation type. Ex: many2one
+            related_model_name (str): The model the field points to.
+        """
+        self.add_node(model_name, self.nodes.get(model_name))
+        self.add_node(related_model_name, self.nodes.get(related_model_name))
+        self.edges[model_name].append((field, relation_type, related_model_name))
+
+    def reachable(self, model_name: str=None, depth: int=None) -> dict:
+        """
+        Get the models reachable from a model within a depth.
+
+        Args:
+            model_name (str, optional): The model to start from. Defaults to the graph root.
+            depth (int, optional): The maximum number of relations to follow. Defaults to the graph depth.
+
+        Returns:
+            dict: The reachable models and their distance (in relations) from ``model_name``.
+        """
+        model_name = model_name or self.root
+        depth = self.depth if depth is None else depth
+
+        distances = {model_name: 0}
+        queue = deque([model_name])
+
+        while queue:
+            _model_name = queue.popleft()
+            if distances[_model_name] >= depth:
+                continue
+
+            for field, relation_type, related_model_name in self.edges.get(_model_name, []):
+                if related_model_name not in distances:
+                    distances[related_model_name] = distances[_model_name] + 1
+                    queue.append(related_model_name)
+
+        return distances
+
+    def cycles(self) -> list:
+        """
+        Get the relation cycles in the graph.
+        A cycle is reported as the group of models that can reach each other
+        (a strongly connected component), or as a single model that points to itself.
+
+        Returns:
+            list: A sorted list of sorted lists of model names.
+        """
+        index = {}
+        lowlink = {}
+        on_stack = set()
+        stack = []
+        result = []
+        counter = 0
+
+        # iterative Tarjan, big schemas are too deep for python recursion
+        for start in self.nodes:
+            if start in index:
+                continue
+
+            work = [(start, iter(self.edges.get(start, [])))]
+            index[start] = lowlink[start] = counter
+            counter += 1
+            stack.append(start)
+            on_stack.add(start)
+
+            while work:
+                _model_name, _edges = work[-1]
+                advanced = False
+
+                for field, relation_type, related_model_name in _edges:
+                    if related_model_name not in index:
+                        index[related_model_name] = lowlink[related_model_name] = counter
+                        counter += 1
+                        stack.append(related_model_name)
+                        on_stack.add(related_model_name)
+                        work.append((related_model_name, iter(self.edges.get(related_model_name, []))))
+                        advanced = True
+                        break
+                    elif related_model_name in on_stack:
+                        lowlink[_model_name] = min(lowlink[_model_name], index[related_model_name])
+
+                if advanced:
+                    continue
+
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[_model_name])
+
+                if lowlink[_model_name] == index[_model_name]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == _model_name:
+                            break
+
+                    is_self_referencing = any(edge[2] == _model_name for edge in self.edges.get(_model_name, []))
+                    if len(component) > 1 or is_self_referencing:
+                        result.append(sorted(component))
+
+        return sorted(result)
+
+    def iter_tree(self, model_name: str=None, depth: int=None):
+        """
+        Render the relation tree of a model, line by line.
+        The output has the same format the former ``treelib`` based tree had::
+
+            crm.lead
+            ├── activity_ids->mail.activity
+            │   ├── activity_type_id->mail.activity.type
+
+        Args:
+            model_name (str, optional): The tree root model. Defaults to the graph root.
+            depth (int, optional): The tree depth. Defaults to the graph depth.
+
+        Yields:
+            str: The tree lines.
+        """
+        model_name = model_name or self.root
+        depth = self.depth if depth is None else depth
+
+        yield model_name
+        yield from self._iter_subtree(model_name, prefix="", depth=depth)
+
+    def _iter_subtree(self, model_name: str, prefix: str, depth: int):
+        """
+        Render the children of a tree node.
+
+        Args:
+            model_name (str): The node model name.
+            prefix (str): The prefix of the node children lines.
+            depth (int): The depth left.
+
+        Yields:
+            str: The tree lines.
+        """
+        if depth <= 0:
+            return
+
+        edges = sorted(self.edges.get(model_name, []), key=lambda edge: "%s->%s" % (edge[0], edge[2]))
+
+        for idx, (field, relation_type, related_model_name) in enumerate(edges):
+            is_last = idx == len(edges) - 1
+            yield prefix + ("└── " if is_last else "├── ") + "%s->%s" % (field, related_model_name)
+            yield from self._iter_subtree(related_model_name, prefix + ("    " if is_last else "│   "), depth - 1)
+
+    def save_tree(self, file_path: str, model_name: str=None, depth: int=None) -> None:
+        """
+        Write the relation tree of a model to a file.
+
+        Args:
+            file_path (str): The path to the file.
+            model_name (str, optional): The tree root model. Defaults to the graph root.
+            depth (int, optional): The tree depth. Defaults to the graph depth.
+        """
+        with open(file_path, 'w') as file:
+            for line in self.iter_tree(model_name, depth):
+                file.write(line + '\n')
+
+    def to_dot(self) -> str:
+        """
+        Export the graph in Graphviz DOT format.
+
+        Returns:
+            str: The graph in DOT format.
+        """
+        lines = ['digraph "%s" {' % (self.root or 'relations'), '    node [shape=box];']
+
+        for model_name in self.nodes:
+            lines.append('    "%s";' % model_name)
+
+        for model_name, edges in self.edges.items():
+            for field, relation_type, related_model_name in edges:
+                lines.append('    "%s" -> "%s" [label="%s (%s)"];' % (model_name, related_model_name, field, relation_type))
+
+        lines.append('}')
+        return '\n'.join(lines) + '\n'
+
+    def to_json(self) -> dict:
+        """
+        Export the graph as a JSON serializable dict.
+
+        Returns:
+            dict: The graph as ``{root, depth, nodes, edges}``.
+        """
+        return {
+            "root": self.root,
+            "depth": self.depth,
+            "nodes": [{"model": model_name, "field_count": field_count} for model_name, field_count in self.nodes.items()],
+            "edges": [{"source": model_name, "field": field, "type": relation_type, "target": related_model_name}
+                      for model_name, edges in self.edges.items()
+                      for field, relation_type, related_model_name in edges],
+        }
+
+    def save(self, file_path: str, output_format: str='txt') -> None:
+        """
+        Write the graph to a file.
+
+        Args:
+            file_path (str): The path to the file.
+            output_format (str): One of ``txt`` (relation tree), ``dot`` or ``json``. Defaults to ``txt``.
+        """
+        if output_format == 'txt':
+            self.save_tree(file_path)
+        elif output_format == 'dot':
+            with open(file_path, 'w') as file:
+                file.write(self.to_dot())
+        elif output_format == 'json':
+            with open(file_path, 'w') as file:
+                json.dump(self.to_json(), file, indent=4)
+        else:
+            raise ValueError('Unknown graph format %s. Use txt, dot or json.' % output_format)
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+
+"""
+This module provides the MigrationManifest class, used to migrate several models in one process:
+the steps of a manifest file share the connections, metadata, identity caches and tracking db.
+"""
+
+import os
+import json
+from datetime import datetime
+
+
+class MigrationManifest:
+    """
+    A list of migration steps, run in order by a single ``Executor``.
+
+    The manifest is a JSON file, or a YAML file (``.yaml`` / ``.yml``, needs PyYAML). Ex::
+
+        {
+            "tracking_db": "crm.db",
+            "defaults": {"batch_size": 50, "recursion": 4},
+            "steps": [
+                {"model": "res.partner", "hierarchy_field": "parent_id", "batch_size": 200, "recursion": 1},
+                {"model": "crm.lead", "migration_map": "maps/crm.lead.json", "domain": [["type", "=", "opportunity"]]},
+                {"name": "lead messages", "model": "mail.message", "domain": [["model", "=", "crm.lead"]], "recursion": 2}
+            ]
+        }
+
+    Step keys:
+        - model: The model to migrate. Required.
+        - name: The step name, unique in the manifest. Defaults to the model name.
+        - migration_map: The path to the migration map file. Defaults to the map found for the model.
+        - domain: A search domain selecting the records to migrate. Defaults to all the records.
+        - ids: The source ids to migrate, instead of a domain.
+        - batch_size, recursion, hierarchy_field, upsert: As in ``Executor.migrate``.
+
+    Relative paths are relative to the manifest file. ``defaults`` apply to every step.
+
+    Steps are checkpointed in the ``manifest_steps`` table of the tracking db: running the manifest again
+    skips the finished steps, and resumes the others (interrupted, or with failed records) skipping their 
+    records migrated already. A step is finished when none of its records failed (see ``failed_records``).
+    """
+
+    #: The keys a step may have
+    step_keys = ['name', 'model', 'migration_map', 'domain', 'ids', 'batch_size', 'recursion', 'hierarchy_field', 'upsert']
+
+    #: The step options given to ``Executor.migrate`` when not set
+    default_options = {"batch_size": 50, "recursion": 4, "hierarchy_field": None, "upsert": False}
+
+    #: The steps, in order
+    steps = None
+
+    #: The path to the tracking db shared by the steps, None for a new one
+    tracking_db = None
+
+    def __init__(self, steps: list, tracking_db: str=None, defaults: dict=None, base_dir: str=None):
+        """ Initialize the MigrationManifest class.
+
+        Args:
+            steps (list): The steps, see the step keys above.
+            tracking_db (str, optional): The path to the tracking db shared by the steps. Defaults to None (a new one).
+            defaults (dict, optional): Options applied to every step. Defaults to None.
+            base_dir (str, optional): The directory relative paths are relative to. Defaults to None (the current directory).
+
+        Raises:
+            ValueError: If a step is not valid.
+        """
+        base_dir = base_dir or os.getcwd()
+
+        self.tracking_db = os.path.join(base_dir, tracking_db) if tracking_db else None
+        self.steps = []
+
+        names = set()
+        for step in steps:
+            step = dict(self.default_options, **dict(defaults or {}, **step))
+
+            unknown = set(step) - set(self.step_keys)
+            if unknown:
+                raise ValueError('Unknown manifest step keys: %s' % ', '.join(sorted(unknown)))
+            if not step.get('model'):
+                raise ValueError('Manifest step without model: %s' % step)
+
+            step.setdefault('name', step['model'])
+            if step['name'] in names:
+                raise ValueError('Duplicated manifest step name %s, name the steps of the same model' % step['name'])
+            names.add(step['name'])
+
+            if step.get('migration_map'):
+                step['migration_map'] = os.path.join(base_dir, step['migration_map'])
+
+            self.steps.append(step)
+
+    @classmethod
+    def load(cls, file_path: str) -> "MigrationManifest":
+        """
+        Load a manifest file, JSON or YAML.
+
+        Args:
+            file_path (str): The path to the manifest file.
+
+        Returns:
+            MigrationManifest: The manifest.
+        """
+        with open(file_path, 'r') as file:
+            if file_path.endswith(('.yaml', '.yml')):
+                import yaml
+                content = yaml.safe_load(file)
+            else:
+                content = json.load(file)
+
+        return cls(content.get('steps', []), tracking_db=content.get('tracking_db'), defaults=content.get('defaults'),
+                   base_dir=os.path.dirname(os.path.abspath(file_path)))
+
+    def run(self, executor: object, restart: bool=False) -> dict:
+        """
+        Run the steps in order with an executor.
+
+        Args:
+            executor (object): The ``Executor`` shared by the steps.
+            restart (bool, optional): Run the finished steps again, for the records not migrated yet 
+                (all of them in upsert mode). Defaults to False.
+
+        Returns:
+            dict: The status per step name: done, skipped (finished in a previous run) or failed (no migration map 
+            for the model, or failed records).
+        """
+        tracking_db = self.tracking_db or os.path.join(os.getcwd(), "%s.db" % executor.run_id)
+        
+        # the steps share this connection, see Executor.get_tracking_db
+        cursor = executor.get_tracking_db(tracking_db).cursor()
+
+        # maps are read once, steps may share them
+        maps = {}
+        result = {}
+        for step in self.steps:
+            cursor.execute('SELECT status FROM manifest_steps WHERE step = ?', (step['name'],))
+            row = cursor.fetchone()
+            status = row[0] if row else None
+
+            if status == 'done' and not restart:
+                print('Step %s: finished in a previous run, skipped' % step['name'])
+                result[step['name']] = 'skipped'
+                continue
+
+            # never run with the map of a previous step
+            migration_map = step.get('migration_map')
+            if migration_map and migration_map not in maps and os.path.exists(migration_map):
+                maps[migration_map] = executor.migration_map.load_from_file(file_path=migration_map)
+            if step['model'] not in maps.get(migration_map, {}):
+                print('Step %s: no migration map for model %s (%s)' % (step['name'], step['model'], migration_map))
+                self._set_status(executor, step, 'failed')
+                result[step['name']] = 'failed'
+                continue
+            executor.migration_map.map = maps[migration_map]
+
+            print('Step %s: migrating %s' % (step['name'], step['model']))
+            started = datetime.now().isoformat(timespec='seconds')
+            cursor.execute('INSERT INTO manifest_steps (step, model_name, status, started) VALUES (?, ?, ?, ?) '
+                           'ON CONFLICT(step) DO UPDATE SET status = excluded.status, started = excluded.started, finished = NULL',
+                           (step['name'], step['model'], 'running', started))
+            executor.tracking_db.commit()
+
+            # a step run before goes on with the records not migrated yet
+            executor.migrate(step['model'], recursion_level=step['recursion'], batch_size=step['batch_size'],
+                             source_ids=step.get('ids'), tracking_db=tracking_db, hierarchy_field=step['hierarchy_field'],
+                             upsert=step['upsert'], domain=step.get('domain'), resume=status is not None and not step['upsert'])
+
+            # batch errors are logged, not raised, the failed records are left in the tracking db
+            cursor.execute('SELECT COUNT(*) FROM failed_records WHERE model_name = ? AND phase = ? AND last_attempt >= ?',
+                           (step['model'], 'migrate', started))
+            failed = cursor.fetchone()[0]
+            if failed:
+                print('Step %s: %s records failed, run the manifest again (or retry-failed) to finish it' % (step['name'], failed))
+
+            result[step['name']] = 'failed' if failed else 'done'
+            self._set_status(executor, step, result[step['name']])
+
+        return result
+
+    def _set_status(self, executor: object, step: dict, status: str) -> None:
+        """
+        Store the status of a step run in the tracking db.
+
+        Args:
+            executor (object): The ``Executor`` running the steps.
+            step (dict): The step.
+            status (str): The status: done or failed.
+        """
+        now = datetime.now().isoformat(timespec='seconds')
+        cursor = executor.tracking_db.cursor()
+        cursor.execute('INSERT INTO manifest_steps (step, model_name, status, started, finished) VALUES (?, ?, ?, ?, ?) '
+                       'ON CONFLICT(step) DO UPDATE SET status = excluded.status, finished = excluded.finished',
+                       (step['name'], step['model'], status, now, now))
+        executor.tracking_db.commit()
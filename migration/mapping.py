@@ -8,8 +8,7 @@ with data used as a sort of migration schema for data migration between odoo ins
 import json
 from typing import Union
 
-import treelib
-
+from graph import RelationGraph
 from exceptions import MissingModelMappingException, BadFieldMappingException, TooDeepException
 
 class MigrationMap:
@@ -28,27 +27,19 @@ class MigrationMap:
 
     """
     
-    map = None
-    """
-    Containes the mapping between the source and destination models/fields.
-
-    A map entry is a dict with the following structure::
-
-        {
-            'source_model_name': {
-                'search_keys': {'source_field1': 'destination_field1', 
-                                'source_field2': 'destination_field2', ...},
-                'target_model': 'target_model_name',
-                'fields': {
-                    'source_field': 'destination_field',
-                    ...
-                },
-                'removed': ['field1', 'field2', ...],
-                'new': ['field1', 'field2', ...]
-            }
-        }
-
-    """
+    #: Named context keys sets, enabled per model with the ``context_profiles`` map key.
+    #: They are sent with every create, write, load and unlink of the target model, to skip 
+    #: side effects (mail tracking, followers, notifications, ...) during bulk loads.
+    context_profiles = {
+        'mail_notrack': {'mail_notrack': True},
+        'tracking_disable': {'tracking_disable': True},
+        'mail_create_nolog': {'mail_create_nolog': True},
+        'mail_create_nosubscribe': {'mail_create_nosubscribe': True},
+        'mail_auto_subscribe_no_notify': {'mail_auto_subscribe_no_notify': True},
+        'defer_parent_store_computation': {'defer_parent_store_computation': True},
+        'no_reset_password': {'no_reset_password': True},
+        'import_file': {'import_file': True},
+    }
     
     #: Default fields to search for a record in the source and target model.
     default_search_keys = {"name": "name"}
@@ -62,10 +53,45 @@ class MigrationMap:
                 an ``Executor`` ( it provides a connection to the source and 
                 destination databases and other tools). Defaults to None.
         """
+        # the target models context, see get_context
+        self._contexts = {}
         self.map = {}
         self.transformers = {}
         self.executor = executor
 
+    @property
+    def map(self) -> dict:
+        """
+        Get the mapping between the source and destination models/fields.
+        Setting a new map clears the cached target model contexts (see ``get_context``).
+
+        A map entry is a dict with the following structure::
+
+            {
+                'source_model_name': {
+                    'search_keys': {'source_field1': 'destination_field1', 
+                                    'source_field2': 'destination_field2', ...},
+                    'target_model': 'target_model_name',
+                    'fields': {
+                        'source_field': 'destination_field',
+                        ...
+                    },
+                    'removed': ['field1', 'field2', ...],
+                    'new': ['field1', 'field2', ...],
+                    'context_profiles': ['profile1', 'profile2', ...]
+                }
+            }
+
+        Returns:
+            dict: The map.
+        """
+        return self._map
+
+    @map.setter
+    def map(self, value: dict):
+        self._map = value
+        self._contexts = {}
+
     def get_mapping(self, source_model_name: str= None):
         """
         Get the mapping for a model.
@@ -112,6 +138,36 @@ class MigrationMap:
         """
         return self.get_mapping(source_model_name).get("search_keys", self.default_search_keys)
     
+    def get_context(self, target_model_name: str) -> dict:
+        """
+        Get the context keys of the profiles enabled for a target model, by the map entries migrating to it.
+
+        Args:
+            target_model_name (str): The target model name.
+
+        Raises:
+            BadFieldMappingException: Raised when a profile is unknown.
+
+        Returns:
+            dict: The context keys. Empty if no profile is enabled.
+        """
+        # sent with every write, the map is scanned once per target model (until a new map is set)
+        if target_model_name in self._contexts:
+            return self._contexts[target_model_name]
+        
+        context = {}
+        for source_model_name, mapping in (self.map or {}).items():
+            if mapping.get("target_model", source_model_name) != target_model_name:
+                continue
+            
+            for profile in mapping.get("context_profiles", []):
+                if profile not in self.context_profiles:
+                    raise BadFieldMappingException("Unknown context profile '{}' for model '{}'".format(profile, source_model_name))
+                context.update(self.context_profiles[profile])
+        
+        self._contexts[target_model_name] = context
+        return context
+    
     def add_transformer(self, transformer, model: str, field: str) -> dict:
         """
         Add a transformer to the models / fields map.
@@ -136,57 +192,31 @@ class MigrationMap:
         self.transformers[transformer.__name__] = transformer
         return self.map
 
-    def model_tree(self, model_name: str, recursion_level: int=0) -> dict:
+    def model_tree(self, model_name: str, recursion_level: int=0, max_workers: int=8) -> RelationGraph:
         """
-        Make a relation tree for the model until the recursion level.
+        Make a relation graph for the model until the recursion level.
+        Every model metadata is fetched only once, the relation tree is rendered lazily from the graph 
+        (see ``RelationGraph.save_tree``).
 
         Args:
             model_name (str): The model name to make the relation tree for.
             recursion_level (int): The recursion level to apply. Defaults to 0.
+            max_workers (int): The maximum number of concurrent metadata requests. Defaults to 8.
 
         Returns:
-            dict: The relation tree for the model.
+            RelationGraph: The relation graph for the model.
         """
-        
-        def _build_tree(_model_name, from_field=None, _level=None):
-            
-            tree = treelib.Tree()
-            
-            if _level is None:
-                _level = 0
-                node = tree.create_node(tag=_model_name)
-            else:
-                tag = "%s->%s" % (from_field, _model_name)
-                node = tree.create_node(tag=tag)
-                        
-            if _level == recursion_level:
-                return tree
-                
-            # get odoo model and field metadata
-            source_model = self.executor.source_odoo.env[_model_name]
-            field_metadata = source_model.fields_get()
-            
-            # build tree
-            for field, field_data in field_metadata.items():
-                field_type = field_data['type']
-                if field_type in self.executor.relation_types:
-                    
-                    new_model = field_data['relation']
-                    
-                    tag = "%s->%s" % (field, _model_name)
-                    
-                    new_tree = _build_tree(_model_name=new_model, from_field=field, _level=_level + 1)
-                    tree.paste(nid=node.identifier, new_tree=new_tree)
-            
-            return tree
-                
-        return _build_tree(model_name)
+        return RelationGraph.build(self.executor, model_name, recursion_level=recursion_level, max_workers=max_workers)
 
-    def generate_full_map(self, model_name:str, target_model_name:str = None, recursion_level: int=0) -> dict:
+    def generate_full_map(self, model_name:str, target_model_name:str = None, recursion_level: int=0, max_workers: int=8) -> dict:
         """
         Make a fields map from a list of source and target fields.
         The output is intended to be feed to other migration methods / tools.
         
+        Related models are visited breadth first through a work queue, so every model is mapped only once 
+        (at the shallowest level it is reached). The fields metadata of every queue level is fetched 
+        concurrently from both instances.
+        
         Args:
             model_name (str): The main source model name to map from.
             target_model_name (str): The main target model name to map to.
@@ -195,6 +225,7 @@ class MigrationMap:
                 - If 1, only the first level of related models/fields will be mapped.
                 - If 2, the first and second level of related models/fields will be mapped.
                 - ...
+            max_workers (int): The maximum number of concurrent metadata requests. Defaults to 8.
         Raises:
             Exception: Raised when no executor instance is provided.
             TooDeepException: Raised when the recursion level is not enough to traverse a relation field.
@@ -213,21 +244,66 @@ class MigrationMap:
         if self.executor is None:
             raise Exception('Error: No executor instance provided. Cant make the fields map.')
         
-        # model_name is actually the source model to migrate
-        source_model_name = model_name
-        
         # target_model_name can be None. Example if the user is not interested in recursion
         if target_model_name is None or target_model_name == '':
             target_model_name = model_name
-                
-        source_fields = self.executor.get_fields(instance=1, model_name=source_model_name, summary_only=False)
-        target_fields = self.executor.get_fields(instance=2, model_name=target_model_name, summary_only=False)
         
         map = {}
+        
+        # model_name is actually the source model to migrate
+        visited = {model_name}
+        queue = [(model_name, target_model_name)]
+        
+        while queue:
+            
+            # fetch the metadata of the whole queue level at once
+            requests = []
+            for source_model_name, _target_model_name in queue:
+                requests.extend([(1, source_model_name), (2, _target_model_name)])
+            metadata = self.executor.get_fields_many(requests, max_workers=max_workers)
+            
+            # and map it in queue order, so the result does not depend on the fetch order
+            next_queue = []
+            for source_model_name, _target_model_name in queue:
+                entry, related_models = self._map_model(model_name=source_model_name, target_model_name=_target_model_name, 
+                                                        source_fields=metadata[(1, source_model_name)], 
+                                                        target_fields=metadata[(2, _target_model_name)], 
+                                                        recursion_level=recursion_level)
+                map[source_model_name] = entry
+                
+                for related_source_model_name, related_target_model_name in related_models:
+                    if related_source_model_name not in visited:
+                        visited.add(related_source_model_name)
+                        next_queue.append((related_source_model_name, related_target_model_name))
+            
+            queue = next_queue
+            recursion_level -= 1
+        
+        self.map = map
+        return map
+    
+    def _map_model(self, model_name: str, target_model_name: str, source_fields: dict, target_fields: dict, recursion_level: int) -> tuple:
+        """
+        Make the map entry for a single model.
+
+        Args:
+            model_name (str): The source model name.
+            target_model_name (str): The target model name.
+            source_fields (dict): The source fields metadata.
+            target_fields (dict): The target fields metadata.
+            recursion_level (int): The recursion level left for the model relations.
+
+        Raises:
+            TooDeepException: Raised when the recursion level is not enough to traverse a relation field.
+
+        Returns:
+            tuple: The map entry and a list of (source_model_name, target_model_name) tuples with the related models to map.
+        """
         submap = {}
         removed_fields = []
         new_fields = list(target_fields.copy().keys())
         too_deep = []
+        related_models = []
 
         # # this is necceary cause the source or target fields maybe empty (because the model does not exist)
         field_list = list(source_fields.copy().keys())
@@ -257,10 +333,8 @@ class MigrationMap:
                             print('Warning: Source Field %s.%s poiting to %s is not a relation in target instance.' % (model_name, field, related_source_model_name))
                             print('You have to adjust the fields map with a transformer function or remove the field from the map.')
                         else: # if no errors
-                            # build a new map for the related models
-                            new_map = self.generate_full_map(model_name=related_source_model_name, target_model_name=related_target_model_name, 
-                                                            recursion_level=recursion_level - 1)                        
-                            map.update(new_map)
+                            # queue the related models to be mapped
+                            related_models.append((related_source_model_name, related_target_model_name))
                     elif self.executor.recursion_mode == 'w':
                         
                         # mark the field as too deep
@@ -281,15 +355,14 @@ class MigrationMap:
                     submap[field] = field
             else:
                 removed_fields.append(field)
-                    
-        map[source_model_name] = {
+        
+        entry = {
             "target_model": target_model_name,
             "search_keys": self.default_search_keys, # default search keys
             "fields": submap, "too_deep": too_deep, "removed": removed_fields, "new": new_fields
             }
         
-        self.map = map
-        return map
+        return entry, related_models
     
     def load_from_file(self, file_path: str) -> dict:
         """
@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+
+"""
+This module provides the MigrationMetrics class, used to follow the progress of long migrations:
+per model counters, throughput, ETA, a periodic progress line and a metrics snapshot file.
+"""
+
+import os
+import json
+import time
+from collections import deque
+
+
+class MigrationMetrics:
+    """
+    Per model counters, rolling throughput and ETA of a migration run.
+
+    Counters (per model):
+        - read: records read from the source.
+        - created: records created in the target.
+        - matched: records found in the tracking db or in the target (not created).
+        - updated: matched records with changes written to the target (upsert mode).
+        - failed: records that could not be migrated.
+        - pending_decoupled: records waiting for their decoupled relation to be processed.
+
+    Every ``progress_interval`` seconds, ``tick`` prints a compact progress line and writes a snapshot
+    file that monitoring tools can scrape: Prometheus textfile format if the file name ends with
+    ``.prom``, JSON otherwise.
+    """
+
+    #: The counters kept per model
+    counter_names = ['read', 'created', 'matched', 'updated', 'failed', 'pending_decoupled']
+
+    #: The window, in seconds, used to compute the rolling throughput
+    window = 60
+
+    def __init__(self, progress_interval: float=10, snapshot_path: str=None, run_id: str=None):
+        """ Initialize the MigrationMetrics class.
+
+        Args:
+            progress_interval (float, optional): Seconds between progress lines / snapshots. Defaults to 10. 0 disables them.
+            snapshot_path (str, optional): The path to the metrics snapshot file. Defaults to None (no snapshot).
+            run_id (str, optional): The run id, added to the snapshot. Defaults to None.
+        """
+        self.progress_interval = progress_interval
+        self.snapshot_path = snapshot_path
+        self.run_id = run_id
+
+        self.counters = {}
+        self.root_model = None
+        self.total = 0
+        self.done = 0
+        self.batches_total = 0
+        self.batches_done = 0
+
+        self.started = time.time()
+        self._events = deque()
+        self._last_tick = self.started
+
+    def start(self, model_name: str, total: int, batches: int) -> None:
+        """
+        Start following the migration of a (root) model.
+
+        Args:
+            model_name (str): The model being migrated.
+            total (int): The number of records to migrate.
+            batches (int): The number of batches.
+        """
+        self.root_model = model_name
+        self.total = total
+        self.done = 0
+        self.batches_total = batches
+        self.batches_done = 0
+        self.started = time.time()
+        self._events.clear()
+        self._last_tick = self.started
+
+    def incr(self, model_name: str, counter: str, value: int=1) -> None:
+        """
+        Increment a model counter. Created and matched records count for the throughput.
+
+        Args:
+            model_name (str): The model name.
+            counter (str): One of ``counter_names``.
+            value (int, optional): The increment, may be negative. Defaults to 1.
+        """
+        counters = self.counters.setdefault(model_name, dict.fromkeys(self.counter_names, 0))
+        counters[counter] += value
+
+        if counter in ('created', 'matched') and value > 0:
+            self._events.append((time.time(), value))
+
+    def batch_done(self, records: int) -> None:
+        """
+        Mark a root model batch as processed (successfully or not).
+
+        Args:
+            records (int): The number of records in the batch.
+        """
+        self.batches_done += 1
+        self.done += records
+        self.tick()
+
+    def throughput(self) -> float:
+        """
+        Get the rolling throughput, in records (created or matched, any model) per second.
+
+        Returns:
+            float: The records per second over the last ``window`` seconds.
+        """
+        now = time.time()
+        while self._events and self._events[0][0] < now - self.window:
+            self._events.popleft()
+
+        elapsed = min(self.window, now - self.started)
+        if elapsed <= 0:
+            return 0.0
+
+        return sum(value for timestamp, value in self._events) / elapsed
+
+    def eta(self) -> float:
+        """
+        Get the estimated seconds left to migrate the root model, based on its average pace.
+
+        Returns:
+            float: The seconds left or None if it cant be estimated yet.
+        """
+        if not self.done or not self.total:
+            return None
+
+        elapsed = time.time() - self.started
+        return elapsed / self.done * max(0, self.total - self.done)
+
+    def tick(self, force: bool=False) -> None:
+        """
+        Print the progress line and write the snapshot, if ``progress_interval`` seconds went by.
+
+        Args:
+            force (bool, optional): Do it now, no matter the interval. Defaults to False.
+        """
+        now = time.time()
+        if not force and (not self.progress_interval or now - self._last_tick < self.progress_interval):
+            return
+        self._last_tick = now
+
+        print(self.progress_line())
+
+        if self.snapshot_path:
+            self.write_snapshot()
+
+    def progress_line(self) -> str:
+        """
+        Get a compact progress line.
+        Ex: [crm.lead] 120/5000 (2.4%) batch 12/500 | 3.2 rec/s | ETA 0:25:13 | created 300 matched 80 updated 5 failed 2 pending 40
+
+        Returns:
+            str: The progress line.
+        """
+        percent = 100.0 * self.done / self.total if self.total else 0.0
+
+        eta = self.eta()
+        eta = "%d:%02d:%02d" % (eta // 3600, eta % 3600 // 60, eta % 60) if eta is not None else "-"
+
+        totals = dict.fromkeys(self.counter_names, 0)
+        for counters in self.counters.values():
+            for counter, value in counters.items():
+                totals[counter] += value
+
+        return "[%s] %s/%s (%.1f%%) batch %s/%s | %.1f rec/s | ETA %s | created %s matched %s updated %s failed %s pending %s" % (
+            self.root_model, self.done, self.total, percent, self.batches_done, self.batches_total,
+            self.throughput(), eta, totals['created'], totals['matched'], totals['updated'], totals['failed'], totals['pending_decoupled'])
+
+    def snapshot(self) -> dict:
+        """
+        Get the current metrics.
+
+        Returns:
+            dict: The metrics.
+        """
+        return {
+            "run_id": self.run_id,
+            "timestamp": time.time(),
+            "root_model": self.root_model,
+            "total": self.total,
+            "done": self.done,
+            "batches_total": self.batches_total,
+            "batches_done": self.batches_done,
+            "throughput": self.throughput(),
+            "eta_seconds": self.eta(),
+            "models": self.counters,
+        }
+
+    def write_snapshot(self, file_path: str=None) -> None:
+        """
+        Write the metrics snapshot file. The file is replaced atomically, so scrapers never see a partial file.
+
+        Args:
+            file_path (str, optional): The path to the file. Defaults to ``snapshot_path``.
+        """
+        file_path = file_path or self.snapshot_path
+        data = self.snapshot()
+
+        if file_path.endswith('.prom'):
+            content = self._to_prometheus(data)
+        else:
+            content = json.dumps(data, indent=4)
+
+        tmp_path = file_path + ".tmp"
+        with open(tmp_path, 'w') as file:
+            file.write(content)
+        os.replace(tmp_path, file_path)
+
+    def _to_prometheus(self, data: dict) -> str:
+        """
+        Format the metrics in the Prometheus text exposition format.
+
+        Args:
+            data (dict): The metrics, as returned by ``snapshot``.
+
+        Returns:
+            str: The metrics as text.
+        """
+        lines = [
+            '# HELP odoo_migration_records Records processed per model and kind.',
+            '# TYPE odoo_migration_records gauge',
+        ]
+        for model_name, counters in sorted(data["models"].items()):
+            for counter, value in counters.items():
+                lines.append('odoo_migration_records{model="%s",kind="%s"} %s' % (model_name, counter, value))
+
+        root_model = data["root_model"] or ""
+        gauges = [
+            ('odoo_migration_total', 'Records to migrate of the root model.', data["total"]),
+            ('odoo_migration_done', 'Records processed of the root model.', data["done"]),
+            ('odoo_migration_batches_total', 'Batches to migrate of the root model.', data["batches_total"]),
+            ('odoo_migration_batches_done', 'Batches processed of the root model.', data["batches_done"]),
+            ('odoo_migration_throughput', 'Records created or matched per second.', data["throughput"]),
+            ('odoo_migration_eta_seconds', 'Estimated seconds left.', data["eta_seconds"] if data["eta_seconds"] is not None else 'NaN'),
+        ]
+        for name, help, value in gauges:
+            lines.append('# HELP %s %s' % (name, help))
+            lines.append('# TYPE %s gauge' % name)
+            lines.append('%s{model="%s"} %s' % (name, root_model, value))
+
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,370 @@
+# -*- coding: utf-8 -*-
+
+"""
+This module provides the MigrationPlanner class, used to estimate the cost of a migration before running it:
+records per model, RPC calls and duration. Nothing is written to the instances.
+"""
+
+import math
+import time
+import statistics
+
+
+class MigrationPlanner:
+    """
+    Estimates the cost of migrating a model with its relations, following the migration map as ``migrate`` does.
+
+    - The records of every model are counted in the source with ``search_count``.
+    - The relations fan-out (related records per record, and how many of them are distinct) is measured
+      on a sample of the records of every model reached.
+    - Records reached by a relation are counted once per model, up to the number of records of the model,
+      as the tracking db and run memo prevent creating them twice. The target is supposed empty, so the
+      estimate is an upper bound when some records exist already (they are matched instead of created).
+    - The RPC calls made per record depend on the relation types, the search keys and the write mode.
+      Their duration is estimated from the latency measured while sampling, plus ``record_write_seconds``
+      per record written.
+
+    Example usage::
+
+        planner = MigrationPlanner(executor, sample_size=50)
+        plan = planner.plan('crm.lead', recursion_level=4, batch_size=10)
+    """
+
+    #: Records sampled per model to measure the relations fan-out
+    sample_size = 50
+
+    #: The estimated seconds the target spends writing a record, on top of the call latency
+    record_write_seconds = 0.01
+
+    #: The calls made to the target to measure its latency
+    latency_calls = 3
+
+    def __init__(self, executor: object, sample_size: int=None):
+        """ Initialize the MigrationPlanner class.
+
+        Args:
+            executor (object): An ``Executor`` instance, with the migration map loaded.
+            sample_size (int, optional): Records sampled per model. Defaults to ``sample_size``.
+        """
+        self.executor = executor
+        self.sample_size = sample_size or self.sample_size
+
+        # source records per model
+        self._counts = {}
+        # relations fan-out per model, see fanout
+        self._fanouts = {}
+        # call latencies per instance (1: source, 2: target), in seconds
+        self._latencies = {1: [], 2: []}
+
+    def _timed(self, instance: int, call, *args, **kwargs):
+        """
+        Make a call, measuring its latency.
+
+        Args:
+            instance (int): The instance called (1: source, 2: target).
+            call (callable): The call.
+
+        Returns:
+            The call result.
+        """
+        start = time.perf_counter()
+        try:
+            return call(*args, **kwargs)
+        finally:
+            self._latencies[instance].append(time.perf_counter() - start)
+
+    def count(self, model_name: str) -> int:
+        """
+        Get the number of records of a source model.
+
+        Args:
+            model_name (str): The source model name.
+
+        Returns:
+            int: The number of records.
+        """
+        if model_name not in self._counts:
+            self._counts[model_name] = self._timed(1, self.executor.source_odoo.env[model_name].search_count, [])
+
+        return self._counts[model_name]
+
+    def fanout(self, model_name: str) -> dict:
+        """
+        Measure the fan-out of the mapped relations of a model, on a sample of its most recent records.
+
+        Args:
+            model_name (str): The source model name.
+
+        Returns:
+            dict: Per relational field::
+
+                {
+                    'field_name': {
+                        'type': 'many2one',
+                        'relation': 'res.partner',
+                        'with_value': 0.8,      # share of records with a value
+                        'per_record': 0.8,      # related records per record
+                        'distinct': 0.25,       # share of distinct related records
+                    }
+                }
+
+        """
+        if model_name in self._fanouts:
+            return self._fanouts[model_name]
+
+        executor = self.executor
+        fields_map = executor.migration_map.get_mapping(model_name)['fields']
+        fields_metadata = executor._get_fields_metadata(1, model_name, list(fields_map.keys()))
+        relational_fields = [field for field, data in fields_metadata.items() if data.get('type') in executor.relation_types]
+
+        sample = []
+        if relational_fields:
+            model = executor.source_odoo.env[model_name]
+            ids = self._timed(1, model.search, [], order='id desc', limit=self.sample_size)
+            if ids:
+                sample = self._timed(1, model.browse(ids).read, relational_fields)
+
+        result = {}
+        for field in relational_fields:
+            related_ids = []
+            with_value = 0
+            for record in sample:
+                value = record.get(field)
+                if not value:
+                    continue
+                with_value += 1
+                related_ids.extend([value[0]] if fields_metadata[field]['type'] == 'many2one' else value)
+
+            result[field] = {
+                'type': fields_metadata[field]['type'],
+                'relation': fields_metadata[field]['relation'],
+                'with_value': with_value / len(sample) if sample else 0.0,
+                'per_record': len(related_ids) / len(sample) if sample else 0.0,
+                'distinct': len(set(related_ids)) / len(related_ids) if related_ids else 1.0,
+            }
+
+        self._fanouts[model_name] = result
+        return result
+
+    def latency(self, instance: int) -> float:
+        """
+        Get the median call latency of an instance.
+
+        Args:
+            instance (int): The instance (1: source, 2: target).
+
+        Returns:
+            float: The latency, in seconds. 0 if not measured.
+        """
+        latencies = self._latencies[instance]
+        return statistics.median(latencies) if latencies else 0.0
+
+    def plan(self, model_name: str, recursion_level: int=0, batch_size: int=50, source_ids: list=None) -> dict:
+        """
+        Estimate the cost of migrating a model. Nothing is written to the instances.
+
+        Args:
+            model_name (str): The model name to migrate.
+            recursion_level (int, optional): The recursion level of the migration. Defaults to 0.
+            batch_size (int, optional): The batch size of the migration. Defaults to 50.
+            source_ids (list, optional): The source ids to migrate. Defaults to None (the whole model).
+
+        Returns:
+            dict: The plan: options, latencies, totals and the estimate per model. See ``_summarize``.
+        """
+        executor = self.executor
+        mapping = executor.migration_map
+
+        records = len(source_ids) if source_ids else self.count(model_name)
+        batches = math.ceil(records / batch_size) if records else 0
+
+        models = {}
+        unmapped = set()
+        entry = self._add(models, model_name, records, depth=0)
+
+        # a read and a write per batch
+        entry['rpcs']['read'] += batches
+        self._add_writes(model_name, entry, records, batches)
+
+        queue = [(model_name, records, recursion_level, 1)]
+        while queue:
+            _model_name, _records, level, depth = queue.pop(0)
+            if level <= 0 or _records <= 0:
+                continue
+
+            for field, stats in self.fanout(_model_name).items():
+                relation = stats['relation']
+                if relation not in mapping.map:
+                    unmapped.add(relation)
+                    continue
+
+                new = self._estimate_relation(models, relation, stats, _records, depth)
+                if new > 0:
+                    queue.append((relation, new, level - 1, depth + 1))
+
+        # fields metadata of both instances, once per model
+        for _model_name, entry in models.items():
+            if not executor.schema_snapshot:
+                entry['rpcs']['metadata'] += 2
+
+        # the target latency
+        target_model = executor.target_odoo.env[mapping.get_target_model(model_name)]
+        for _ in range(self.latency_calls):
+            self._timed(2, target_model.search_count, [])
+
+        return self._summarize(model_name, recursion_level, batch_size, records, batches, models, sorted(unmapped))
+
+    def _add(self, models: dict, model_name: str, records: float, depth: int) -> dict:
+        """
+        Add the records of a model reached, up to the number of records of the model.
+
+        Args:
+            models (dict): The estimate per model.
+            model_name (str): The source model name.
+            records (float): The records reached.
+            depth (int): The relations depth the model is reached at.
+
+        Returns:
+            dict: The model estimate.
+        """
+        entry = models.setdefault(model_name, {
+            'source_count': self.count(model_name),
+            'records': 0.0,
+            'depth': depth,
+            'rpcs': dict.fromkeys(['metadata', 'read', 'search', 'create', 'load', 'write'], 0.0),
+        })
+        entry['added'] = min(records, max(0.0, entry['source_count'] - entry['records']))
+        entry['records'] += entry['added']
+        entry['depth'] = min(entry['depth'], depth)
+
+        return entry
+
+    def _add_writes(self, model_name: str, entry: dict, records: float, calls: float) -> None:
+        """
+        Add the calls creating records, in the write mode of the executor.
+
+        Args:
+            model_name (str): The source model name.
+            entry (dict): The model estimate.
+            records (float): The records created.
+            calls (float): The create calls.
+        """
+        executor = self.executor
+        if executor.write_mode == 'load':
+            entry['rpcs']['load'] += calls
+
+            # one2many values are written after the load, a call per record
+            one2many = [field for field, stats in self.fanout(model_name).items() if stats['type'] == 'one2many']
+            if one2many:
+                entry['rpcs']['search'] += calls
+                entry['rpcs']['write'] += records * max(self.fanout(model_name)[field]['with_value'] for field in one2many)
+        else:
+            entry['rpcs']['create'] += calls
+
+        # models with a decoupled relation are read and written again
+        fields = list(executor.migration_map.get_mapping(model_name)['fields'].keys())
+        if executor._has_decoupled_relation(fields):
+            entry['rpcs']['read'] += records
+            entry['rpcs']['write'] += records
+
+    def _estimate_relation(self, models: dict, relation: str, stats: dict, records: float, depth: int) -> float:
+        """
+        Add the records and calls of a relation traversed from the records of a model, as ``_process_relation`` does.
+
+        Args:
+            models (dict): The estimate per model.
+            relation (str): The related source model name.
+            stats (dict): The relation fan-out, see ``fanout``.
+            records (float): The records the relation is traversed from.
+            depth (int): The relations depth of the related model.
+
+        Returns:
+            float: The related records created, whose relations are traversed next.
+        """
+        executor = self.executor
+        fields = list(executor.migration_map.get_mapping(relation)['fields'].keys())
+        search_calls = 1 + len(executor.migration_map.get_search_keys(relation))
+
+        references = records * stats['per_record']
+        with_value = records * stats['with_value']
+
+        if stats['type'] == 'one2many' and not executor._has_decoupled_relation(fields):
+            # children are read per parent, and created along with it
+            entry = self._add(models, relation, references, depth)
+            entry['rpcs']['read'] += with_value
+            return entry['added']
+
+        # related records already migrated are not searched again
+        entry = self._add(models, relation, references * stats['distinct'], depth)
+        new = entry['added']
+        entry['rpcs']['search'] += new * search_calls
+
+        if stats['type'] == 'many2one':
+            # read and created one by one
+            entry['rpcs']['read'] += new
+            self._add_writes(relation, entry, new, new)
+        else:
+            # read and created together, per parent
+            calls = min(with_value, new)
+            entry['rpcs']['read'] += calls
+            self._add_writes(relation, entry, new, calls)
+
+        return new
+
+    def _summarize(self, model_name: str, recursion_level: int, batch_size: int, records: int, batches: int,
+                   models: dict, unmapped: list) -> dict:
+        """
+        Get the plan totals and durations.
+
+        Args:
+            model_name (str): The model name to migrate.
+            recursion_level (int): The recursion level of the migration.
+            batch_size (int): The batch size of the migration.
+            records (int): The records of the model to migrate.
+            batches (int): The batches of the migration.
+            models (dict): The estimate per model.
+            unmapped (list): The related models not in the migration map, not traversed.
+
+        Returns:
+            dict: The plan.
+        """
+        source_latency = self.latency(1)
+        target_latency = self.latency(2)
+
+        rpcs = dict.fromkeys(['metadata', 'read', 'search', 'create', 'load', 'write'], 0)
+        total_records = 0
+        duration = 0.0
+        for entry in models.values():
+            entry.pop('added', None)
+            entry['records'] = round(entry['records'])
+            entry['rpcs'] = {kind: round(value) for kind, value in entry['rpcs'].items()}
+            entry['rpcs']['total'] = sum(entry['rpcs'].values())
+            total_records += entry['records']
+
+            source_calls = entry['rpcs']['read']
+            target_calls = entry['rpcs']['metadata'] + entry['rpcs']['search'] + entry['rpcs']['create'] + entry['rpcs']['load'] + entry['rpcs']['write']
+            entry['seconds'] = source_calls * source_latency + target_calls * target_latency + entry['records'] * self.record_write_seconds
+            duration += entry['seconds']
+
+            for kind in rpcs:
+                rpcs[kind] += entry['rpcs'][kind]
+
+        rpcs['total'] = sum(rpcs.values())
+
+        return {
+            "model": model_name,
+            "recursion_level": recursion_level,
+            "batch_size": batch_size,
+            "write_mode": self.executor.write_mode,
+            "sample_size": self.sample_size,
+            "root_records": records,
+            "batches": batches,
+            "records": total_records,
+            "latency": {"source": source_latency, "target": target_latency},
+            "rpcs": rpcs,
+            "rpcs_per_record": rpcs['total'] / records if records else 0.0,
+            "duration_seconds": duration,
+            "batch_seconds": duration / batches if batches else 0.0,
+            "models": dict(sorted(models.items(), key=lambda item: (item[1]['depth'], item[0]))),
+            "unmapped": unmapped,
+        }
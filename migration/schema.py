@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+
+"""
+This module provides the SchemaSnapshot class, an offline copy of the models metadata
+(``fields_get``) of the source and target instances.
+"""
+
+import gzip
+import json
+from datetime import datetime
+
+
+class SchemaSnapshot:
+    """
+    Holds the fields metadata of every model of the source and target instances.
+
+    A snapshot is dumped once from the live instances into a compressed local file. Later on,
+    map generation, relation trees and the executor metadata lookups can run against it
+    instead of asking the instances for ``fields_get``.
+
+    Example usage::
+
+        SchemaSnapshot.dump(executor, 'schema.json.gz')
+        executor = Executor(schema_snapshot='schema.json.gz')
+    """
+
+    #: The snapshot file format version
+    format_version = 1
+
+    #: The instance names used in the snapshot file, by instance number (1: source, 2: target)
+    instance_names = {1: "source", 2: "target"}
+
+    instances = None
+    """
+    The snapshot content per instance number::
+
+        {
+            1: {
+                'host': 'localhost', 'bd': 'db_name', 'version': '14.0',
+                'models': {'model_name': {field_name: field_metadata, ...}, ...}
+            },
+            2: {...}
+        }
+
+    """
+
+    def __init__(self, instances: dict=None, created: str=None):
+        """ Initialize the SchemaSnapshot class.
+
+        Args:
+            instances (dict, optional): The snapshot content per instance number. Defaults to None.
+            created (str, optional): The snapshot creation date. Defaults to None.
+        """
+        self.instances = instances or {}
+        self.created = created
+
+    @classmethod
+    def dump(cls, executor: object, file_path: str, model_names: list=None, max_workers: int=8) -> "SchemaSnapshot":
+        """
+        Dump the models metadata of the source and target instances into a snapshot file.
+
+        Args:
+            executor (object): An ``Executor`` instance with access to both instances.
+            file_path (str): The path to the snapshot file to write.
+            model_names (list, optional): The models to dump. Defaults to None (every model in the instance).
+            max_workers (int): The maximum number of concurrent metadata requests. Defaults to 8.
+
+        Returns:
+            SchemaSnapshot: The dumped snapshot.
+        """
+        instances = {}
+
+        for instance, name in cls.instance_names.items():
+            odoo = executor.source_odoo if instance == 1 else executor.target_odoo
+            instance_params = executor.source if instance == 1 else executor.target
+
+            if model_names:
+                _model_names = list(model_names)
+            else:
+                records = odoo.execute_kw('ir.model', 'search_read', [[]], {'fields': ['model']})
+                _model_names = sorted(record['model'] for record in records)
+
+            metadata = executor.get_fields_many([(instance, model_name) for model_name in _model_names], max_workers=max_workers)
+
+            instances[instance] = {
+                "host": instance_params['host'],
+                "bd": instance_params['bd'],
+                "version": odoo.version,
+                "models": {model_name: metadata[(instance, model_name)] for model_name in _model_names
+                           if metadata[(instance, model_name)]},
+            }
+
+        snapshot = cls(instances=instances, created=datetime.now().isoformat())
+        snapshot.save(file_path)
+
+        return snapshot
+
+    @classmethod
+    def load(cls, file_path: str) -> "SchemaSnapshot":
+        """
+        Load a snapshot from a file.
+
+        Args:
+            file_path (str): The path to the snapshot file.
+
+        Returns:
+            SchemaSnapshot: The loaded snapshot.
+        """
+        print("Reading schema snapshot from file: %s" % file_path)
+
+        with gzip.open(file_path, 'rt', encoding='utf-8') as file:
+            data = json.load(file)
+
+        if data.get("format") != cls.format_version:
+            raise ValueError('Unsupported schema snapshot format %s in %s' % (data.get("format"), file_path))
+
+        instances = {}
+        for instance, name in cls.instance_names.items():
+            if name in data["instances"]:
+                instances[instance] = data["instances"][name]
+
+        return cls(instances=instances, created=data.get("created"))
+
+    def save(self, file_path: str) -> None:
+        """
+        Write the snapshot to a compressed file.
+
+        Args:
+            file_path (str): The path to the snapshot file.
+        """
+        data = {
+            "format": self.format_version,
+            "created": self.created,
+            "instances": {self.instance_names[instance]: content for instance, content in self.instances.items()},
+        }
+
+        with gzip.open(file_path, 'wt', encoding='utf-8') as file:
+            json.dump(data, file)
+
+    def covers(self, instance: int) -> bool:
+        """
+        Check if the snapshot holds the metadata of an instance.
+
+        Args:
+            instance (int): The instance number (1: source, 2: target).
+
+        Returns:
+            bool: True if the instance is in the snapshot.
+        """
+        return instance in self.instances
+
+    def get_fields(self, instance: int, model_name: str) -> dict:
+        """
+        Get the fields metadata for a model.
+
+        Args:
+            instance (int): The instance number (1: source, 2: target).
+            model_name (str): The model name.
+
+        Returns:
+            dict: The fields metadata or None if the model does not exist in the instance.
+        """
+        return self.instances[instance]["models"].get(model_name)
+
+    def install(self, odoo: object, instance: int) -> None:
+        """
+        Make an odoorpc connection build its model proxies from the snapshot,
+        so ``odoo.env[model_name]`` does not call ``fields_get`` on the server.
+
+        Args:
+            odoo (odoorpc.ODOO): A logged in connection.
+            instance (int): The instance number of the connection (1: source, 2: target).
+        """
+        if not self.covers(instance):
+            return
+
+        registry = _SnapshotRegistry(odoo.env, self.instances[instance]["models"])
+        registry.update(odoo.env.registry)
+        odoo.env._registry = registry
+
+
+class _SnapshotRegistry(dict):
+    """
+    An odoorpc environment registry that builds the model proxies from snapshot metadata.
+    """
+
+    def __init__(self, env: object, models: dict):
+        super().__init__()
+        self._env = env
+        self._models = models
+
+    def __contains__(self, model_name):
+        if not dict.__contains__(self, model_name) and model_name in self._models:
+            self[model_name] = self._create_model_class(model_name)
+        return dict.__contains__(self, model_name)
+
+    def _create_model_class(self, model_name: str):
+        """
+        Generate the model proxy class, as ``odoorpc.env.Environment`` does, without any RPC.
+
+        Args:
+            model_name (str): The model name.
+
+        Returns:
+            type: An ``odoorpc.models.Model`` class.
+        """
+        from odoorpc import fields
+        from odoorpc.env import FIELDS_RESERVED
+        from odoorpc.models import Model
+
+        attrs = {
+            '_env': self._env,
+            '_odoo': self._env._odoo,
+            '_name': model_name,
+            '_columns': {},
+        }
+        for field_name, field_data in self._models[model_name].items():
+            if field_name not in FIELDS_RESERVED:
+                field = fields.generate_field(field_name, field_data)
+                attrs['_columns'][field_name] = field
+                attrs[field_name] = field
+
+        return type(model_name.replace('.', '_'), (Model,), attrs)
@@ -0,0 +1,328 @@
+# -*- coding: utf-8 -*-
+
+"""
+This module provides the StagingStore class, a local store for source records
+extracted from the source instance, to be loaded later into the target instance.
+"""
+
+import os
+import gzip
+import json
+import sqlite3
+from collections import OrderedDict
+
+
+class StagingStore:
+    """
+    A directory holding source records as compressed JSON Lines chunks, plus an id index.
+
+    Layout::
+
+        staging_dir/
+            index.db                        # sqlite: (model, id) --> chunk, extract roots and metadata
+            res.partner/00000001.jsonl.gz   # one record (as returned by ``read``) per line
+            res.partner/00000002.jsonl.gz
+            ...
+
+    Records are written once per model and id, so a record reached through several relations is stored once.
+    Writes are buffered per model, and a chunk is written when it reaches ``chunk_records`` records or 
+    ``chunk_bytes`` bytes (uncompressed), or on ``flush``.
+    Reads decompress every needed chunk once and keep the last ``cache_size`` chunks in memory.
+    """
+
+    #: The number of decompressed chunks kept in memory
+    cache_size = 8
+
+    #: The maximum number of records per chunk
+    chunk_records = 5000
+
+    #: The maximum size of a chunk, uncompressed
+    chunk_bytes = 16 * 1024 * 1024
+
+    def __init__(self, path: str):
+        """ Initialize the StagingStore class. The directory is created if it does not exist.
+
+        Args:
+            path (str): The staging directory.
+        """
+        self.path = path
+        if not os.path.exists(path):
+            os.makedirs(path)
+
+        self.index = sqlite3.connect(os.path.join(path, "index.db"))
+        self._init_index()
+
+        self._chunks = OrderedDict()
+
+        # records written and not flushed yet, per model: {'chunk': number, 'ids': [...], 'lines': [...], 'bytes': size}
+        self._buffers = {}
+
+    def _init_index(self) -> None:
+        """
+        Initialize the index database
+        """
+        cursor = self.index.cursor()
+        cursor.execute('''CREATE TABLE IF NOT EXISTS records
+                        (
+                            model_name TEXT,
+                            id INTEGER,
+                            chunk INTEGER,
+                            PRIMARY KEY (model_name, id)
+                        )
+                        ''')
+        cursor.execute('''CREATE TABLE IF NOT EXISTS roots
+                        (
+                            model_name TEXT,
+                            id INTEGER,
+                            PRIMARY KEY (model_name, id)
+                        )
+                        ''')
+        cursor.execute('''CREATE TABLE IF NOT EXISTS meta
+                        (
+                            key TEXT PRIMARY KEY,
+                            value TEXT
+                        )
+                        ''')
+        self.index.commit()
+
+    def _chunk_path(self, model_name: str, chunk: int) -> str:
+        """
+        Get the path to a chunk file.
+
+        Args:
+            model_name (str): The model name.
+            chunk (int): The chunk number.
+
+        Returns:
+            str: The chunk file path.
+        """
+        return os.path.join(self.path, model_name, "%08d.jsonl.gz" % chunk)
+
+    def missing(self, model_name: str, ids: list) -> list:
+        """
+        Get the ids that are not staged yet.
+
+        Args:
+            model_name (str): The model name.
+            ids (list): The ids to check.
+
+        Returns:
+            list: The ids not in the store, in the given order.
+        """
+        staged = set()
+        cursor = self.index.cursor()
+
+        # keep well below the sqlite variables limit
+        for i in range(0, len(ids), 500):
+            _ids = ids[i:i + 500]
+            cursor.execute('SELECT id FROM records WHERE model_name = ? AND id IN (%s)' % ','.join('?' * len(_ids)),
+                           [model_name] + list(_ids))
+            staged.update(row[0] for row in cursor.fetchall())
+
+        if model_name in self._buffers:
+            staged.update(self._buffers[model_name]['ids'])
+
+        return [_id for _id in dict.fromkeys(ids) if _id not in staged]
+
+    def write(self, model_name: str, records: list) -> int:
+        """
+        Write records into the current chunk of the model. Records already in the store are skipped.
+
+        Args:
+            model_name (str): The model name.
+            records (list): The records to store, as returned by ``read``.
+
+        Returns:
+            int: The number of records written.
+        """
+        new_ids = set(self.missing(model_name, [record['id'] for record in records]))
+        records = [record for record in records if record['id'] in new_ids]
+        if not records:
+            return 0
+
+        buffer = self._buffers.get(model_name)
+        if buffer is None:
+            cursor = self.index.cursor()
+            cursor.execute('SELECT COALESCE(MAX(chunk), 0) + 1 FROM records WHERE model_name = ?', (model_name,))
+            buffer = self._buffers[model_name] = {'chunk': cursor.fetchone()[0], 'ids': [], 'lines': [], 'bytes': 0}
+
+        for record in records:
+            line = json.dumps(record) + '\n'
+            buffer['ids'].append(record['id'])
+            buffer['lines'].append(line)
+            buffer['bytes'] += len(line)
+
+            if len(buffer['ids']) >= self.chunk_records or buffer['bytes'] >= self.chunk_bytes:
+                self._flush_model(model_name)
+
+        return len(records)
+
+    def _flush_model(self, model_name: str) -> None:
+        """
+        Write the buffered records of a model into its current chunk, and start the next one.
+
+        Args:
+            model_name (str): The model name.
+        """
+        buffer = self._buffers[model_name]
+        if not buffer['ids']:
+            return
+
+        chunk = buffer['chunk']
+        chunk_path = self._chunk_path(model_name, chunk)
+        if not os.path.exists(os.path.dirname(chunk_path)):
+            os.makedirs(os.path.dirname(chunk_path))
+
+        with gzip.open(chunk_path, 'wt', encoding='utf-8') as file:
+            file.writelines(buffer['lines'])
+
+        cursor = self.index.cursor()
+        cursor.executemany('INSERT INTO records VALUES (?, ?, ?)', [(model_name, _id, chunk) for _id in buffer['ids']])
+        self.index.commit()
+
+        self._buffers[model_name] = {'chunk': chunk + 1, 'ids': [], 'lines': [], 'bytes': 0}
+
+    def flush(self) -> None:
+        """
+        Write the buffered records of every model. Must be called once the records are written.
+        """
+        for model_name in list(self._buffers):
+            self._flush_model(model_name)
+
+    def _get_chunk(self, model_name: str, chunk: int) -> dict:
+        """
+        Get the records of a chunk, keyed by id.
+
+        Args:
+            model_name (str): The model name.
+            chunk (int): The chunk number.
+
+        Returns:
+            dict: The chunk records keyed by id.
+        """
+        key = (model_name, chunk)
+        if key in self._chunks:
+            self._chunks.move_to_end(key)
+            return self._chunks[key]
+
+        records = {}
+        with gzip.open(self._chunk_path(model_name, chunk), 'rt', encoding='utf-8') as file:
+            for line in file:
+                record = json.loads(line)
+                records[record['id']] = record
+
+        self._chunks[key] = records
+        if len(self._chunks) > self.cache_size:
+            self._chunks.popitem(last=False)
+
+        return records
+
+    def read(self, model_name: str, ids: list, fields: list=None) -> list:
+        """
+        Read staged records, like ``read`` would do it in the source instance.
+
+        Args:
+            model_name (str): The model name.
+            ids (list): The ids to read.
+            fields (list, optional): The fields to return (``id`` is always returned). Defaults to None (all staged fields).
+
+        Raises:
+            KeyError: Raised when a record is not in the store.
+
+        Returns:
+            list: The records, in the given ids order.
+        """
+        self.flush()
+
+        cursor = self.index.cursor()
+        chunks = {}
+        for i in range(0, len(ids), 500):
+            _ids = ids[i:i + 500]
+            cursor.execute('SELECT id, chunk FROM records WHERE model_name = ? AND id IN (%s)' % ','.join('?' * len(_ids)),
+                           [model_name] + list(_ids))
+            chunks.update(cursor.fetchall())
+
+        result = []
+        for _id in ids:
+            if _id not in chunks:
+                raise KeyError('Record %s.id=%s is not in the staging store %s' % (model_name, _id, self.path))
+
+            record = self._get_chunk(model_name, chunks[_id])[_id]
+            if fields is not None:
+                record = {field: record[field] for field in ['id'] + list(fields) if field in record}
+            else:
+                record = dict(record)
+            result.append(record)
+
+        return result
+
+    def ids(self, model_name: str) -> list:
+        """
+        Get all the staged ids of a model.
+
+        Args:
+            model_name (str): The model name.
+
+        Returns:
+            list: The sorted ids.
+        """
+        self.flush()
+
+        cursor = self.index.cursor()
+        cursor.execute('SELECT id FROM records WHERE model_name = ? ORDER BY id', (model_name,))
+        return [row[0] for row in cursor.fetchall()]
+
+    def add_roots(self, model_name: str, ids: list) -> None:
+        """
+        Register the ids an extract was asked for, so a load without ids loads exactly those.
+
+        Args:
+            model_name (str): The model name.
+            ids (list): The root ids.
+        """
+        cursor = self.index.cursor()
+        cursor.executemany('INSERT OR IGNORE INTO roots VALUES (?, ?)', [(model_name, _id) for _id in ids])
+        self.index.commit()
+
+    def roots(self, model_name: str) -> list:
+        """
+        Get the root ids of a model. If the model was never extracted as root, all its staged ids are returned.
+
+        Args:
+            model_name (str): The model name.
+
+        Returns:
+            list: The sorted ids.
+        """
+        cursor = self.index.cursor()
+        cursor.execute('SELECT id FROM roots WHERE model_name = ? ORDER BY id', (model_name,))
+        ids = [row[0] for row in cursor.fetchall()]
+        return ids or self.ids(model_name)
+
+    def set_meta(self, key: str, value) -> None:
+        """
+        Store a JSON serializable value in the store metadata.
+
+        Args:
+            key (str): The metadata key.
+            value: The value.
+        """
+        cursor = self.index.cursor()
+        cursor.execute('INSERT OR REPLACE INTO meta VALUES (?, ?)', (key, json.dumps(value)))
+        self.index.commit()
+
+    def get_meta(self, key: str, default=None):
+        """
+        Get a value from the store metadata.
+
+        Args:
+            key (str): The metadata key.
+            default: The value to return if the key is not found. Defaults to None.
+
+        Returns:
+            The stored value.
+        """
+        cursor = self.index.cursor()
+        cursor.execute('SELECT value FROM meta WHERE key = ?', (key,))
+        row = cursor.fetchone()
+        return json.loads(row[0]) if row else default
@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+
+"""
+This module provides the Throttle class, used to pace the RPC calls made to an instance:
+a token bucket rate limit, a concurrent calls limit and an adaptive mode that backs off
+when the instance slows down.
+"""
+
+import os
+import time
+import threading
+from collections import deque
+
+from tools import ProxyJSON
+
+
+class Throttle:
+    """
+    Paces the RPC calls of odoorpc connections to an instance.
+
+    - ``rate``: calls per second, enforced with a token bucket (bursts up to ``burst`` calls).
+    - ``concurrency``: calls in progress at the same time, from any thread.
+    - ``adaptive``: the latency of the calls is followed with an exponentially weighted moving average.
+      When it rises above ``latency_factor`` times the baseline (the lowest average seen), the rate is halved
+      (at most every ``backoff_interval`` seconds), then raised again by 10% per second while the latency 
+      stays normal, up to ``rate``.
+
+    The settings are read from the environment with ``from_env``. Ex::
+
+        SOURCE_RPC_RATE=20           # calls per second
+        SOURCE_RPC_CONCURRENCY=4     # calls at the same time
+        SOURCE_RPC_ADAPTIVE=1        # back off when the instance slows down
+    """
+
+    #: Calls needed before the latency baseline is set
+    warmup_calls = 10
+
+    #: Seconds between two adaptive rate increases
+    adjust_interval = 1.0
+    
+    #: Seconds between two back offs, so the instance has time to recover before backing off again
+    backoff_interval = 10.0
+
+    def __init__(self, rate: float=None, concurrency: int=None, adaptive: bool=False, burst: int=None,
+                 latency_factor: float=2.0, min_rate: float=0.5, alpha: float=0.2, name: str="instance"):
+        """ Initialize the Throttle class.
+
+        Args:
+            rate (float, optional): The maximum calls per second. Defaults to None (no limit).
+            concurrency (int, optional): The maximum calls at the same time. Defaults to None (no limit).
+            adaptive (bool, optional): Back off when the latency rises. Defaults to False.
+            burst (int, optional): The calls allowed at once after an idle time. Defaults to None (one second of calls).
+            latency_factor (float, optional): The latency increase, over the baseline, that triggers a back off. Defaults to 2.0.
+            min_rate (float, optional): The lowest rate the adaptive mode backs off to. Defaults to 0.5.
+            alpha (float, optional): The weight of the last call in the latency average. Defaults to 0.2.
+            name (str, optional): The instance name, for messages. Defaults to "instance".
+        """
+        self.rate = rate
+        self.concurrency = concurrency
+        self.adaptive = adaptive
+        self.burst = burst or max(1, int(rate or 1))
+        self.latency_factor = latency_factor
+        self.min_rate = min_rate
+        self.alpha = alpha
+        self.name = name
+
+        #: The rate in force, lowered by the adaptive mode. None means no limit
+        self.current_rate = rate
+
+        self._lock = threading.Lock()
+        self._semaphore = threading.BoundedSemaphore(concurrency) if concurrency else None
+        self._tokens = float(self.burst)
+        self._last_refill = time.monotonic()
+
+        # adaptive mode state
+        self.latency = None
+        self.baseline = None
+        self._calls = 0
+        self._last_adjust = time.monotonic()
+        self._last_backoff = None
+        self._recent = deque()
+
+        #: Seconds spent waiting for a call slot
+        self.waited = 0.0
+
+    @classmethod
+    def from_env(cls, prefix: str):
+        """
+        Get a throttle configured by the environment variables of an instance.
+
+        Args:
+            prefix (str): The environment variables prefix. Ex: SOURCE, TARGET
+
+        Returns:
+            Throttle: The throttle, or None if no limit is configured.
+        """
+        rate = os.environ.get("%s_RPC_RATE" % prefix)
+        concurrency = os.environ.get("%s_RPC_CONCURRENCY" % prefix)
+        adaptive = os.environ.get("%s_RPC_ADAPTIVE" % prefix, "").strip().lower() in ('1', 'true', 'yes', 'on')
+
+        if not rate and not concurrency and not adaptive:
+            return None
+
+        return cls(rate=float(rate) if rate else None, concurrency=int(concurrency) if concurrency else None,
+                   adaptive=adaptive, name=prefix.lower())
+
+    def wrap(self, odoo: object) -> None:
+        """
+        Make a connection pace its calls.
+
+        Args:
+            odoo (odoorpc.ODOO): The connection.
+        """
+        connector = odoo._connector
+        proxy_json = connector.proxy_json
+
+        def handler(url, request):
+            self.acquire()
+            start = time.perf_counter()
+            try:
+                return proxy_json(url, request)
+            finally:
+                self.release(time.perf_counter() - start)
+
+        connector._proxy_json = ProxyJSON(proxy_json, handler)
+
+    def acquire(self) -> None:
+        """
+        Wait for a call slot: a free concurrent call, and a token of the bucket.
+        """
+        start = time.monotonic()
+
+        if self._semaphore is not None:
+            self._semaphore.acquire()
+
+        wait = 0.0
+        with self._lock:
+            rate = self.current_rate
+            if rate:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * rate)
+                self._last_refill = now
+
+                # the token is taken now, callers after this one wait longer
+                self._tokens -= 1
+                if self._tokens < 0:
+                    wait = -self._tokens / rate
+
+        if wait:
+            time.sleep(wait)
+
+        self.waited += time.monotonic() - start
+
+    def release(self, elapsed: float) -> None:
+        """
+        Free a call slot, and follow the call latency.
+
+        Args:
+            elapsed (float): The call latency, in seconds.
+        """
+        if self._semaphore is not None:
+            self._semaphore.release()
+
+        if self.adaptive:
+            with self._lock:
+                self._adapt(elapsed)
+
+    def _adapt(self, elapsed: float) -> None:
+        """
+        Update the latency average, and back off or speed up. Called with the lock held.
+
+        Args:
+            elapsed (float): The call latency, in seconds.
+        """
+        now = time.monotonic()
+
+        self._calls += 1
+        self.latency = elapsed if self.latency is None else self.alpha * elapsed + (1 - self.alpha) * self.latency
+
+        # the calls of the last seconds, to know the actual rate when there is no limit yet
+        self._recent.append(now)
+        while self._recent and self._recent[0] < now - 5:
+            self._recent.popleft()
+
+        if self._calls < self.warmup_calls:
+            return
+        if self.baseline is None or self.latency < self.baseline:
+            self.baseline = self.latency
+
+        if now - self._last_adjust < self.adjust_interval:
+            return
+
+        if self.latency > self.baseline * self.latency_factor:
+            # hold the rate while the instance recovers from the last back off
+            if self._last_backoff is not None and now - self._last_backoff < self.backoff_interval:
+                return
+            
+            # slow down, from the actual rate if there was no limit
+            observed = len(self._recent) / min(5.0, max(now - self._recent[0], self.adjust_interval))
+            current = self.current_rate or observed
+            self.current_rate = max(self.min_rate, current / 2)
+            self._last_adjust = self._last_backoff = now
+
+            print('The %s instance is slowing down (latency %.0f ms, baseline %.0f ms), limited to %.1f calls/s' % (
+                self.name, self.latency * 1000, self.baseline * 1000, self.current_rate))
+        elif self.current_rate is not None and (self.rate is None or self.current_rate < self.rate):
+            # speed up again, back to the configured rate
+            self.current_rate *= 1.1
+            if self.rate is not None:
+                self.current_rate = min(self.rate, self.current_rate)
+            self._last_adjust = now
+
+    def snapshot(self) -> dict:
+        """
+        Get the throttle state.
+
+        Returns:
+            dict: The rate in force, the latency average and baseline (in seconds), and the seconds waited.
+        """
+        return {
+            "rate": self.current_rate,
+            "latency": self.latency,
+            "baseline": self.baseline,
+            "waited": self.waited,
+        }
@@ -1,7 +1,12 @@
 # -*- coding: utf-8 -*-
 
 import os
+import gzip
 import json
+import queue
+import atexit
+import threading
+from datetime import datetime
 from colorama import Fore, Back, Style
 from typing import Union
 
@@ -90,3 +95,201 @@ class Pretty:
                 print(state + data)
             
             print(Style.RESET_ALL + '\n')
+
+
+class RunLogger:
+    """
+    A structured run logger. Writes one JSON object per line (JSON Lines).
+
+    Entries are queued and written by a background thread, so logging does not slow down the migration.
+    Every entry gets a timestamp, the run id and a level. The log file is rotated when it grows over
+    ``max_bytes``, keeping ``backup_count`` old files (``file.1``, ``file.2``, ...).
+
+    Large debug payloads (stack traces, source and target batches) are written to a gzip compressed
+    sidecar file (``<file>.debug.jsonl.gz``) and referenced from the log entry by ``debug_ref``.
+    The sidecar is rotated with the log file (``file.1.debug.jsonl.gz``, ...).
+
+    Example usage::
+
+        logger = RunLogger('./run.log', run_id='2024-01-01_00-00-00')
+        logger.log({"msg": "Processing error", "error": "..."}, level="error", debug_payload={"source_data": data})
+        logger.close()
+    """
+
+    def __init__(self, file_path: str, run_id: str=None, max_bytes: int=50 * 1024 * 1024, backup_count: int=5):
+        """ Initialize the RunLogger class. Files are created only when the first entry is written.
+
+        Args:
+            file_path (str): The path to the log file.
+            run_id (str, optional): The run id added to every entry. Defaults to None.
+            max_bytes (int, optional): The size at which the log file is rotated. Defaults to 50MB. 0 disables rotation.
+            backup_count (int, optional): The number of rotated files to keep. Defaults to 5.
+        """
+        self.file_path = file_path
+        self.debug_file_path = file_path + ".debug.jsonl.gz"
+        self.run_id = run_id
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+
+        self._queue = queue.Queue()
+        self._debug_ref = 0
+        self._lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+        # the exit handler is registered once, the writer may be started again after a close
+        self._atexit_registered = False
+
+    def log(self, entry: Union[dict, str], level: str="error", debug_payload: dict=None) -> None:
+        """
+        Queue an entry to be written.
+
+        Args:
+            entry (Union[dict, str]): The entry. A string is logged as ``{"msg": entry}``.
+            level (str, optional): The entry level. Defaults to "error".
+            debug_payload (dict, optional): Large data to write to the debug sidecar file. Defaults to None.
+        """
+        if isinstance(entry, str):
+            entry = {"msg": entry}
+
+        record = {"ts": datetime.now().isoformat(), "run_id": self.run_id, "level": level}
+        record.update(entry)
+
+        debug_record = None
+        if debug_payload:
+            with self._lock:
+                self._debug_ref += 1
+                record["debug_ref"] = self._debug_ref
+            debug_record = {"debug_ref": record["debug_ref"], "ts": record["ts"], "run_id": self.run_id}
+            debug_record.update(debug_payload)
+
+        self._start()
+        self._queue.put((record, debug_record))
+
+    def _start(self) -> None:
+        """
+        Start the writer thread, if not running.
+        """
+        if self._thread is not None:
+            return
+
+        with self._lock:
+            if self._thread is None:
+                self._closed = False
+                self._thread = threading.Thread(target=self._writer, name="RunLogger", daemon=True)
+                self._thread.start()
+                if not self._atexit_registered:
+                    atexit.register(self.close)
+                    self._atexit_registered = True
+
+    def _writer(self) -> None:
+        """
+        The writer thread loop. Writes all the queued entries at once and flushes when the queue is empty.
+        """
+        file = None
+        debug_file = None
+
+        try:
+            while True:
+                item = self._queue.get()
+                items = [item]
+                while True:
+                    try:
+                        items.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+
+                for item in items:
+                    if item is None:
+                        continue
+
+                    record, debug_record = item
+
+                    if file is None:
+                        file = open(self.file_path, 'a')
+                    file.write(json.dumps(record, default=str) + '\n')
+
+                    if debug_record is not None:
+                        if debug_file is None:
+                            debug_file = gzip.open(self.debug_file_path, 'at', encoding='utf-8')
+                        debug_file.write(json.dumps(debug_record, default=str) + '\n')
+
+                    if self.max_bytes and file.tell() >= self.max_bytes:
+                        file.close()
+                        file = None
+                        if debug_file is not None:
+                            debug_file.close()
+                            debug_file = None
+                        self._rotate()
+
+                if file is not None:
+                    file.flush()
+                if debug_file is not None:
+                    debug_file.flush()
+
+                if None in items:
+                    break
+        finally:
+            if file is not None:
+                file.close()
+            if debug_file is not None:
+                debug_file.close()
+
+    def _rotate(self) -> None:
+        """
+        Rotate the log file: file --> file.1 --> file.2 ... dropping the oldest one.
+        The debug sidecar is rotated along: file.debug.jsonl.gz --> file.1.debug.jsonl.gz ...
+        so the ``debug_ref`` of a rotated file points to its own sidecar.
+        """
+        for suffix in ["", ".debug.jsonl.gz"]:
+            for idx in range(self.backup_count - 1, 0, -1):
+                source = "%s.%s%s" % (self.file_path, idx, suffix)
+                if os.path.exists(source):
+                    os.replace(source, "%s.%s%s" % (self.file_path, idx + 1, suffix))
+
+            # a sidecar exists only if debug payloads were logged
+            current = self.file_path + suffix
+            if not os.path.exists(current):
+                continue
+            if self.backup_count > 0:
+                os.replace(current, "%s.1%s" % (self.file_path, suffix))
+            else:
+                os.remove(current)
+
+    def close(self) -> None:
+        """
+        Write all the queued entries and stop the writer thread. The logger can still be used afterwards.
+        """
+        with self._lock:
+            thread = self._thread
+            if thread is None or self._closed:
+                return
+            self._closed = True
+
+        self._queue.put(None)
+        thread.join()
+
+        with self._lock:
+            self._thread = None
+
+
+class ProxyJSON:
+    """
+    Stands for an odoorpc JSON proxy, sending the requests to a handler.
+    Used to record (see ``Cassette``) or pace (see ``Throttle``) the RPC calls of a connection.
+    """
+
+    def __init__(self, proxy_json: object, handler):
+        self._proxy_json = proxy_json
+        self._handler = handler
+
+    def __call__(self, url, params=None):
+        return self._handler(url, params)
+
+    def __getattr__(self, name):
+        return getattr(self._proxy_json, name)
+
+    def __setattr__(self, name, value):
+        if name in ('_proxy_json', '_handler'):
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._proxy_json, name, value)
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+
+"""
+This module provides the Tracer class, used to record hierarchical timing spans of a migration run
+in the Chrome trace event format (it can be opened with chrome://tracing or https://ui.perfetto.dev).
+"""
+
+import os
+import json
+import time
+import inspect
+import functools
+import threading
+
+
+class Tracer:
+    """
+    Records timing spans and writes them as Chrome trace "complete" events.
+
+    Spans opened inside other spans show up nested, so recursive calls render as a flame chart.
+    A tracer without a file path is disabled, and its spans cost almost nothing.
+
+    Example usage::
+
+        tracer = Tracer('trace.json')
+        with tracer.span('batch', model_name='crm.lead', batch=1):
+            ...
+        tracer.save()
+    """
+
+    def __init__(self, file_path: str=None):
+        """ Initialize the Tracer class.
+
+        Args:
+            file_path (str, optional): The path to the trace file. Defaults to None (tracing disabled).
+        """
+        self.file_path = file_path
+        self.events = []
+        self._origin = time.perf_counter()
+        self._pid = os.getpid()
+
+    @property
+    def enabled(self) -> bool:
+        """
+        Check if the tracer records spans.
+
+        Returns:
+            bool: True if a trace file is set.
+        """
+        return self.file_path is not None
+
+    def span(self, name: str, **attrs):
+        """
+        Get a context manager that records a span while its block runs.
+
+        Args:
+            name (str): The span name. Ex: _format_data
+            **attrs: Attributes shown with the span. Ex: model_name='crm.lead'
+
+        Returns:
+            A context manager.
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, attrs)
+
+    def _add(self, name: str, start: float, end: float, attrs: dict) -> None:
+        """
+        Add a complete event.
+
+        Args:
+            name (str): The span name.
+            start (float): The ``perf_counter`` value at the span start.
+            end (float): The ``perf_counter`` value at the span end.
+            attrs (dict): The span attributes.
+        """
+        self.events.append({
+            "name": name,
+            "cat": "migration",
+            "ph": "X",
+            "ts": (start - self._origin) * 1e6,
+            "dur": (end - start) * 1e6,
+            "pid": self._pid,
+            "tid": threading.get_ident(),
+            "args": attrs,
+        })
+
+    def save(self, file_path: str=None) -> None:
+        """
+        Write the recorded spans to the trace file.
+
+        Args:
+            file_path (str, optional): The path to the trace file. Defaults to ``file_path``.
+        """
+        file_path = file_path or self.file_path
+        if not file_path:
+            return
+
+        with open(file_path, 'w') as file:
+            json.dump({"traceEvents": self.events, "displayTimeUnit": "ms"}, file, default=str)
+
+
+class _Span:
+    """
+    A span being recorded.
+    """
+
+    def __init__(self, tracer: Tracer, name: str, attrs: dict):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if exc_type is not None:
+            self.attrs["error"] = repr(exc_value)
+        self.tracer._add(self.name, self.start, time.perf_counter(), self.attrs)
+        return False
+
+
+class _NullSpan:
+    """
+    The span of a disabled tracer. Does nothing.
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def _summarize(value):
+    """
+    Get the span attribute recorded for a method argument. Scalars are recorded as is, collections
+    (lists, dicts of record values, ...) by their length and other objects by their type name,
+    so traces stay small and dont hold record data.
+
+    Args:
+        value: The argument value.
+
+    Returns:
+        The attribute value.
+    """
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, (list, tuple, set, frozenset, dict)):
+        return len(value)
+    return type(value).__name__
+
+
+def traced(name: str, *arg_names):
+    """
+    Decorate an ``Executor`` method to record a span every time it is called, using ``self.tracer``.
+
+    Args:
+        name (str): The span name.
+        *arg_names: The method arguments to record as span attributes, see ``_summarize``.
+
+    Returns:
+        The decorator.
+    """
+    def decorator(method):
+        signature = inspect.signature(method)
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            tracer = getattr(self, 'tracer', None)
+            if tracer is None or not tracer.enabled:
+                return method(self, *args, **kwargs)
+
+            bound = signature.bind(self, *args, **kwargs)
+            attrs = {}
+            for arg_name in arg_names:
+                if arg_name in bound.arguments:
+                    attrs[arg_name] = _summarize(bound.arguments[arg_name])
+
+            with tracer.span(name, **attrs):
+                return method(self, *args, **kwargs)
+
+        return wrapper
+    return decorator